@@ -6,14 +6,14 @@ from matplotlib import pyplot as plt
 import pandas as pd
 from src.data.input.models import get_density, get_speed_of_sound
 
-from lib.data import interpolated_lookup
+from lib.data import LookupTable
 from simulations.FlightMotor2022 import get_sim
 
 
-def get_mass(time: float, motor_output: pd.DataFrame, dry_mass: float):
-    """Looks up the mass of the rocket given the requested time, the data from the motor, and the dry mass of the rocket."""
+def get_mass(time: float, propellant_mass_lookup: LookupTable, dry_mass: float):
+    """Looks up the mass of the rocket given the requested time, a lookup of propellant mass by time from the motor, and the dry mass of the rocket."""
 
-    prop_mass = interpolated_lookup(motor_output, "time", time, "propellant_mass", safe=True)
+    prop_mass = propellant_mass_lookup(time)
 
     return dry_mass + prop_mass
 
@@ -28,13 +28,16 @@ def calculate_forces_from_telemetrum(telemetrum_data: pd.DataFrame, motor_output
     predictions = pd.DataFrame()
     predictions["Time (s)"] = telemetrum_data["Time (s)"]
 
+    propellant_mass_lookup = LookupTable.from_dataframe(motor_output, "time", "propellant_mass", safe=True)
+    CD_lookup = LookupTable.from_dataframe(CD_data, "Mach", "CD", safe=True)
+
     net_forces = []
     weights = []
     drags = []
     thrusts = []
     predicted_drags = []
     for index, row in telemetrum_data.iterrows():
-        mass = get_mass(row["Time (s)"], motor_output, dry_mass)
+        mass = get_mass(row["Time (s)"], propellant_mass_lookup, dry_mass)
         net_force = row["acceleration"] * mass
 
         weight = mass * 9.81
@@ -44,7 +47,7 @@ def calculate_forces_from_telemetrum(telemetrum_data: pd.DataFrame, motor_output
         speed = row["speed"]
         speed_of_sound = get_speed_of_sound(row["altitude"] / 1000)
 
-        CD = interpolated_lookup(CD_data, "Mach", speed / speed_of_sound, "CD", safe=True)
+        CD = CD_lookup(speed / speed_of_sound)
         
         predicted_drags.append(-1/2 * density * speed ** 2 * frontal_area * CD)
         if row["Time (s)"] < burn_time:
@@ -6,7 +6,7 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
-from lib.data import interpolated_lookup
+from lib.data import LookupTable
 
 
 
@@ -15,13 +15,11 @@ def display_mach_importance(flight_data: pd.DataFrame, atmosphere_data: pd.DataF
     Create and show a matplotlib bar chart of the importance of each Mach number in the drag of a rocket's flight.
     """
 
-    flight_data["Dynamic Pressure"] = 0
-    
-    for index, row in flight_data.iterrows():
-        density = interpolated_lookup(atmosphere_data, "Altitude", row["position3"], "Density", safe=True)
+    density_lookup = LookupTable.from_dataframe(atmosphere_data, "Altitude", "Density", safe=True)
+    density = density_lookup(flight_data["position3"].to_numpy())
 
-        # P = 1/2 * rho * v^2
-        flight_data.loc[index, "Dynamic Pressure"] = 1/2 * row["relative velocity3"] ** 2 * density
+    # P = 1/2 * rho * v^2
+    flight_data["Dynamic Pressure"] = 1/2 * flight_data["relative velocity3"] ** 2 * density
 
 
     min_mach = 0
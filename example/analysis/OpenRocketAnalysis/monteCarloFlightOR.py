@@ -7,7 +7,7 @@ from Analysis.OpenRocketAnalysis.openRockethelpers import apogee
 from Analysis.OpenRocketAnalysis.overrideAerodynamicsListener import OverrideAerodynamicsDataFrame
 from Analysis.monteCarlo import MonteCarlo
 from Analysis.monteCarloFlight import MonteCarloFlight
-from lib.data import interpolated_lookup
+from lib.data import LookupTable
 from net.sf.openrocket.simulation import FlightDataType, SimulationStatus # type: ignore
 from net.sf.openrocket.simulation.listeners import SimulationListener # type: ignore
 from openRockethelpers import get_randomized_sim
@@ -86,13 +86,10 @@ class MonteCarloFlightOR(MonteCarloFlight):
         self.important_data.append(data)
     
     def lookup_CP_custom_data(self, mach_numbers):
-        CPs = []
+        CP_lookup = LookupTable.from_dataframe(self.drag_dataframe, "Mach", "CP", safe=True)
 
-        for mach in mach_numbers:
-            # Convert inches to meters
-            CPs.append(interpolated_lookup(self.drag_dataframe, "Mach", mach, "CP", safe=True) * 0.0254)
-        
-        return CPs
+        # Convert inches to meters
+        return CP_lookup(np.asarray(mach_numbers)) * 0.0254
 
     def finish_simulating(self):
         # TODO: create count of tumbling rockets
@@ -143,12 +140,10 @@ class MonteCarloFlightRandomMotorOR(MonteCarloFlightOR):
         return data
     
     def lookup_CG_custom_data(self, times):
-        CGs = []
+        times = np.asarray(times)
+        thrust_data = self.selected_motor.thrust_data
 
-        for time in times:
-            propellant_CG = interpolated_lookup(self.selected_motor.thrust_data, "time", time, "propellant_CG", safe=True) + self.ox_tank_front
-            propellant_mass = interpolated_lookup(self.selected_motor.thrust_data, "time", time, "propellant_mass", safe=True)
+        propellant_CG = LookupTable.from_dataframe(thrust_data, "time", "propellant_CG", safe=True)(times) + self.ox_tank_front
+        propellant_mass = LookupTable.from_dataframe(thrust_data, "time", "propellant_mass", safe=True)(times)
 
-            CGs.append((self.dry_mass * self.dry_CG + propellant_mass * propellant_CG) / (self.dry_mass + propellant_mass))
-        
-        return CGs
\ No newline at end of file
+        return (self.dry_mass * self.dry_CG + propellant_mass * propellant_CG) / (self.dry_mass + propellant_mass)
\ No newline at end of file
@@ -10,7 +10,7 @@
 import pandas as pd
 import numpy as np
 from orhelper import AbstractSimulationListener
-from lib.data import interpolated_lookup
+from lib.data import LookupTable
 from net.sf.openrocket.document import Simulation # type: ignore
 
 from net.sf.openrocket.simulation import SimulationStatus # type: ignore
@@ -105,6 +105,7 @@ class OverrideAerodynamicsDataFrame(OverrideAerodynamicsConstant):
     def __init__(self, sim: Simulation, data_frame: pd.DataFrame, override_CD=True, override_CP=True):
         """Requires that the dataframe have Mach and CD/CP columns"""
         self.data_frame = data_frame
+        self.CD_lookup = LookupTable.from_dataframe(data_frame, "Mach", "CD", safe=True)
 
         super().__init__(sim, 0, 0, override_CD=override_CD, override_CP=override_CP)
     
@@ -112,7 +113,7 @@ class OverrideAerodynamicsDataFrame(OverrideAerodynamicsConstant):
         try:
             mach = self.flight_conditions.getMach()
             # This line is throwing the error
-            self.CD = interpolated_lookup(self.data_frame, "Mach", mach, "CD", safe=True)
+            self.CD = self.CD_lookup(mach)
             # self.CP = 15
 
             return super().postAerodynamicCalculation(status, forces)
@@ -1,7 +1,9 @@
 # Class that all Monte Carlo style sims should inherit from
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
 from pathlib import Path
+import random
 from time import time
 from typing import Dict
 
@@ -36,26 +38,96 @@ def create_motors_from_directory(path, max_count=-1):
     return motors
 
 
+#region Parallel Workers
+# Every process in the pool gets its own copy of the Monte Carlo object, so these have to be at the top level of the module to be pickled
+worker_monte_carlo: "MonteCarlo" = None
+
+def initialize_worker(monte_carlo: "MonteCarlo"):
+    global worker_monte_carlo
+    worker_monte_carlo = monte_carlo
+
+def run_worker_simulation(seed: int, important_columns: "list[str]"=None):
+    """
+    Run one simulation on the Monte Carlo object in this process.
+    Only the characteristic figures and the important data are sent back, since pickling entire simulations (with all of the logger rows) takes forever.
+    """
+    monte_carlo = worker_monte_carlo
+    # Start from nothing so that we only send back what this simulation saved
+    monte_carlo.sims = []
+    monte_carlo.characteristic_figures = []
+    monte_carlo.important_data = []
+
+    try:
+        # Seeded by the task instead of the process, so the results do not depend on how many workers there are
+        sim = monte_carlo.prepare_seeded_simulation(seed)
+        monte_carlo.run_simulation(sim)
+        monte_carlo.save_simulation(sim)
+    except Exception as e:
+        return [], [], e
+
+    important_data = monte_carlo.important_data
+    if important_columns is not None:
+        important_data = [df[[name for name in important_columns if name in df.columns]] for df in important_data]
+
+    return monte_carlo.characteristic_figures, important_data, None
+#endregion
+
+
 class MonteCarlo:
     def __init__(self, sims=[]):
         # You can start with an array of already run simulations, if you like
         self.sims = sims
         self.failed_sims = []
+        self.simulation_count = len(sims)
 
         self.characteristic_figures: list[Dict] = []
         self.important_data: list[pd.DataFrame] = []
 
+    def prepare_simulation(self):
+        sim = self.initialize_simulation()
+        try:
+            sim.automatically_save = False
+            sim.logger.partial_debugging = False
+        except AttributeError as e:
+            print(f"Presumably because you are using somebody else's simulation class (like OR), this error was thrown {e}. It is being ignored.")
+
+        return sim
+
+    def prepare_seeded_simulation(self, seed: int):
+        """Seed both random number generators before preparing the simulation, so the same seed always gives the same simulation"""
+        np.random.seed(seed)
+        random.seed(seed)
+
+        return self.prepare_simulation()
+
+    def rebuild_simulation(self, seed: int):
+        """
+        Make the simulation for a seed again, without disturbing the random state of this process.
+        Used for the simulations that failed in another process, so that handle_failed_sim gets a simulation that can be run again to reproduce the error. None if the simulation can't even be made
+        """
+        numpy_state, python_state = np.random.get_state(), random.getstate()
+
+        try:
+            return self.prepare_seeded_simulation(seed)
+        except Exception as e:
+            print(f"Could not rebuild the simulation for seed {seed}, because of the error {e}")
+            return None
+        finally:
+            np.random.set_state(numpy_state)
+            random.setstate(python_state)
+
+    def print_predicted_time(self, start_time, finished, count):
+        time_elapsed = time() - start_time
+        predicted_time = time_elapsed / finished * (count - finished)
+        print(f"Predicted time to completion: {predicted_time/60:.1f} minutes")
+
     def simulate_randomized(self, count=20):
         start_time = time()
         for i in range(count):
             print(f"Simulating {i+1} out of {count}")
 
-            sim = self.initialize_simulation()
-            try:
-                sim.automatically_save = False
-                sim.logger.partial_debugging = False
-            except AttributeError as e:
-                print(f"Presumably because you are using somebody else's simulation class (like OR), this error was thrown {e}. It is being ignored.")
+            sim = self.prepare_simulation()
+            self.simulation_count += 1
 
             try:
                 # Use pass-by-reference
@@ -64,10 +136,51 @@ class MonteCarlo:
             except Exception as e:
                 self.handle_failed_sim(sim, e)
 
-            current_time = time()
-            time_elapsed = current_time - start_time
-            predicted_time = time_elapsed / (i + 1) * (count - (i + 1))
-            print(f"Predicted time to completion: {predicted_time/60:.1f} minutes")
+            self.print_predicted_time(start_time, i + 1, count)
+
+        self.finish_simulating()
+
+    def simulate_parallel(self, count=20, workers=None, seed=0, important_columns: "list[str]"=None):
+        """
+        Same as simulate_randomized, but the simulations are run in a pool of processes.
+        The simulations themselves are not kept, only the characteristic figures and the important data that save_simulation stores.
+
+        :param workers: how many processes to use. Defaults to the number of cores
+        :param seed: every simulation gets its own random seed generated from this one, so the same seed gives the same results regardless of the number of workers
+        :param important_columns: only these columns of the important data are sent back. Pass an empty list to skip the important data
+
+        Failed simulations are made again in this process from their seeds before they go to handle_failed_sim, so failed_sims holds simulations either way (or None, if the simulation can't even be made)
+        """
+        start_time = time()
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(count)]
+        results = [None] * count
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker, initargs=(self,)) as executor:
+            futures = {executor.submit(run_worker_simulation, task_seed, important_columns): index for index, task_seed in enumerate(seeds)}
+
+            for finished, future in enumerate(as_completed(futures)):
+                index = futures[future]
+                print(f"Finished simulating {index + 1} ({finished + 1} out of {count})")
+
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # Usually means that the worker crashed or that the results could not be pickled
+                    results[index] = ([], [], e)
+
+                self.print_predicted_time(start_time, finished + 1, count)
+
+        # Keep everything in the order it was submitted so that the results are reproducible
+        for index, (characteristic_figures, important_data, error) in enumerate(results):
+            self.simulation_count += 1
+
+            if error is not None:
+                # The simulation that failed stayed in the worker, so hand over a fresh one that fails the same way
+                self.handle_failed_sim(self.rebuild_simulation(seeds[index]), error)
+                continue
+
+            self.characteristic_figures.extend(characteristic_figures)
+            self.important_data.extend(important_data)
 
         self.finish_simulating()
 
@@ -128,5 +241,5 @@ class MonteCarlo:
         return pd.DataFrame(self.characteristic_figures)
 
     def finish_simulating(self):
-        print(f"Ran {len(self.sims)} simulations, {len(self.failed_sims)} failed.")
+        print(f"Ran {self.simulation_count} simulations, {len(self.failed_sims)} failed.")
 
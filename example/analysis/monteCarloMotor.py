@@ -9,6 +9,7 @@ from src.rocketparts.motor import CustomMotor
 from monteCarlo import MonteCarlo
 from Simulations.DesignedMotor2022 import get_randomized_sim, get_randomized_percent_fill_closure
 from lib.simulation import MotorSimulation
+from src.simulation.motor.batch import BatchMotorSimulation
 
 
 # TODO: create some sensitivity analysis functions that find correlations in the characteristic figures.
@@ -25,9 +26,29 @@ class MonteCarloMotor(MonteCarlo):
         sim.grain.verbose = False
         return sim
 
-    def save_simulation(self, sim: MotorSimulation):
-        super().save_simulation(sim)
+    def simulate_batched(self, count=20):
+        """
+        Same as simulate_randomized, but every motor is stepped together in a BatchMotorSimulation.
+        Nothing is logged frame by frame, so the important data for each motor is just its thrust curve.
+        """
+        sims = [self.prepare_simulation() for _ in range(count)]
+        self.simulation_count += count
+
+        batch = BatchMotorSimulation(sims)
+        batch.run_simulation()
+
+        for index, sim in enumerate(sims):
+            if index in batch.errors:
+                self.handle_failed_sim(sim, batch.errors[index])
+                continue
+
+            super().save_simulation(sim)
+            self.save_characteristic_figures_of(sim)
+            self.important_data.append(batch.get_thrust_curve(index).set_index("time"))
 
+        self.finish_simulating()
+
+    def save_characteristic_figures_of(self, sim: MotorSimulation):
         m: CustomMotor = sim.motor
 
         self.characteristic_figures.append({
@@ -44,6 +65,11 @@ class MonteCarloMotor(MonteCarlo):
             "Launch Temperature": m.ox_tank.initial_temperature,
         })
 
+    def save_simulation(self, sim: MotorSimulation):
+        super().save_simulation(sim)
+
+        self.save_characteristic_figures_of(sim)
+
         data = sim.logger.get_dataframe()
 
         try:
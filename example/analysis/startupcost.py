@@ -0,0 +1,106 @@
+# STARTUP COST
+# How long it takes to import the simulator and to make each of its main objects, which is what every worker in a process pool pays before it simulates anything
+# Every measurement is done in a fresh interpreter, so nothing has been imported, read, or cached yet
+# Run it from the root of the project: python -m example.analysis.startupcost
+
+import json
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+from statistics import median
+
+
+# What gets made, in order. The first one of each kind is the cold cost (reading files, filling caches); the rest are warm
+def make_constructors():
+    from src.environment import Environment
+    from src.data.input.atmosphere.wind import Wind
+    from src.rocketparts.motor import Motor, CustomMotor
+    from src.rocket import Rocket
+    from src.simulation.rocket.simulation import RocketSimulation
+
+    return {
+        "Environment": Environment,
+        "Wind": Wind,
+        "Motor": Motor,
+        "CustomMotor": CustomMotor,
+        # The default rocket asks the wind about a simulation it does not have yet
+        "Rocket": lambda: Rocket(environment=Environment(apply_wind=False)),
+        "RocketSimulation": RocketSimulation,
+    }
+
+
+def time_constructors(repeats=5):
+    """
+    Runs in the fresh interpreter. Returns the cold and the median warm time of each constructor in seconds, and the peak memory of making one more in bytes
+    The memory mostly shows how much gets copied into the saved states of the preset objects
+    """
+    start = time.perf_counter()
+    constructors = make_constructors()
+    results = {"import": time.perf_counter() - start}
+
+    for name, constructor in constructors.items():
+        times = []
+        for _ in range(repeats + 1):
+            start = time.perf_counter()
+            constructor()
+            times.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        constructor()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[name] = {"cold": times[0], "warm": median(times[1:]), "peak": peak}
+
+    return results
+
+
+def measure_imports(module="src.rocket", packages=("src", "lib")):
+    """
+    The self and cumulative import time of every module that gets imported along with module, from python -X importtime.
+    Returns the total time and a list of (cumulative, self, name), biggest first. Only the modules in packages are listed, along with anything outside of them that took over 10 ms
+    """
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True).stderr
+
+    imports = []
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            own, cumulative, _, name = match.groups()
+            imports.append((int(cumulative) / 1e6, int(own) / 1e6, name))
+
+    total = next(cumulative for cumulative, _, name in imports if name == module)
+    listed = [entry for entry in imports if entry[2].split(".")[0] in packages or entry[0] > 0.01]
+
+    return total, sorted(listed, reverse=True)
+
+
+def measure_constructors(repeats=5):
+    script = f"import json; from example.analysis.startupcost import time_constructors; print(json.dumps(time_constructors({repeats})))"
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+
+    # The constructors print things, so the results are the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_report(module="src.rocket", top=25, repeats=5):
+    total, imports = measure_imports(module)
+
+    print(f"Cold import of {module}: {total:.3f} s")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for cumulative, own, name in imports[:top]:
+        print(f"{cumulative:>11.3f}s {own:>9.3f}s  {name}")
+
+    constructors = measure_constructors(repeats)
+
+    print()
+    print(f"Importing everything below: {constructors.pop('import'):.3f} s")
+    print(f"{'constructor':<18} {'cold':>9} {'warm':>9} {'peak':>10}")
+    for name, times in constructors.items():
+        print(f"{name:<18} {times['cold']:>8.4f}s {times['warm']:>8.4f}s {times['peak'] / 1024:>7.0f} KiB")
+
+
+if __name__ == "__main__":
+    print_report()
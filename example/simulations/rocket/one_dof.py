@@ -12,7 +12,7 @@ from src.rocket import Rocket
 from src.rocketparts.parachute import ApogeeParachute
 from src.simulation.rocket.logger import RocketLogger
 from src.simulation.rocket.simulation import RocketSimulation
-from src.data.input.goddardModels import get_sine_interpolated_center_of_pressure, linear_approximated_normal_force, assumed_zero_AOA_CD
+from src.data.input.goddardModels import get_rasaero_coefficients
 from src.constants import thrust_curve_path
 from example.constants import output_path
 
@@ -49,10 +49,8 @@ def get_sim():
     main_parachute = ApogeeParachute(diameter=4.8768)
     rocket = Rocket(radius=0.1016, length=5.7912, rotation=Rotation(np.pi / 2, 0),
         environment=env, motor=motor, parachutes=[])
-    rocket.set_CP_function(get_sine_interpolated_center_of_pressure)
-    rocket.set_CL_function(linear_approximated_normal_force)
-    # This makes it partially one dof
-    rocket.set_CD_function(assumed_zero_AOA_CD)
+    # The CD is at zero angle of attack, which makes it partially one dof
+    rocket.set_aero_function(get_rasaero_coefficients)
     rocket.set_moment_constant(250)
 
     mass_objects = [motor]
@@ -1,5 +1,6 @@
 # COMPRESS CSVs FOR GITHUB UPLOAD
 # Not really compressing to be honest, it just takes every nth row
+# New simulations should just set log_every on the logger rather than thinning the csv afterwards
 
 
 import pandas as pd
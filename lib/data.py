@@ -1,12 +1,13 @@
 # data CLASSES AND ENUMS
 # Depending on what type of data input we are using, we will want to have an enum entry that is easily serializable to indicate to the object what to do.
 
+from bisect import bisect_left, bisect_right
 import os
 from pathlib import Path
 import random
 import re
 from enum import Enum, auto
-from matplotlib import pyplot as plt
+from operator import attrgetter
 import numpy as np
 import string
 
@@ -69,6 +70,9 @@ def read_sims(path):
         
 
 def plot_all_sims(sims, x="time", y="altitude", **kwargs):
+    # Only imported here, since everything imports this module and hardly anything plots
+    from matplotlib import pyplot as plt
+
     for sim in sims:
         try:
             plt.plot(sim[x], sim[y], **kwargs)
@@ -162,12 +166,25 @@ def nested_dictionary_lookup_array(dictionary: dict, key_array: list):
         del key_array[0]
 
         return nested_dictionary_lookup_array(dictionary[current], key_array)
-    
+
+
+def compile_nested_lookup(key: string):
+    """
+        Does the splitting for nested_dictionary_lookup once and returns a function that only has to do the getattrs.
+        Use this when the same path is going to be looked up every frame.
+    """
+    if len(key) == 0:
+        raise Exception("Empty key passed in")
+
+    return attrgetter(".".join(re.split(r"\.|/|,", key)))
+
 
 # FIXME: rename from safe to clamped.
-# FIXME: Create a caching system for this that saves the previous key that worked
 def interpolated_lookup(dataframe: pd.DataFrame, key: string, value: float, return_key: string, safe=False):
-    """return_key is the value you want returned"""
+    """
+    return_key is the value you want returned
+    This filters the entire dataframe on every call, so anything that is looked up every frame should use a LookupTable instead
+    """
     before_keys = dataframe[dataframe[key] <= value]
     if safe and len(before_keys) == 0:
         # There is nothing to look up in the table that is lower than that value
@@ -201,6 +218,185 @@ def interpolated_lookup(dataframe: pd.DataFrame, key: string, value: float, retu
     return interpolate(value, before_key[key], after_key[key], before_key[return_key], after_key[return_key])
 
 
+class SharedTable:
+    """
+    Compiled tables never change after they are made, so copying whatever holds one (presets, copy(), genetic algorithm children) hands back the same table instead of copying every array in it.
+    Their arrays are read-only to keep it that way. The only thing that does change is the bracket hint, which is fine to share.
+    """
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @staticmethod
+    def read_only(array: np.ndarray) -> np.ndarray:
+        """Only for arrays that the table made for itself, since it changes the array in place"""
+        array.flags.writeable = False
+        return array
+
+
+class LookupTable(SharedTable):
+    """
+    A compiled version of interpolated_lookup for tables that get looked up over and over again (every frame).
+    The key column is sorted once and stored with the return column in contiguous numpy arrays, so a lookup is a bisection instead of two filters over the whole dataframe.
+    Sorting is stable, so repeated keys stay in the order of the dataframe. That way the results match interpolated_lookup for sorted tables and for tables made of sorted blocks (like the RASAero data, which repeats the Mach numbers for every angle of attack).
+
+    Scalar lookups remember the last bracket that worked; consecutive frames almost always land in the same bracket, so most lookups do not even need to bisect.
+    Arrays of values are looked up all at once.
+
+    The values can also be two-dimensional, with one column for each thing you want returned. Then every column comes out of the same search, as a row (or one row per key for arrays).
+    """
+
+    def __init__(self, keys, values, safe=False, use_hint=True, name="lookup table"):
+        """
+        :param keys: the values to look up by. They do not have to be sorted
+        :param values: the values to return, lined up with the keys. Can have several columns
+        :param bool safe: clamp to the first or last value instead of throwing an IndexError when you look up outside of the keys
+        :param bool use_hint: check the previous bracket before bisecting
+        """
+        keys = np.asarray(keys, dtype="float64")
+        values = np.asarray(values, dtype="float64")
+
+        if keys.ndim != 1 or len(keys) == 0:
+            raise ValueError(f"A lookup table needs a one-dimensional array of keys, not one with shape {keys.shape}")
+
+        if values.ndim not in (1, 2):
+            raise ValueError(f"The values of the {name} have to be one column or a table of columns, not shape {values.shape}")
+
+        if len(values) != len(keys):
+            raise ValueError(f"The {name} has {len(keys)} keys but {len(values)} values")
+
+        order = np.argsort(keys, kind="stable")
+        # Indexing makes new arrays, so nothing outside of the table has them
+        self.keys = self.read_only(np.ascontiguousarray(keys[order]))
+        self.values = self.read_only(np.ascontiguousarray(values[order]))
+
+        self.safe = safe
+        self.use_hint = use_hint
+        self.name = name
+
+        # Python lists are much quicker to bisect and index one element at a time than numpy arrays
+        self._key_list = self.keys.tolist()
+        # Rows stay as arrays so that they can be interpolated all at once
+        self._value_list = self.values.tolist() if self.values.ndim == 1 else list(self.values)
+        # interpolated_lookup clamps to the first row with the largest key
+        self._last_index = bisect_left(self._key_list, self._key_list[-1])
+
+        self.hint = None
+        self.already_warned = False
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pd.DataFrame, key: string, return_key, safe=False, use_hint=True):
+        """
+        Compile the key and return_key columns of a dataframe. The arguments match interpolated_lookup.
+        return_key can also be a list of columns, which come out in the same order.
+        """
+        name = return_key if isinstance(return_key, str) else ", ".join(return_key)
+
+        return cls(dataframe[key].to_numpy(), dataframe[return_key].to_numpy(), safe=safe, use_hint=use_hint, name=f"{name} by {key}")
+
+    @property
+    def min_key(self):
+        return self._key_list[0]
+
+    @property
+    def max_key(self):
+        return self._key_list[-1]
+
+    def __call__(self, value):
+        return self.lookup(value)
+
+    def lookup(self, value):
+        """Interpolate the value at one key or at an array of keys"""
+        if isinstance(value, float) or np.ndim(value) == 0:
+            return self.lookup_scalar(value)
+
+        return self.lookup_array(value)
+
+    def warn_overflow(self, value):
+        if not self.already_warned:
+            print(f"WARNING: Bounding lookup value from the {self.name} to prevent {value} overflowing {self.max_key}.")
+
+            self.already_warned = True
+
+    def lookup_scalar(self, value: float):
+        keys = self._key_list
+        hint = self.hint
+
+        # Most of the time we are in the same bracket as last frame
+        if hint is not None and keys[hint] < value < keys[hint + 1]:
+            before, after = hint, hint + 1
+        else:
+            # The last key that is less than or equal to the value, and the first key that is greater than or equal to it
+            before = bisect_right(keys, value) - 1
+            after = bisect_left(keys, value)
+
+            if before < 0 or value != value: # NaN is never equal to itself
+                if self.safe:
+                    # There is nothing to look up in the table that is lower than that value
+                    return self._value_list[0]
+
+                print(f"Try turning safe mode on. There was no data before {value} in the {self.name}.")
+                raise IndexError(f"{value} is below the smallest key ({self.min_key}) of the {self.name}")
+
+            if after == len(keys):
+                if self.safe:
+                    self.warn_overflow(value)
+                    # There is nothing to look up in the table that is bigger than that value
+                    return self._value_list[self._last_index]
+
+                print(f"Try turning safe mode on. There was no data after {value} in the {self.name}.")
+                raise IndexError(f"{value} is above the largest key ({self.max_key}) of the {self.name}")
+
+            if self.use_hint and after == before + 1:
+                self.hint = before
+
+        values = self._value_list
+        return interpolate(value, keys[before], keys[after], values[before], values[after])
+
+    def lookup_array(self, value):
+        value = np.asarray(value, dtype="float64")
+        keys = self.keys
+        values = self.values
+
+        after = np.searchsorted(keys, value, side="left")
+        before = np.searchsorted(keys, value, side="right") - 1
+
+        below = (before < 0) | np.isnan(value)
+        above = (after == len(keys)) & ~below
+
+        if np.any(below) or np.any(above):
+            if not self.safe:
+                print(f"Try turning safe mode on. Some of the values were outside of the {self.name}.")
+                raise IndexError(f"Values outside of the range {self.min_key} to {self.max_key} of the {self.name}")
+
+            if np.any(above):
+                self.warn_overflow(np.max(value[above]))
+
+        before = np.clip(before, 0, len(keys) - 1)
+        after = np.clip(after, 0, len(keys) - 1)
+
+        x1 = keys[before]
+        x2 = keys[after]
+        y1 = values[before]
+        y2 = values[after]
+
+        if values.ndim == 2:
+            # Line the keys up with the rows of values
+            value, x1, x2 = value[..., np.newaxis], x1[..., np.newaxis], x2[..., np.newaxis]
+
+        # Same math as interpolate, just without the branch
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = np.where(x2 == x1, (y1 + y2) / 2, (value - x1) / (x2 - x1) * (y2 - y1) + y1)
+
+        result[below] = values[0]
+        result[above] = values[self._last_index]
+
+        return result
+
+
 def interpolated_lookup_2D(dataframe, key1, key2, value1, value2, lookup_key, safe=False):
     """
     The dataframe must be sorted first by key1 and second by key2
@@ -238,3 +434,90 @@ def interpolated_lookup_2D(dataframe, key1, key2, value1, value2, lookup_key, sa
     # We have already interpolated along the isolines, now interpolate between them
     return interpolate(value1, value_before_value1, value_after_value1, before_value, after_value)
 
+
+
+class GridTable(SharedTable):
+    """
+    A compiled version of interpolated_lookup_2D for tables that cover a full rectangular grid, like the CEA combustion data.
+    The two key columns become sorted axes, and every column you want returned is stacked into one cube of values, so a single bilinear evaluation gives all of them at once.
+    Lookups outside of the grid are clamped to the edges, which is what interpolated_lookup_2D does in safe mode.
+    """
+
+    def __init__(self, axis1, axis2, values, return_keys=None, name="grid table"):
+        """
+        :param axis1: the sorted values of the first key
+        :param axis2: the sorted values of the second key
+        :param values: an array with shape (len(axis1), len(axis2), number of return keys)
+        :param return_keys: the names of the last dimension of values
+        """
+        # Copied, so that the arrays that were passed in can still be changed
+        self.axis1 = self.read_only(np.array(axis1, dtype="float64"))
+        self.axis2 = self.read_only(np.array(axis2, dtype="float64"))
+        self.values = self.read_only(np.array(values, dtype="float64"))
+
+        if self.values.ndim == 2:
+            self.values = self.values[:, :, np.newaxis]
+
+        if self.values.shape[:2] != (len(self.axis1), len(self.axis2)):
+            raise ValueError(f"The {name} has axes of length {len(self.axis1)} and {len(self.axis2)}, but values with shape {self.values.shape}")
+
+        if len(self.axis1) < 2 or len(self.axis2) < 2:
+            raise ValueError(f"The {name} needs at least two points along each axis to interpolate")
+
+        self.return_keys = list(return_keys) if return_keys is not None else list(range(self.values.shape[2]))
+        self.name = name
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pd.DataFrame, key1: string, key2: string, return_keys):
+        """
+        Reshape a dataframe with one row for every combination of key1 and key2 into a grid. The rows can be in any order.
+        """
+        return_keys = list(return_keys)
+
+        axis1 = np.unique(dataframe[key1].to_numpy(dtype="float64"))
+        axis2 = np.unique(dataframe[key2].to_numpy(dtype="float64"))
+
+        if len(dataframe) != len(axis1) * len(axis2):
+            raise ValueError(f"{len(dataframe)} rows do not make a full grid of {len(axis1)} {key1} by {len(axis2)} {key2}")
+
+        i = np.searchsorted(axis1, dataframe[key1].to_numpy(dtype="float64"))
+        j = np.searchsorted(axis2, dataframe[key2].to_numpy(dtype="float64"))
+
+        values = np.full((len(axis1), len(axis2), len(return_keys)), np.nan)
+        values[i, j] = dataframe[return_keys].to_numpy(dtype="float64")
+
+        if np.isnan(values).any():
+            raise ValueError(f"The grid of {key1} by {key2} has repeated or missing points")
+
+        return cls(axis1, axis2, values, return_keys=return_keys, name=f"{', '.join(map(str, return_keys))} by {key1} and {key2}")
+
+    def __call__(self, value1, value2):
+        return self.lookup(value1, value2)
+
+    @staticmethod
+    def find_bracket(axis, value):
+        """Returns the index before each value and how far along the bracket the value is, clamped to the ends of the axis"""
+        value = np.clip(value, axis[0], axis[-1])
+        before = np.clip(np.searchsorted(axis, value, side="right") - 1, 0, len(axis) - 2)
+        fraction = (value - axis[before]) / (axis[before + 1] - axis[before])
+
+        return before, fraction
+
+    def lookup(self, value1, value2):
+        """
+        Bilinearly interpolate every return key at once.
+        Scalars give an array with one entry per return key; arrays of values (broadcast together) give one more dimension at the end for the return keys.
+        """
+        i, t = self.find_bracket(self.axis1, np.asarray(value1, dtype="float64"))
+        j, u = self.find_bracket(self.axis2, np.asarray(value2, dtype="float64"))
+
+        t = t[..., np.newaxis]
+        u = u[..., np.newaxis]
+        values = self.values
+
+        return (values[i, j] * (1 - t) * (1 - u) + values[i + 1, j] * t * (1 - u)
+                + values[i, j + 1] * (1 - t) * u + values[i + 1, j + 1] * t * u)
+
+    def lookup_dict(self, value1, value2):
+        """Same as lookup, but labels the results with their return keys"""
+        return dict(zip(self.return_keys, np.moveaxis(self.lookup(value1, value2), -1, 0)))
@@ -0,0 +1,78 @@
+# EVENTS
+# Finds exactly when something happened partway through a frame, like apogee or leaving the rail
+# Every event is a function of the time and state that crosses zero when it happens
+
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+from scipy.optimize import brentq
+
+
+@dataclass(eq=True, frozen=True)
+class Event:
+    """
+    The function takes (time, state) and should cross zero when the event happens.
+    A positive direction only counts crossings from negative to positive, a negative direction only counts the other way, and zero counts both.
+    If after is the name of another event, this one is not checked until that one has happened, so that the launch pad does not look like apogee.
+    Terminal events stop the simulation exactly where they happened.
+    """
+    name: str
+    function: Callable
+    direction: int = 0
+    after: str = None
+    terminal: bool = False
+
+
+@dataclass
+class EventResult:
+    time: float
+    state: np.ndarray
+
+
+def hermite_interpolate(fraction, time_increment, state, derivative, new_state, new_derivative):
+    """
+    Cubic interpolation between the start and end of a step, using the derivative at both ends.
+    Fraction goes from zero at the start of the step to one at the end.
+    """
+    s = fraction
+    h00 = 2 * s ** 3 - 3 * s ** 2 + 1
+    h10 = s ** 3 - 2 * s ** 2 + s
+    h01 = -2 * s ** 3 + 3 * s ** 2
+    h11 = s ** 3 - s ** 2
+
+    return h00 * state + h10 * time_increment * derivative + h01 * new_state + h11 * time_increment * new_derivative
+
+
+def crossed(event: Event, start: float, end: float):
+    rising = start < 0 <= end
+    falling = start > 0 >= end
+
+    if event.direction > 0:
+        return rising
+    if event.direction < 0:
+        return falling
+
+    return rising or falling
+
+
+def find_event(event: Event, time, time_increment, state, derivative, new_state, new_derivative):
+    """
+    Returns an EventResult if the event happened during the step, otherwise None.
+    """
+    start = event.function(time, state)
+    end = event.function(time + time_increment, new_state)
+
+    if not crossed(event, start, end):
+        return None
+
+    if end == 0:
+        return EventResult(time + time_increment, np.copy(new_state))
+
+    def value(fraction):
+        interpolated = hermite_interpolate(fraction, time_increment, state, derivative, new_state, new_derivative)
+        return event.function(time + fraction * time_increment, interpolated)
+
+    fraction = brentq(value, 0, 1, xtol=1e-12)
+
+    return EventResult(time + fraction * time_increment, hermite_interpolate(fraction, time_increment, state, derivative, new_state, new_derivative))
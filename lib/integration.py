@@ -0,0 +1,189 @@
+# INTEGRATORS
+# Ways to move a flat state vector forwards in time given a function for its derivative
+# The rocket uses its own frame-by-frame trapezoid scheme by default, these are for when you want something more accurate for the same number of steps
+
+import numpy as np
+
+from lib.presetObject import PresetObject
+
+
+class Integrator(PresetObject):
+    """
+        Base class for all of the integrators.
+        The derivative function should take (time, state) and return an array the same shape as the state.
+        Don't instantiate this class, inherit from it.
+    """
+
+    def __init__(self, **kwargs):
+        self.derivative_evaluations = 0
+        self.steps = 0
+
+        super().overwrite_defaults(**kwargs)
+
+        self.reset_step()
+
+    def reset_step(self):
+        """
+            Forget everything remembered from the previous step.
+            This has to be called whenever the derivative function changes without the state changing, like when a parachute deploys.
+        """
+        self.clear_cache()
+
+    def clear_cache(self):
+        """Forget the last evaluation, but keep anything else about the step (like the next step size for an adaptive integrator)"""
+        self.cached_time = None
+        self.cached_state = None
+        self.cached_derivative = None
+
+    def evaluate(self, derivative, time, state):
+        """
+            Call the derivative function, reusing the last result if it is for exactly the same point.
+            The end of one step is almost always the start of the next one, so this saves a full evaluation per step.
+        """
+        if self.cached_time == time and np.array_equal(self.cached_state, state):
+            return self.cached_derivative
+
+        result = np.asarray(derivative(time, state), dtype="float64")
+        self.derivative_evaluations += 1
+
+        self.cached_time = time
+        self.cached_state = np.copy(state)
+        self.cached_derivative = result
+
+        return result
+
+    def step(self, derivative, time, state, time_increment, max_time_increment=np.inf):
+        """
+            Return the new state and the time increment that was actually taken.
+            The max_time_increment lets the caller stop exactly on a discontinuity, like motor burnout.
+        """
+        raise NotImplementedError("Inherit from Integrator and override the step function")
+
+
+class TrapezoidIntegrator(Integrator):
+    """
+        Averages the derivative at the start and the predicted end of the step (Heun's method).
+        This is the same idea as combine in the rocket, but it works on any state vector.
+    """
+
+    def step(self, derivative, time, state, time_increment, max_time_increment=np.inf):
+        h = min(time_increment, max_time_increment)
+
+        k1 = self.evaluate(derivative, time, state)
+        predicted = state + h * k1
+        k2 = self.evaluate(derivative, time + h, predicted)
+
+        self.steps += 1
+
+        return state + h * (k1 + k2) / 2, h
+
+
+class RK4Integrator(Integrator):
+    """
+        Classic fixed-step fourth-order Runge-Kutta.
+    """
+
+    def step(self, derivative, time, state, time_increment, max_time_increment=np.inf):
+        h = min(time_increment, max_time_increment)
+
+        k1 = self.evaluate(derivative, time, state)
+        k2 = self.evaluate(derivative, time + h / 2, state + h / 2 * k1)
+        k3 = self.evaluate(derivative, time + h / 2, state + h / 2 * k2)
+        k4 = self.evaluate(derivative, time + h, state + h * k3)
+
+        self.steps += 1
+
+        return state + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4), h
+
+
+class DormandPrinceIntegrator(Integrator):
+    """
+        Embedded fifth-order Runge-Kutta with a fourth-order error estimate (the same scheme as scipy's RK45).
+        The step size grows when the error estimate is small, like during coast and descent, and shrinks around anything sudden, like burnout.
+        The time_increment passed in to step is only used as the first guess.
+    """
+
+    # Butcher tableau
+    C = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+    A = [
+        [],
+        [1/5],
+        [3/40, 9/40],
+        [44/45, -56/15, 32/9],
+        [19372/6561, -25360/2187, 64448/6561, -212/729],
+        [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+        [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84],
+    ]
+    # The last row of A is the fifth order solution, so the final stage is the derivative at the end of the step
+    B = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+    # Fifth order minus fourth order weights
+    E = np.array([71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40])
+
+    def __init__(self, **kwargs):
+        self.relative_tolerance = 1e-6
+        # The state mixes meters, kilograms and radians, so this is a compromise
+        self.absolute_tolerance = 1e-6
+
+        self.min_time_increment = 1e-6 # seconds
+        # Parachutes only deploy on a frame, so this should not be too big
+        self.max_time_increment = 0.5 # seconds
+
+        # How much of the theoretically perfect step to actually take
+        self.safety = 0.9
+        self.min_factor = 0.2
+        self.max_factor = 5
+
+        self.rejected_steps = 0
+
+        super().__init__(**kwargs)
+
+    def reset_step(self):
+        """
+            Also goes back to the starting time increment, since whatever happened probably makes the old step size a bad guess.
+        """
+        super().reset_step()
+
+        self.next_time_increment = None
+
+    def get_error(self, state, new_state, stages, h):
+        scale = self.absolute_tolerance + self.relative_tolerance * np.maximum(np.abs(state), np.abs(new_state))
+        error = h * (self.E @ stages) / scale
+
+        return np.sqrt(np.mean(error ** 2))
+
+    def step(self, derivative, time, state, time_increment, max_time_increment=np.inf):
+        h = self.next_time_increment or time_increment
+        h = max(min(h, self.max_time_increment), self.min_time_increment)
+
+        stages = np.empty((7, len(state)))
+        stages[0] = self.evaluate(derivative, time, state)
+
+        while True:
+            limited = h >= max_time_increment
+            if limited:
+                h = max_time_increment
+
+            for i in range(1, 7):
+                stages[i] = self.evaluate(derivative, time + self.C[i] * h, state + h * (self.A[i] @ stages[:i]))
+
+            new_state = state + h * (self.B[:6] @ stages[:6])
+            error = self.get_error(state, new_state, stages, h)
+
+            if error <= 1 or h <= self.min_time_increment:
+                break
+
+            self.rejected_steps += 1
+            h = max(h * max(self.min_factor, self.safety * error ** -0.2), self.min_time_increment)
+
+        if error == 0:
+            factor = self.max_factor
+        else:
+            factor = min(self.max_factor, self.safety * error ** -0.2)
+
+        # Stopping short for a discontinuity says nothing about how big the next step can be
+        if not limited or factor < 1:
+            self.next_time_increment = h * factor
+
+        self.steps += 1
+
+        return new_state, h
@@ -8,7 +8,7 @@ import pandas as pd
 from copy import deepcopy, copy
 
 from lib.presetObject import PresetObject
-from lib.data import nested_dictionary_lookup, force_save
+from lib.data import compile_nested_lookup, force_save
 from lib.general import magnitude
 from lib.logging.logger_features import Feature, feature_time
 
@@ -18,7 +18,8 @@ class Logger(PresetObject):
         Logs only the src.data.
         Should be hooked into the Simulation object, but a reference also has to be set in the Rocket object.
         
-        Stores an array of objects, since I think that is slightly better than appending to a dataframe.
+        Stores every feature in its own preallocated column, since building a dict for every row was most of the runtime on small time increments.
+        The columns are laid out on the first logged frame. Features added after that get columns that are empty (NaN) for the rows before them, and features that are taken away leave their columns behind.
     """
 
     def __init__(self, simulation, **kwargs):
@@ -27,60 +28,147 @@ class Logger(PresetObject):
         self.simulation = simulation
         self.splitting_arrays = True
         self.features: set[Feature] = set([feature_time])
+        # Only every nth frame gets logged. Replaces going back through the csv with CompressCSVFiles afterwards
+        self.log_every = 1
+        # Number of rows to allocate at the start. The columns double whenever they fill up
+        self.initial_capacity = 1024
         # This should probably be overridden in custom subclasses, like one for rocket and motor.
         self.full_path = "./output.csv"
 
         super().overwrite_defaults(**kwargs)
 
-        self.rows = []
-        self.current_row = {}
+        self.frames_seen = 0
+        self.row_count = 0
+        self.capacity = 0
+        # Each accessor is (label, lookup function, column labels or None if the value is not split)
+        self.accessors = None
+        self.compiled_features = None
+        self.columns: dict[str, np.ndarray] = {}
 
     def copy(self):
         # Hopefully this is being called from the simulation and the rocket I am about to make gets overridden (This comment exists from a time when I was working on the Goddard Problem Optimization)
         return deepcopy(self)
 
-    def add_items(self, data):
+    #region Columns
+    def compile_features(self):
         """
-            Update the current row of data, which should eventually be saved by save_row
+            Turn the feature paths into getter functions, so that the path string does not have to be split every frame.
+            If rows have already been logged, they are kept, and only the new features get columns.
         """
-        if self.splitting_arrays:
-            k = list(data.keys())[0]
-            v = list(data.values())[0]
+        # The features that were already being logged keep their columns
+        split_labels = {label: split for label, _, split in self.accessors or []}
 
+        accessors = []
+        for feature in self.features:
+            label = feature.get_label()
+            accessor = compile_nested_lookup(feature.path)
+
+            if self.capacity == 0:
+                # Laid out by create_columns on the first frame
+                accessors.append((label, accessor, None))
+            elif label in split_labels:
+                accessors.append((label, accessor, split_labels[label]))
+            else:
+                accessors.append(self.add_columns(label, accessor))
+
+        self.accessors = accessors
+        self.compiled_features = frozenset(self.features)
+
+    def lookup(self, label, accessor):
+        try:
+            return accessor(self.simulation)
+        except Exception as e:
+            print(f"Could not find value for {label}")
+            print(e)
+
+            return None
+
+    def create_columns(self):
+        """
+            Use the first frame to figure out which values are arrays that need to be split into multiple columns.
+        """
+        self.capacity = self.initial_capacity
+
+        self.accessors = [self.add_columns(label, accessor) for label, accessor, _ in self.accessors]
+
+    def add_columns(self, label, accessor):
+        """
+            Make the columns for one feature from its current value. They start out as NaN, so any rows that were logged before the feature was added are empty.
+            Returns the accessor with its split column labels
+        """
+        value = self.lookup(label, accessor)
 
-            if isinstance(v, np.ndarray):
-                if len(v) != 0:
-                    data = {}
-                    index = 1
-                    for item in v:
-                        data[k + str(index)] = item
+        split_labels = None
+        if self.splitting_arrays and isinstance(value, np.ndarray) and value.ndim == 1 and len(value) != 0:
+            split_labels = [label + str(index + 1) for index in range(len(value))]
 
-                        index += 1
+        # Booleans would get turned into ones and zeros in a float column
+        dtype = object if isinstance(value, (bool, np.bool_)) else "float64"
+        for column_label in split_labels or [label]:
+            # A feature that was taken away and added back keeps what it already logged
+            if column_label not in self.columns:
+                self.columns[column_label] = np.full(self.capacity, np.nan, dtype=dtype)
 
-        self.current_row.update(data)
+        return label, accessor, split_labels
 
-    def save_row(self):
-        self.rows.append(self.current_row)
-        self.current_row = {}
+    def grow_columns(self):
+        self.capacity *= 2
+
+        for label, column in self.columns.items():
+            # Filled with NaN so that the columns of features that were taken away stay empty
+            grown = np.full(self.capacity, np.nan, dtype=column.dtype)
+            grown[:self.row_count] = column[:self.row_count]
+            self.columns[label] = grown
+
+    def set_value(self, label, value):
+        """
+            Write to the current row. Anything that will not fit in a float (None, strings, whole arrays) turns the column into an object column.
+        """
+        column = self.columns[label]
+
+        try:
+            column[self.row_count] = np.nan if value is None else value
+        except (TypeError, ValueError):
+            column = column.astype(object)
+            column[self.row_count] = copy(value)
+            self.columns[label] = column
+
+    #endregion
 
     def handle_frame(self):
         """
             This is the only thing that needs to be run for the logger to work in the Simulation class (also the save_to_csv)
         """
-        for feature in self.features:
-            try:
-                value = copy(nested_dictionary_lookup(self.simulation, feature.path))
-            except Exception as e:
-                value = None
-                print(f"Could not find value for {feature}")
-                print(e)
-                
-            self.add_items({feature.get_label(): value})
+        self.frames_seen += 1
+        if (self.frames_seen - 1) % self.log_every != 0:
+            return
+
+        if self.compiled_features != self.features:
+            self.compile_features()
+
+        if self.capacity == 0:
+            self.create_columns()
+        elif self.row_count == self.capacity:
+            self.grow_columns()
+
+        for label, accessor, split_labels in self.accessors:
+            value = self.lookup(label, accessor)
+
+            if split_labels is None:
+                self.set_value(label, value)
+                continue
+
+            for index, column_label in enumerate(split_labels):
+                try:
+                    self.set_value(column_label, value[index])
+                except (TypeError, IndexError):
+                    self.set_value(column_label, None)
 
-        self.save_row()
+        self.row_count += 1
 
     def get_dataframe(self):
-        df = pd.DataFrame(self.rows)
+        # The column slices are views, so the data is not copied until pandas decides it needs to
+        df = pd.DataFrame({label: column[:self.row_count] for label, column in self.columns.items()}, copy=False)
 
         try:
             # Rather than using the index (0, 1, 2, 3, 4...), I will index the rows by the time the row is recorded at
@@ -100,7 +188,7 @@ class Logger(PresetObject):
         """
             Reinitialize the Logger object
         """
-        self.__init__(self.simulation, self.features)
+        self.__init__(self.simulation, features=self.features, log_every=self.log_every)
 
 class FeedbackLogger(Logger):
     def print(self, statement):
@@ -1,5 +1,4 @@
 
-import matplotlib.pyplot as plt
 import pandas as pd
 
 from lib.units import Units
@@ -22,6 +21,8 @@ class Feature:
 
 
 def plot_feature(data: pd.DataFrame, horizontal: Feature, *verticals: Feature):
+    import matplotlib.pyplot as plt
+
     plt.xlabel(horizontal.get_label())
     y_labels = [vertical.name for vertical in verticals]
     y_label = ", ".join(y_labels)
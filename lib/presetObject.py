@@ -6,6 +6,51 @@ import copy
 import pickle
 from abc import ABCMeta
 
+import numpy as np
+import pandas as pd
+
+
+# Values that can be changed in place, so the saved state needs its own copy of them
+# Everything else (numbers, strings, functions, lookup tables, other preset objects) is only ever replaced, so the saved state can share it
+mutable_types = (list, dict, set, np.ndarray, pd.DataFrame, pd.Series)
+
+# The objects that are partway through resetting, so that objects that reference each other only get reset once
+resetting = set()
+
+
+def snapshot_value(value):
+    if isinstance(value, mutable_types):
+        return value.copy()
+
+    return value
+
+
+def saved_copy(value, memo):
+    """
+    Deep copy a value from a saved state, but make every preset object in it from that object's own saved state instead of from how it is now.
+    The saved states only hold other preset objects by reference, so this is what keeps get_config from picking up everything that has happened to them since
+    """
+    if id(value) in memo:
+        return memo[id(value)]
+
+    if isinstance(value, PresetObject):
+        saved = type(value).__new__(type(value))
+        memo[id(value)] = saved
+
+        saved.__dict__.update({key: saved_copy(item, memo) for key, item in value.saved_state.items()})
+        saved.update_saved_state()
+        return saved
+
+    # Containers of preset objects, like the mass objects of a rocket
+    if isinstance(value, (list, tuple)):
+        return type(value)(saved_copy(item, memo) for item in value)
+
+    if isinstance(value, dict):
+        return {key: saved_copy(item, memo) for key, item in value.items()}
+
+    return copy.deepcopy(value, memo)
+
+
 class PresetObject(metaclass=ABCMeta):
     def __init__(self, **kwargs):
         self.overwrite_defaults(**kwargs)
@@ -23,13 +68,21 @@ class PresetObject(metaclass=ABCMeta):
         self.update_saved_state()
 
     def update_saved_state(self):
-        self.saved_state = copy.deepcopy(self.__dict__)
+        """
+        Remember the defaults and everything that was overwritten. Called several times while an object is made (once for every class in the inheritance chain), so it has to be cheap.
+        Nothing is deep copied: attributes that get replaced later don't affect the saved state anyway, so only the arrays and containers that could be changed in place are copied.
+        Preset objects are saved by reference, and they have their own saved states
+        """
+        self.saved_state = {key: snapshot_value(value) for key, value in self.__dict__.items() if key != "saved_state"}
 
 
     def get_config(self):
         """Get the saved self variable from right after initialization"""
         # This is an oversimplification, and maybe I should only save the things that have defaults
-        return self.saved_state
+        # The full copy is only made here, since almost nothing ever asks for it. The preset objects in it are also from right after their initialization
+        saved = saved_copy(self, {})
+
+        return {key: value for key, value in saved.__dict__.items() if key != "saved_state"}
 
     def save_preset(self, name):
         # Using pickle because I'm not sure json plays nice with numpy
@@ -50,7 +103,20 @@ class PresetObject(metaclass=ABCMeta):
         self.__init__(**config)
 
     def reset(self):
-        self.overwrite_defaults(self.saved_state)
+        """Go back to the saved state. The preset objects in the saved state are reset too, so resetting a simulation resets its rocket and environment"""
+        if id(self) in resetting:
+            return
+
+        resetting.add(id(self))
+        try:
+            for value in self.saved_state.values():
+                if isinstance(value, PresetObject):
+                    value.reset()
+
+            # Copied again, so that the saved state can be used more than once
+            self.overwrite_defaults(**{key: snapshot_value(value) for key, value in self.saved_state.items()})
+        finally:
+            resetting.discard(id(self))
 
     def copy(self):
         return copy.deepcopy(self)
@@ -79,13 +79,16 @@ class Simulation(PresetObject, metaclass=ABCMeta):
     def initialize_simulation(self):
         pass
 
-    def simulate_step(self):
+    def simulate_step(self, time_increment=None):
+        """
+            Pass in the time increment if the frame did not use the normal one, like with an adaptive integrator
+        """
         if self.logger is not None:
             # Also saves the row
             self.logger.handle_frame()
 
         self.frames += 1
-        self.time += self.time_increment
+        self.time += self.time_increment if time_increment is None else time_increment
 
     def end(self):
         if self.logger is not None and self.automatically_save:
@@ -102,6 +105,8 @@ class Simulation(PresetObject, metaclass=ABCMeta):
         return self.max_frames == -1 or self.max_frames > self.frames
 
     def run_simulation(self):
+        self.initialize_simulation()
+
         try:
             if self.stop_on_error:
                 while not self.is_finished() and self.frames_remaining:
@@ -6,7 +6,7 @@ import os
 import pandas as pd
 
 from lib.general import interpolate
-from lib.data import interpolated_lookup, riemann_sum
+from lib.data import LookupTable, riemann_sum
 from xml.dom import minidom
 
 
@@ -65,6 +65,7 @@ def create_linearly_interpolated_CG(CG_data_file, thrust_data_file, output_path,
     mass_CG_lookup["mass"] *= 1000
     max_mass = mass_CG_lookup["mass"][0]
     min_mass = mass_CG_lookup["mass"][len(mass_CG_lookup["mass"]) - 1]
+    CG_by_mass = LookupTable.from_dataframe(mass_CG_lookup, "mass", "CG", safe=True)
 
     thrust_profile = pd.read_csv(thrust_data_file)
     total_impulse = riemann_sum(thrust_profile["time"], thrust_profile["thrust"])
@@ -83,7 +84,7 @@ def create_linearly_interpolated_CG(CG_data_file, thrust_data_file, output_path,
         # As we move up to the total impulse, we should be moving down to the min mass
         mass = interpolate(current_total, 0, total_impulse, max_mass, min_mass)
         # Convert to mm
-        cg = 1000 * interpolated_lookup(mass_CG_lookup, "mass", mass, "CG", safe=True)
+        cg = 1000 * CG_by_mass(mass)
 
         src.data.appendChild(create_row_xml(root, row, mass, cg))
 
@@ -1,18 +1,19 @@
 # MODEL THE GRAIN BURN AREA OVER REGRESSION
 # Generate input-output data for the 2D cross-section surface area of the fuel grain given a base shape and the regression rate
-# It uses a model where whether a pixel is regressed away is determined by that pixel's distance from the combustion area.
-
-# TODO: I don't really feel comfortable using this model until I can show that regression by 50 pixels for a circular thing is accurate
-# I also think that this model really isn't conducive to being solved iteratively, but it must be in order to properly work through cracks and stuff. Maybe I will do some thinking about what the optimum pixel count to regress by is.
-
+# Every bit of fuel burns away once the flame front has regressed as far as that fuel is from the port, so the whole burnback comes from one signed distance field of the starting port.
+# The front at any regression is a contour of that field. Its length is found to a fraction of a pixel with marching squares, and it outputs the same table as regressionlookup.csv
 
 # SOURCES OF ERROR:
-# It is not totally accurate to represent curved shapes with pixels. I thought this error would go away as pixels -> infinity, but it did not. The error appears to flatten out at about 5% overestimation for a circle, but that number will obviously vary with different shapes.
-# I think it probably depends on the roundness of the shape. A very big circle would be better than a small one.
+# The distances are straight lines, so a wall that sticks out into the fuel does not shadow the fuel behind it.
+# The starting port is still a staircase of pixels, so the perimeter of a circle is about 5% too big for the first few pixels of regression. It smooths out to under 1% after that.
 
 import numpy as np
+import pandas as pd
 from PIL import Image
 from matplotlib import pyplot as plt
+from scipy.ndimage import distance_transform_edt
+
+from src.constants import input_path
 
 # I think it should be pretty flat on all of the sides, so push all of the pixels up one i and down one i, then chop off that top pointy bit
 
@@ -77,272 +78,153 @@ def display_image(array):
 
 
 
-# The best, most efficient way to do this, is to compose the grain shape of lines determined mathematically (svg), then extend them by their normal values
-
-# The way discussed in https://digitalcommons.usu.edu/cgi/viewcontent.cgi?article=2378&context=etd&httpsredir=1&referer= is to blur a pixelated image of the grain, then delete all of the pixels that aren't fully black.
-
-# There is definitely a much better way to do this, which I implement here
-
-# Take the pixelated image. Determine all of the edge pixels (diagonals only)
-# Determine which pixels are within a circle of the pixel by looping through all of the pixels less than ... away
-# TODO: Figure out this equation, I think you can do it with sine and cosine
-# Add the first and last x of every loop to the new possible edge pixels (only if it changes the color of the pixel)
-# Loop through all of the possible edge pixels, checking if that pixel is an edge
-
-# If there is a black pixel adjacent (not diagonal) to the pixel to check, it is an edge
-def is_edge(i, j, image):
+#region Burnback
+def get_signed_distance(pixel_mask):
     """
-    Checks if any adjacent pixels are black
-    Assumes the pixel being check is white
+    The distance from the edge of the port to the center of every pixel, in pixels. It is negative inside of the port.
+    The walls are treated like fuel that never burns, so they do not change the distances.
     """
-    if i != len(image) - 1 and image[i + 1][j] == 0:
-        return True
+    port = pixel_mask == 1
 
-    if i != 0 and image[i - 1][j] == 0:
-        return True
+    # The edge is halfway between the centers of a port pixel and a fuel pixel
+    outside = distance_transform_edt(~port) - 0.5
+    inside = distance_transform_edt(port) - 0.5
 
-    if j != len(image[0]) - 1 and image[i][j + 1] == 0:
-        return True
+    return np.where(port, -inside, outside)
 
-    if j != 0 and image[i][j - 1] == 0:
-        return True
 
-    return False
-
-
-def is_adjacent(a, b):
+def get_squares(signed_distance, wall=None):
     """
-    Accepts two tuples of indices, returns whether they are off by one
+    The squares of four neighboring pixel centers that marching squares goes through, as (values, sides, lows, highs). They do not change with the regression, so a whole table can reuse them.
+    The values are the distances at the corners of every square, going around it: top left, top right, bottom right, bottom left. Sides is which of the four sides between them do not touch a wall.
+    Lows and highs are the smallest and largest distance in each square.
     """
+    if wall is None:
+        wall = np.zeros(signed_distance.shape, dtype=bool)
 
-    if a[0] == b[0]:
-        if a[1] == b[1] + 1 or a[1] == b[1] - 1:
-            return True
-    elif a[1] == b[1]:
-        if a[0] == b[0] + 1 or a[0] == b[0] - 1:
-            return True
-
-    return False
-
-
-def is_diagonal(a, b):
-    x_off = a[0] - b[0]
-    y_off = a[1] - b[1]
-
-    return abs(x_off) == 1 and abs(y_off) == 1
-
+    # Anything off of the edge of the image is a wall as well
+    field = np.pad(signed_distance, 1, mode="edge")
+    wall = np.pad(wall, 1, constant_values=True)
 
-def is_diagonal_without_fuel(a, b, image):
-    if not is_diagonal(a, b):
-        return False
+    corners = [(slice(None, -1), slice(None, -1)), (slice(None, -1), slice(1, None)), (slice(1, None), slice(1, None)), (slice(1, None), slice(None, -1))]
+    values = np.array([field[corner].ravel() for corner in corners])
+    walls = np.array([wall[corner].ravel() for corner in corners])
 
-    # check if the cells in between are oxidizer (they should be for it to be diagonal)
-    if image[a[0], b[1]] == 1 or image[b[0], a[1]] == 1:
-        return True
+    # The front is never along a wall
+    sides = ~(walls | np.roll(walls, -1, axis=0))
 
-    return False
+    # Only the squares that are not walls all the way around can ever have the front in them
+    usable = np.any(sides, axis=0)
 
+    values = values[:, usable]
 
-def is_ox_edge(i, j, image):
-    return image[i, j] == 1 and is_edge(i, j, image)
+    return values, sides[:, usable], np.min(values, axis=0), np.max(values, axis=0)
 
 
-def get_edges(possible_indices, image):
-    edges = []
-    for possible_index in possible_indices:
-        i, j = possible_index
-        if is_edge(i, j, pixels):
-            edges.append((i, j))
+# Where every corner is, in (x, y) from the top left of the square
+corner_positions = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype="float64")
 
-    return edges
-
-
-def regress_fuel_grain(distance, image, edges):
+def get_burn_perimeter(signed_distance, regression, wall=None, squares=None):
     """
-    Move the fuel grain back from the normal by a given distance (in pixels)
-    The distance can be calculated by regression rate * time
-    Returns the new image and the new possible edges
+    The length of the flame front once it has regressed the given distance, in pixels.
+    Marching squares: every square of four pixel centers that the front passes through adds the length of the front inside of it, found by interpolating where the front crosses each side.
+    Pass in the squares from get_squares to skip finding them again.
     """
+    if squares is None:
+        squares = get_squares(signed_distance, wall)
+    values, sides, lows, highs = squares
 
-    distance += 0.5
-
-    possible_edges = []
-
-    for edge_index in edges:
-        base_i, base_j = edge_index
-        # Determine which pixels are within a circle of the pixel by looping through all of the pixels less than ... away
-        i_offset = int(np.floor(distance))
-        min_i = base_i - i_offset
-        max_i = base_i + i_offset
-
-        for i in range(min_i, max_i + 1):
-            j_offset = int(
-                np.floor(((distance ** 2 - (i - base_i) ** 2) ** (1 / 2))))
-            min_j = base_j - j_offset
-            max_j = base_j + j_offset
-
-            # Not working right now because there is an edge pixel I'm not including
-
-            # Need a special case for min and max because that is where the edge of the circle is
-            # This is where meta programming would be better because I could insert it into the loop and it would be equally fast
-            if image[i, min_j] == 0:
-                image[i, min_j] = 1
-                possible_edges.append((i, min_j))
-
-            # Add the first and last x of every loop to the new possible edge pixels (only if it changes the color of the pixel)
-
-            if image[i, max_j] == 0:
-                image[i, max_j] = 1
-                possible_edges.append((i, max_j))
-
-            # There is no minus one on max_j because it is automatically exclusive
-            for j in range(min_j + 1, max_j):
-                if image[i, j] == 0:
-                    image[i, j] = 1
-
-                    # I tink tis simple ceck makes it faster
-                    if i == min_i or i == max_i:
-                        possible_edges.append((i, j))
-                    elif np.sqrt((i - base_i) ** 2 + (j - base_j) ** 2) > (distance - 1):
-                        possible_edges.append((i, j))
-
-
-    return possible_edges
-
-
-# FIXME: For some reason this somewhat (5%) overestimates the total edge distance of a large circle
-# It doesn't overestimate the small circle by as much
-# I would think it would get more accurate as the circle gets bigger
-# I think that makes sense, as the number of pixels increases though it should improve
-def get_edge_distance(edges, pixels):
-    "From an unordered list of edges in 2D, calculate the path between them"
-    # I think maybe te easiest to do is to steal the algorithm from a machine learning
-    # https://docs.opencv.org/3.3.1/d4/d73/tutorial_py_contours_begin.html
-    # Matlab bwboundaries
-
-    # Actually, I should probably make my own algorithm because those will not use the known edges
-    edges = edges.copy()
-
-    distance = 0  # in pixels
-
-    adjacent_distance = 1
-    diagonal_distance = np.sqrt(2)
-
-    # Start at edge index 0 (this is basically random)
-    current_edge = edges[0]
-    current_index = 0
-
-    # While there are still edges
-    while (len(edges) > 0):
-        connected = None
-        to_add = 0
-        for edge, index in zip(edges, range(len(edges))):
-
-            # Check if any of the edges are adjacently connected to the active edge
-            if is_adjacent(edge, current_edge):
-                # to_add the distance depending on whether it is adjacent or diagonal
-                to_add = adjacent_distance
-                connected = edge
-                connected_index = index
-                pixels[edge[0], edge[1]] = 2
-                break
-            # Check if any of the edges are diagonally connected to the active (there cannot be any fuel grain in between them)
-            elif is_diagonal_without_fuel(edge, current_edge, pixels):
-                to_add = diagonal_distance
-                connected = edge
-                connected_index = index
-                break
-
-
-        # Set the current edge to the newly found edge. Delete the old edge
-        if connected is not None:
-            distance += to_add
-            try:
-                del edges[current_index]
-                current_edge = connected
-            except:
-                break
-
-            # If we just deleted an index beneath it, you need to decrement the index we will use next by one
-            if current_index < connected_index:
-                connected_index -= 1
-
-            current_index = connected_index
-        else:
-            # If there are no connected edges, delete the edge, add no distance, and set the new current_edge to the index zero
-            del edges[current_index]
-            try:
-                current_edge = edges[0]
-                current_index = 0
-            except:
-                break
-
-    return distance
-
-
-# TODO: further testing required for internal circle
-# Gear demonstrates issues best
-if __name__ == "__main__":
-    base_path = "Data/Input/RegressionImages/"
-    file_name = "gear.png"
-    pixels = load_image(base_path + file_name)
-
-    # Take the pixelated image. Determine all of the edge pixels (directly adjacent to fuel only, should generate a diagonal line)
-    edges = []
+    # The front only passes through the squares that have corners on both sides of it, which is a thin band of them
+    in_band = (lows < regression) & (highs >= regression)
+    values = values[:, in_band]
+    sides = sides[:, in_band]
+    burned = values < regression
 
-    # It's okay to do this over all of the pixels just the one time, but the repeated algorithm needs to be faster
-    for i in range(len(pixels)):
-        for j in range(len(pixels[0])):
-            if is_ox_edge(i, j, pixels):
-                edges.append((i, j))
+    points = []
+    crosses = []
+    for start in range(4):
+        end = (start + 1) % 4
 
+        crosses.append((burned[start] != burned[end]) & sides[start])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.clip((regression - values[start]) / (values[end] - values[start]), 0, 1)
 
-    r = 0
-    total_regression = 50
-    iters = 15
-    interp_increment = total_regression / iters
-    regressions = []
-    areas = []
+        points.append(corner_positions[start] + fraction[:, np.newaxis] * (corner_positions[end] - corner_positions[start]))
 
+    points = np.array(points)
+    crosses = np.array(crosses)
+    crossing_count = np.sum(crosses, axis=0)
 
+    def segment_length(first, second):
+        return np.sqrt(np.sum((first - second) ** 2, axis=-1))
 
-    # Generate data
-    for _ in range(iters):
+    # With two crossings, the front goes straight from one to the other
+    squares_index = np.arange(len(crossing_count))
+    first = np.argmax(crosses, axis=0)
+    last = 3 - np.argmax(crosses[::-1], axis=0)
+    single = segment_length(points[first, squares_index], points[last, squares_index])
 
-        possible_edges = regress_fuel_grain(interp_increment, pixels, edges)
-        save_image(base_path + file_name + "Regressed" + str(r) + ".png", pixels)
+    # With four, it is a saddle. If the middle matches the top left corner, the front cuts off the other two corners, otherwise it cuts off the top left and bottom right
+    middle_burned = np.mean(values, axis=0) < regression
+    cut_other_corners = segment_length(points[0], points[1]) + segment_length(points[2], points[3])
+    cut_top_left = segment_length(points[3], points[0]) + segment_length(points[1], points[2])
+    saddle = np.where(middle_burned == burned[0], cut_other_corners, cut_top_left)
 
-        # Loop through all of the possible edge pixels, checking if that pixel is an edge
-        edges = get_edges(possible_edges, pixels)
+    # An odd number only happens where the front runs into a wall, and it stops there
+    return np.sum(single[crossing_count == 2]) + np.sum(saddle[crossing_count == 4])
 
-        # Loop through the edge pixels and determine their distance
-        linear_surface_area = get_edge_distance(edges, pixels)
 
+def get_port_area(signed_distance, regression, wall=None):
+    """The area that has burned away once the front has regressed the given distance, in square pixels. Pixels that the front is partway through count for the part of them that has burned"""
+    coverage = np.clip(regression - signed_distance + 0.5, 0, 1)
 
-        regressions.append(r)
-        areas.append(linear_surface_area)
+    if wall is not None:
+        coverage[wall] = 0
 
-        r += interp_increment
+    return np.sum(coverage)
 
 
+def create_regression_table(pixel_mask, pixel_size, max_regression=None, count=100):
+    """
+    Burn the port in a pixel mask (from load_image) back and record it in the format of regressionlookup.csv, which graingeometry.get_areas_csv reads.
+    The burn area and port volume are per meter of grain length.
 
+    :param double pixel_size: how many meters wide each pixel is
+    :param double max_regression: how far to regress (in meters). Defaults to the distance to the last bit of fuel
+    :param int count: how many rows to output
+    """
+    signed_distance = get_signed_distance(pixel_mask)
+    wall = pixel_mask == -1
+    squares = get_squares(signed_distance, wall)
 
+    if max_regression is None:
+        max_regression = (np.max(signed_distance[pixel_mask == 0]) + 0.5) * pixel_size
 
-    print(regressions, areas)
-    plt.plot(regressions, areas)
-    plt.show()
+    regressions = np.linspace(0, max_regression, count)
 
-    # linear_surface_area = get_edge_distance(edges, pixels)
-    # print(linear_surface_area)
+    port_areas = np.array([get_port_area(signed_distance, regression / pixel_size, wall) for regression in regressions]) * pixel_size ** 2
+    burn_areas = np.array([get_burn_perimeter(signed_distance, regression / pixel_size, squares=squares) for regression in regressions]) * pixel_size
 
-    # display_image(pixels)
+    return pd.DataFrame({
+        "LengthRegressed": regressions,
+        # A one meter long section of the grain
+        "PortVolume": port_areas * 1,
+        "PortArea": port_areas,
+        "BurnArea": burn_areas * 1,
+    })
 
+#endregion
 
 
+if __name__ == "__main__":
+    base_path = f"{input_path}/regression/"
+    file_name = "gear.png"
+    pixels = load_image(base_path + file_name)
 
-# Other possible approaches:
+    # The image is assumed to be the full 6 inch outer diameter of the grain
+    table = create_regression_table(pixels, pixel_size=0.1524 / len(pixels))
+    table.to_csv(base_path + file_name.replace(".png", "Lookup.csv"), index=False)
 
-# I can see the vague outlines of something linear algebra based in my head
-# Multiply each pixel by an edge detector
-# Multiply each pixel by a circle matrix to see if it is close enough
-# If I can get the distance calculation vectorized, that way will be faster than this
+    print(table)
+    plt.plot(table["LengthRegressed"], table["BurnArea"])
+    plt.show()
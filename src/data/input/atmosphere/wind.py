@@ -3,11 +3,14 @@
 from lib.general import interpolate_looped, vector_from_angle
 from lib.presetObject import PresetObject
 from noise import pnoise1
-import matplotlib.pyplot as plt
 import numpy as np
-import scipy.stats as st
+from math import erfc, sqrt
 
 
+# The standard deviation only depends on the settings of the noise, so it is only calculated once for each of them
+# Keyed by (count, octaves, interpolation_speed)
+std_cache = {}
+
 
 # TODO: write some custom functions that work as settings for the wind
 # One can be a constant magnitude
@@ -44,6 +47,13 @@ class Wind(PresetObject):
         self.average_wind_speed = 5
         self.roughness = 1
 
+        # Instead of summing the noise from every seed on every call, sample it once onto a grid of times and interpolate
+        # The wind is only random in time, so there is nothing to gain from a grid in altitude
+        self.use_table = False
+        self.table_time_increment = 0.1 # seconds
+        # How far the table reaches every time it has to be extended
+        self.table_duration = 300 # seconds
+
 
         self.overwrite_defaults(**kwargs)
 
@@ -57,8 +67,14 @@ class Wind(PresetObject):
         self.wind_direction = self.start_direction
         self.target_direction = self.get_random_direction()
 
-        # Have to manually calculate normalized perlin noise deviation
-        self.std = self.determine_std()
+        # Have to manually calculate normalized perlin noise deviation, but not until the wind is actually used
+        # Plenty of environments never use their wind, and it takes half a second the first time
+        self._std = None
+
+        self.clear_table()
+        # The rocket asks for the air speed several times every frame, always at the same time and altitude
+        self.last_query = None
+        self.last_air_velocity = None
 
 
 
@@ -72,12 +88,21 @@ class Wind(PresetObject):
 
         return total / self.count
 
+    def sample_normal_perlin(self, times):
+        """Same as get_normal_perlin, but for an array of times"""
+        total = np.zeros(len(times))
+        for seed in self.seeds:
+            total += np.fromiter((pnoise1(seed + time, self.octaves, self.base) for time in times), dtype="float64", count=len(times))
+
+        return total / self.count
+
     def get_z_score(self, mean, std, val):
         return (val - mean) / std
 
     def get_percentile_from_z(self, z):
         # Get the cumulative distribution function for a normal distribution based on a z-value
-        return st.norm.cdf(z)
+        # Same as scipy.stats.norm.cdf (and scipy.special.ndtr) without importing scipy just for this
+        return 0.5 * erfc(-z / sqrt(2))
 
     def lookup_weibull(self, p, average):
         "Given the percentile, return the multiplier based on the weibull shape parameter and the average"
@@ -86,29 +111,74 @@ class Wind(PresetObject):
 
         return (-np.log(1 - p)) ** (1 / self.weibull_shape) * average
 
-    def determine_std(self):
-        size = 10000
+    @property
+    def std(self):
+        if self._std is None:
+            self._std = self.get_std()
 
+        return self._std
 
-        ys = [[] for _ in range(self.count)]
+    @std.setter
+    def std(self, std):
+        self._std = std
 
+    def get_std(self):
+        key = (self.count, self.octaves, self.interpolation_speed)
 
-        for index in range(len(ys)):
-            for i in range(size):
-                # Actually, I don't think time increment even needs to be included in tis
-                ys[index].append(pnoise1(
-                    self.seeds[index] + i * self.interpolation_speed, self.octaves))
+        if key not in std_cache:
+            # The deviation is a property of the noise settings, not of the seeds, so it uses the same seeds every time
+            # Otherwise it would depend on which wind was made first
+            seeds = np.random.default_rng(0).random(self.count) * self.count * 100
+            streams = self.sample_streams(seeds)
 
-        average_ys = []
-        for i in range(len(ys[0])):
-            total = 0
-            for j in range(len(ys)):
-                total += ys[j][i]
+            # The seeds are independent, so the variance of their average is the average variance over the count
+            # Sampling the deviation of the average directly is much noisier, since the slow parts of the noise don't cancel out in such a short window
+            std_cache[key] = np.sqrt(np.mean(np.var(streams, axis=1)) / self.count)
 
-            average_ys.append(total / len(ys))
+        return std_cache[key]
 
+    def determine_std(self, seeds=None):
+        """The deviation of the average noise for a specific set of seeds (this wind's own by default)"""
+        if seeds is None:
+            seeds = self.seeds
 
-        return np.std(average_ys)
+        return np.std(np.mean(self.sample_streams(seeds), axis=0))
+
+    def sample_streams(self, seeds, size=10000):
+        # Actually, I don't think time increment even needs to be included in tis
+        offsets = np.arange(size) * self.interpolation_speed
+
+        return np.array([np.fromiter((pnoise1(seed + offset, self.octaves) for offset in offsets), dtype="float64", count=size) for seed in seeds])
+
+    # endregion
+
+
+    # region Table
+    def clear_table(self):
+        """Throw out the sampled noise. Has to be called if the seeds or the noise settings are changed after it is built"""
+        self.table_times = np.empty(0)
+        self.table_noise = np.empty(0)
+
+    def extend_table(self, time):
+        """Sample the noise far enough past the given time"""
+        start = len(self.table_times)
+        end = int(np.ceil((time + self.table_duration) / self.table_time_increment))
+
+        # Built from indices so that extending the table does not add up floating point error
+        times = np.arange(start, end + 1) * self.table_time_increment
+
+        self.table_times = np.concatenate([self.table_times, times])
+        self.table_noise = np.concatenate([self.table_noise, self.sample_normal_perlin(times * self.interpolation_speed)])
+
+    def get_noise(self, time):
+        """The normalized perlin noise at a time, either calculated directly or interpolated from the table"""
+        if not self.use_table:
+            return self.get_normal_perlin(time * self.interpolation_speed)
+
+        if len(self.table_times) == 0 or time > self.table_times[-1]:
+            self.extend_table(time)
+
+        return np.interp(time, self.table_times, self.table_noise)
 
     # endregion
 
@@ -131,11 +201,14 @@ class Wind(PresetObject):
         Gets the air speed in all three dimensions at a point in time
         :param float base_altitude: The altitude AGL in meters where the average wind speed was recorded
         """
+        if self.last_query == (time, altitude):
+            return np.copy(self.last_air_velocity)
+
+        value = self.get_noise(time)
 
         wind_unit_vector = vector_from_angle(
-            self.get_air_direction(time, altitude))
+            self.get_air_direction(time, altitude, value))
 
-        value = self.get_normal_perlin(time * self.interpolation_speed)
         z_score = self.get_z_score(0, self.std, value)
 
         p = self.get_percentile_from_z(z_score)
@@ -146,7 +219,12 @@ class Wind(PresetObject):
 
         # TODO: Add some variability to the wind direction, particularly as altitude changes
         # In meters per second
-        return wind_unit_vector * speed
+        air_velocity = wind_unit_vector * speed
+
+        self.last_query = (time, altitude)
+        self.last_air_velocity = air_velocity
+
+        return np.copy(air_velocity)
 
 
 
@@ -178,13 +256,14 @@ class Wind(PresetObject):
             start_direction, self.target_direction)
 
 
-    def get_air_direction(self, time, altitude=10):
+    def get_air_direction(self, time, altitude=10, value=None):
         # I am including altitude as an input, because as your altitude changes the wind direction will also change
 
         # The average direction is just a line moving from one randomly generated point on a circle to another randomly generated point on a circle. However, the direction has an additional perlin noise added to it, which makes it match the wobbliness of the real thing (visual inspection seems to say that direction variability is relatively independent of strength)
 
         # Maybe need some other variables for direction
-        value = self.get_normal_perlin(time * self.interpolation_speed)
+        if value is None:
+            value = self.get_noise(time)
         z_score = self.get_z_score(0, self.std, value)
 
         noise_component = z_score * 1
@@ -6,6 +6,7 @@
 
 # For some reason I did everything in kilojoules and kilograms.
 
+from dataclasses import dataclass
 from enum import Enum, auto
 import math
 import numpy as np
@@ -14,16 +15,47 @@ import numpy as np
 minimum_temperature = 273.15 - 90.82 # Kelvin
 critical_temperature = 309.57 # Kelvin; about 36 C = 96.8 F
 
+# Every property is a short series in some root of the reduced temperature. They are evaluated with Horner's method, which only takes the root once and works the same for floats and arrays
+liquid_density_coefficients = (0, 1.72328, -0.8395, 0.5106, -0.10412) # in (1 - Tr)^(1/3), exponentiated
+gas_density_coefficients = (0, -1.00900, -6.28792, 7.50332, -7.90463, 0.629427) # in (1/Tr - 1)^(1/3), exponentiated
+liquid_enthalpy_coefficients = (-200, 116.043, -917.225, 794.779, -589.587) # in (1 - Tr)^(1/3)
+vapor_enthalpy_coefficients = (-200, 440.055, -459.701, 434.081, -485.338) # in (1 - Tr)^(1/3)
+gaseous_enthalpy_coefficients = (-209.559, 61.3277, -52.5969, 249.352, -38.4368) # in Tr^(1/2)
+liquid_specific_heat_coefficients = (0.023454, 1, -3.80136, 13.0945, -14.5180) # in (1 - Tr), divided by (1 - Tr)
+gaseous_specific_heat_coefficients = (0.052187, -0.364923, 1, -1.20233, 0.536141) # in (1 - Tr)^(1/3), divided by (1 - Tr)^(2/3)
+
 class NitrousState(Enum):
     EQUILIBRIUM = auto()
     LIQUID_ONLY = auto()
     GAS_ONLY = auto()
     SUPERCRITICAL = auto()
 
+@dataclass(frozen=True)
+class SaturatedProperties:
+    """Everything about saturated nitrous at a temperature. Each one is a float or an array the same shape as the temperatures"""
+    temperature: float # K
+    vapor_pressure: float # bar
+    liquid_density: float # kg/m^3
+    vapor_density: float # kg/m^3
+    liquid_enthalpy: float # kJ/kg
+    vapor_enthalpy: float # kJ/kg
+    liquid_specific_heat: float # kJ/(kg*K)
+    vapor_specific_heat: float # kJ/(kg*K)
+
+    @property
+    def heat_of_vaporization(self):
+        # kJ / kg
+        return self.vapor_enthalpy - self.liquid_enthalpy
+
 def confirm_range(temperature: float, clamped=False, override_low=False, override_high=False):
     """
     If clamped, instead of throwing an error, it will return whichever extreme the function is still defined for. Useful only as a very rough approximation.
+    Also works for arrays of temperatures.
     """
+    # This gets called constantly, so it only checks for arrays (np.ndim is surprisingly slow)
+    if isinstance(temperature, np.ndarray) and temperature.ndim > 0:
+        return confirm_range_array(temperature, clamped, override_low, override_high)
+
     if isinstance(temperature, complex):
         temperature = temperature.real
 
@@ -43,6 +75,32 @@ def confirm_range(temperature: float, clamped=False, override_low=False, overrid
     
     return temperature
 
+def confirm_range_array(temperature, clamped=False, override_low=False, override_high=False):
+    """Same as confirm_range, but for every temperature in an array at once"""
+    temperature = np.real(temperature)
+
+    if not override_high and np.any(temperature > critical_temperature):
+        if not clamped:
+            raise ValueError(f"The model is not accurate beyond nitrous's critical point ({np.max(temperature)} > {critical_temperature})")
+
+        temperature = np.where(temperature > critical_temperature, critical_temperature - 0.1, temperature)
+
+    if not override_low and np.any(temperature < minimum_temperature):
+        if not clamped:
+            raise ValueError(f"The model is not accurate below Nitrous's boiling point ({np.min(temperature)} < {minimum_temperature})")
+
+        temperature = np.where(temperature < minimum_temperature, minimum_temperature + 0.1, temperature)
+
+    return temperature
+
+def evaluate_series(coefficients, x):
+    """coefficients[0] + coefficients[1] * x + coefficients[2] * x^2 + ..."""
+    total = 0
+    for coefficient in reversed(coefficients):
+        total = total * x + coefficient
+
+    return total
+
 def get_liquid_dynamic_viscosity(temperature: float, clamped=False):
     # Returns the value in N * s / m^2
     temperature = confirm_range(temperature, clamped)
@@ -72,10 +130,7 @@ def get_liquid_nitrous_density(temperature, clamped=False, override_low=False):
     # It looks reasonable even when it's purely liquid. It's basically a straight line of increasing density as it gets colder.
     temperature = confirm_range(temperature, clamped, override_low)
 
-    return 452 * np.e ** (1.72328 * (1 - (temperature / 309.57)) ** (1 / 3) -
-                          0.8395 * (1 - (temperature / 309.57)) ** (2 / 3) +
-                          0.5106 * (1 - (temperature / 309.57)) - 0.10412 *
-                          (1 - (temperature / 309.57)) ** (4 / 3))
+    return 452 * np.e ** evaluate_series(liquid_density_coefficients, (1 - temperature / 309.57) ** (1 / 3))
 
 
 minimum_liquid_density = get_liquid_nitrous_density(critical_temperature)
@@ -85,16 +140,10 @@ def get_gaseous_nitrous_density(temperature, clamped=False, override_low=False):
 
     temperature = confirm_range(temperature, clamped, override_low)
 
-    b1 = -1.00900
-    b2 = -6.28792
-    b3 = 7.50332
-    b4 = -7.90463
-    b5 = 0.629427
     Tr = temperature / 309.57
     pc = 452
     base = 1 / Tr - 1
-    exponent = b1 * base ** (1 / 3) + b2 * base ** (
-        2 / 3) + b3 * base + b4 * base ** (4 / 3) + b5 * base ** (5 / 3)
+    exponent = evaluate_series(gas_density_coefficients, base ** (1 / 3))
     
     try:
         return pc * np.e ** exponent
@@ -109,33 +158,19 @@ def get_specific_enthalpy_of_liquid_nitrous(temperature, clamped=False, override
     """
     temperature = confirm_range(temperature, clamped, override_low)
 
-    coefficients = [-200, 116.043, -917.225, 794.779, -589.587]
-    total = 0
-    for i in range(0, 5):
-        total += coefficients[i] * (1 - temperature / 309.57) ** ((i) / 3)
-
-    return total
+    return evaluate_series(liquid_enthalpy_coefficients, (1 - temperature / 309.57) ** (1 / 3))
 
 def get_specific_enthalpy_of_gaseous_nitrous(temperature, clamped=False, override_low=False):
     """Intended for nitrous that is not saturated"""
     temperature = confirm_range(temperature, clamped, override_low)
-    coefficients = [-209.559, 61.3277, -52.5969, 249.352, -38.4368]
-    total = 0
-    for i in range(5):
-        total += coefficients[i] * (temperature / critical_temperature) ** (i / 2)
 
-    return total
+    return evaluate_series(gaseous_enthalpy_coefficients, (temperature / critical_temperature) ** (1 / 2))
 
 def get_specific_enthalpy_of_nitrous_vapor(temperature, clamped=False, override_low=False):
     """Intended for saturated vapor. Temperature in Kelvin."""
     temperature = confirm_range(temperature, clamped, override_low)
     # kJ / kg
-    coefficients = [-200, 440.055, -459.701, 434.081, -485.338]
-    total = 0
-    for i in range(0, 5):
-        total += coefficients[i] * (1 - temperature / 309.57) ** ((i) / 3)
-
-    return total
+    return evaluate_series(vapor_enthalpy_coefficients, (1 - temperature / 309.57) ** (1 / 3))
 
 
 def get_heat_of_vaporization(temperature, clamped=False):
@@ -146,23 +181,43 @@ def get_heat_of_vaporization(temperature, clamped=False):
 def get_liquid_specific_heat(temperature, clamped=False, override_low=False):
     # kJ / (kg * K)
     temperature = confirm_range(temperature, clamped, override_low=override_low)
-    coefficients = [0.023454, 1, -3.80136, 13.0945, -14.5180]
-    total = 0
-    for i in range(0, 5):
-        total += coefficients[i] * (1 - temperature / 309.57) ** (i - 1)
+    base = 1 - temperature / 309.57
 
-    return 2.49973 * total
+    return 2.49973 * evaluate_series(liquid_specific_heat_coefficients, base) / base
 
 
 def get_gaseous_specific_heat(temperature, clamped=False, override_low=False):
     # kJ / (kg * K)
     temperature = confirm_range(temperature, clamped, override_low=override_low)
-    coefficients = [0.052187, -0.364923, 1, -1.20233, 0.536141]
-    total = 0
-    for i in range(0, 5):
-        total += coefficients[i] * (1 - temperature / 309.57) ** ((i - 2) / 3)
+    root = (1 - temperature / 309.57) ** (1 / 3)
+
+    return 132.632 * evaluate_series(gaseous_specific_heat_coefficients, root) / root ** 2
+
 
-    return 132.632 * total
+def get_saturated_properties(temperature, clamped=False, override_low=False) -> SaturatedProperties:
+    """
+    All of the saturated properties at once, for a temperature or an array of temperatures.
+    Checks the range and takes the roots of the reduced temperature once, instead of once for every property.
+    """
+    temperature = confirm_range(temperature, clamped, override_low)
+
+    Tr = temperature / critical_temperature
+    base = 1 - Tr
+    root = base ** (1 / 3)
+
+    with np.errstate(over="ignore"):
+        vapor_density = 452 * np.exp(evaluate_series(gas_density_coefficients, (1 / Tr - 1) ** (1 / 3)))
+
+    return SaturatedProperties(
+        temperature=temperature,
+        vapor_pressure=get_vapor_pressure(temperature),
+        liquid_density=452 * np.exp(evaluate_series(liquid_density_coefficients, root)),
+        vapor_density=vapor_density,
+        liquid_enthalpy=evaluate_series(liquid_enthalpy_coefficients, root),
+        vapor_enthalpy=evaluate_series(vapor_enthalpy_coefficients, root),
+        liquid_specific_heat=2.49973 * evaluate_series(liquid_specific_heat_coefficients, base) / base,
+        vapor_specific_heat=132.632 * evaluate_series(gaseous_specific_heat_coefficients, root) / root ** 2
+    )
 
 
 def get_maximum_liquid_expansion(temperature=293.15, max_temperature=None):
@@ -200,21 +255,8 @@ def get_liquid_mass(volume: float, mass: float, temperature: float, override_low
     return (volume - mass / gas_density) / (1 / liquid_density - 1 / gas_density)
 
 
-# Unfortunately, binary search doesn't appear to work here, because the function I have for the enthalpy of gaseous nitrous is not always increasing wrt to temperature. I have no idea how this is possible.
-def calculate_temperature(volume: float, mass: float, heat: float, iters=10) -> tuple[float, NitrousState]:
-    """
-    The volume represents the volume of the receptacle.
-    The mass is the equivalent mass of liquid
-    The heat is the equivalent to the enthalpy in the system. This is very badly named.
-
-    Note that the range is about 130 K that it could be, so do 130 / 2^iters to figure out your accuracy.
-
-    returns a tuple with the temperature first, then the phase.    
-    """
-    # We return room temperature if there is nothing in here.
-    if mass == 0:
-        return 293, NitrousState.GAS_ONLY
-
+def get_supercritical_temperature(volume: float, mass: float, heat: float):
+    """Returns the temperature if there is enough heat and mass to go supercritical, otherwise None"""
     # Check if we have enough energy to go supercritical.
     required_heat = get_specific_enthalpy_of_nitrous_vapor(critical_temperature) * mass
     if required_heat <= heat: # There's more than enough heat to do this.
@@ -229,9 +271,39 @@ def calculate_temperature(volume: float, mass: float, heat: float, iters=10) ->
             # It will be good enough for our purposes, where we never hit this region.
             temperature_increase = heat / (2 * mass)
 
-            temperature = start_temperature + temperature_increase
+            return start_temperature + temperature_increase
+
+    return None
+
+
+def get_phase(mass: float, liquid_mass: float) -> NitrousState:
+    """The phase of anything that is not supercritical"""
+    if liquid_mass == 0:
+        return NitrousState.GAS_ONLY
+    if liquid_mass == mass:
+        return NitrousState.LIQUID_ONLY
+
+    return NitrousState.EQUILIBRIUM
 
-            return temperature, NitrousState.SUPERCRITICAL
+
+# Unfortunately, binary search doesn't appear to work here, because the function I have for the enthalpy of gaseous nitrous is not always increasing wrt to temperature. I have no idea how this is possible.
+def calculate_temperature(volume: float, mass: float, heat: float, iters=10) -> tuple[float, NitrousState]:
+    """
+    The volume represents the volume of the receptacle.
+    The mass is the equivalent mass of liquid
+    The heat is the equivalent to the enthalpy in the system. This is very badly named.
+
+    Note that the range is about 130 K that it could be, so do 130 / 2^iters to figure out your accuracy.
+
+    returns a tuple with the temperature first, then the phase.    
+    """
+    # We return room temperature if there is nothing in here.
+    if mass == 0:
+        return 293, NitrousState.GAS_ONLY
+
+    temperature = get_supercritical_temperature(volume, mass, heat)
+    if temperature is not None:
+        return temperature, NitrousState.SUPERCRITICAL
 
     # There's a bit of a discrepancy in this graph where the transition from vapor to gas-only flatlines for a bit. This is because of the discrepancy in enthalpy function between the ideal gas and the gas vapor.
 
@@ -250,14 +322,80 @@ def calculate_temperature(volume: float, mass: float, heat: float, iters=10) ->
         else:
             minimum_temperature = candidate_temperature
 
-    phase = NitrousState.EQUILIBRIUM
-    if liquid_mass == 0:
-        phase = NitrousState.GAS_ONLY
-    elif gas_mass == 0:
-        phase = NitrousState.LIQUID_ONLY
+    return candidate_temperature, get_phase(mass, liquid_mass)
+
+
+def calculate_temperature_from_guess(volume: float, mass: float, heat: float, guess: float, tolerance=1e-8, max_iters=40) -> tuple[float, NitrousState]:
+    """
+    The same as calculate_temperature, but it starts from a temperature that should be close, like the one from the last time step.
+    It steps away from the guess until the enthalpy is on both sides of the heat, then closes in with secant steps (the Illinois version, so one side can't get stuck).
+    Usually takes about five enthalpy evaluations instead of sixty. If anything looks off, it falls back to the bisection.
+
+    tolerance is how close the temperature has to be, in K.
+    """
+    if mass == 0:
+        return 293, NitrousState.GAS_ONLY
+
+    temperature = get_supercritical_temperature(volume, mass, heat)
+    if temperature is not None:
+        return temperature, NitrousState.SUPERCRITICAL
+
+    # Everything breaks right at the critical temperature, so stay just under it
+    lowest, highest = 0, critical_temperature - tolerance
 
-    return candidate_temperature, phase
+    if guess is None or not lowest < guess < highest:
+        return calculate_temperature(volume, mass, heat, iters=60)
 
+    def enthalpy_error(temperature):
+        liquid_mass = get_liquid_mass(volume, mass, temperature, True)
+
+        return get_enthalpy(temperature, liquid_mass, mass - liquid_mass, True) - heat, liquid_mass
+
+    # Bracket the answer
+    a = guess
+    error_a, liquid_a = enthalpy_error(a)
+    if error_a == 0:
+        return a, get_phase(mass, liquid_a)
+
+    step = 1 # K
+    while True:
+        # Too much enthalpy means it needs to be cooler
+        b = a - step if error_a > 0 else a + step
+        b = min(max(b, lowest), highest)
+        error_b, liquid_b = enthalpy_error(b)
+
+        if (error_b > 0) != (error_a > 0):
+            break
+
+        if b in (lowest, highest):
+            return calculate_temperature(volume, mass, heat, iters=60)
+
+        a, error_a, liquid_a = b, error_b, liquid_b
+        step *= 4
+
+    for _ in range(max_iters):
+        if error_b == 0:
+            return b, get_phase(mass, liquid_b)
+
+        if abs(b - a) < tolerance:
+            # The enthalpy jumps at a couple of phase changes, and if the heat is in the middle of a jump this closes in on it without the error going to zero
+            # Which side bisection ends up on comes down to rounding, so let it decide to stay consistent
+            if min(abs(error_a), abs(error_b)) > 1e-6 * mass:
+                return calculate_temperature(volume, mass, heat, iters=60)
+
+            return b, get_phase(mass, liquid_b)
+
+        c = b - error_b * (b - a) / (error_b - error_a)
+        error_c, liquid_c = enthalpy_error(c)
+
+        if (error_c > 0) != (error_b > 0):
+            a, error_a, liquid_a = b, error_b, liquid_b
+        else:
+            error_a /= 2
+
+        b, error_b, liquid_b = c, error_c, liquid_c
+
+    return calculate_temperature(volume, mass, heat, iters=60)
 
 
 def calculate_heat(volume: float, mass: float, temperature: float, iters=20, temp_iters=None):
@@ -312,18 +450,17 @@ def calculate_heat(volume: float, mass: float, temperature: float, iters=20, tem
     return (min_possible + max_possible) / 2
 
 
-import matplotlib.pyplot as plt
-
 def graph_property(property, xlabel, ylabel, units="F", temperatures=np.linspace(minimum_temperature, critical_temperature, num=50), label=None):
-    outputs = [property(t) for t in temperatures]
+    """The property has to work on an array of temperatures"""
+    import matplotlib.pyplot as plt
+
+    temperatures = np.asarray(temperatures, dtype="float64")
+    with np.errstate(all="ignore"):
+        outputs = property(temperatures)
     
     # Convert everything to K
     if units == "F":
-        temperatures = [(t - 273.15) * 9/5 + 32 for t in temperatures]
-    elif units == "K":
-        temperatures = [t for t in temperatures]
-
-    outputs = [p for p in outputs]
+        temperatures = (temperatures - 273.15) * 9/5 + 32
     
     label = f"{label} (K)" if label != None else ""
     plt.plot(temperatures, outputs, label=label)
@@ -331,6 +468,8 @@ def graph_property(property, xlabel, ylabel, units="F", temperatures=np.linspace
     plt.ylabel(ylabel)
 
 def graph_specific_heat_by_temperature():
+    import matplotlib.pyplot as plt
+
     graph_property(lambda t: get_liquid_specific_heat(t), xlabel="Temperature (K)", ylabel="Heat Capacity (J/kg)", units="K")
 
     graph_property(lambda t: get_gaseous_specific_heat(t), xlabel="Temperature (K)", ylabel="Heat Capacity (J/kg)", units="K")
@@ -338,6 +477,8 @@ def graph_specific_heat_by_temperature():
     plt.show()
 
 def graph_enthalpy_by_temperature():
+    import matplotlib.pyplot as plt
+
     inputs = np.linspace(0, 300, 80)
     graph_property(lambda t: get_specific_enthalpy_of_liquid_nitrous(t, override_low=True), xlabel="Temperature (K)", ylabel="Enthalpy (J/kg)", units="K", temperatures=inputs, label="Liquid")
     graph_property(lambda t: get_specific_enthalpy_of_nitrous_vapor(t, override_low=True), xlabel="Temperature (K)", ylabel="Enthalpy (J/kg)", units="K", temperatures=inputs, label="Vapor")
@@ -345,14 +486,20 @@ def graph_enthalpy_by_temperature():
     plt.show()
 
 def graph_vapor_pressure_by_temperature():
+    import matplotlib.pyplot as plt
+
     graph_property(lambda t: get_vapor_pressure(t), xlabel="Temperature (K)", ylabel="Pressure (bar)", units="K", temperatures=np.linspace(0, 300, 50))
     plt.show()
 
 def graph_pressure_by_temperature():
+    import matplotlib.pyplot as plt
+
     graph_property(lambda t: get_vapor_pressure(t) * 14.5038, xlabel="Temperature (F)", ylabel="Pressure (psi)")
     plt.show()
 
 def graph_density_by_temperature():
+    import matplotlib.pyplot as plt
+
     inputs = np.linspace(0, 300, 80)
     graph_property(lambda t: get_liquid_nitrous_density(t, override_low=True), xlabel="Temperature (K)", ylabel="Density (kg/m^3)", units="K", temperatures=inputs, label="Liquid")
     graph_property(lambda t: get_gaseous_nitrous_density(t, override_low=True), xlabel="Temperature (K)", ylabel="Density (kg/m^3)", units="K", temperatures=inputs, label="Gas")
@@ -360,13 +507,17 @@ def graph_density_by_temperature():
     plt.show()
 
 def graph_distributions(mass=30):
+    import matplotlib.pyplot as plt
+
     # This is just a scaling that shows the full heating curve usually (depending on volume).
     min_heat, max_heat = -400 * mass, 0 * mass
 
+    # The array version lives with the table, which needs everything in here
+    from src.data.input.chemistry.nitroustable import calculate_temperatures
+
     heats = np.linspace(min_heat, max_heat, num=100)
-    outputs = [calculate_temperature(3.14 * 0.0889 ** 2 * 2.4, mass, h, iters=60) for h in heats]
-    temperatures = [t for t, p in outputs]
-    phases = [p for t, p in outputs]
+    temperatures, phases, _ = calculate_temperatures(3.14 * 0.0889 ** 2 * 2.4 / mass, heats / mass)
+    phases = [NitrousState(p) for p in phases]
 
     color_lookup = {
         NitrousState.EQUILIBRIUM: "g",
@@ -0,0 +1,356 @@
+# NITROUS TABLE
+# calculate_temperature bisects for the temperature every time the ox tank changes, which is most of the cost of a motor simulation
+# The temperature only depends on the specific volume and the specific enthalpy, so this precomputes it on a grid of both and interpolates
+# The phase and the liquid mass are closed forms once you have the temperature, so they are not stored
+# The iterative solver is still the reference. It is used to build the table, to check it, and for anything the table can't handle
+
+from math import log
+import os
+
+import numpy as np
+
+from src.constants import chem_path
+from src.data.input.chemistry.nitrousproperties import NitrousState, calculate_temperature, critical_temperature, get_gaseous_nitrous_density, get_liquid_mass, get_liquid_nitrous_density, get_specific_enthalpy_of_gaseous_nitrous, get_specific_enthalpy_of_liquid_nitrous, get_specific_enthalpy_of_nitrous_vapor
+
+
+table_path = f"{chem_path}/nitrousTable.npz"
+
+# Nothing outside of these is looked up in the table
+# From denser than any liquid to a nearly empty tank
+min_log_specific_volume = log(1 / 1500) # ln(m^3/kg)
+max_log_specific_volume = log(100) # ln(m^3/kg)
+# From liquid colder than any tank would be filled with to gas past the critical temperature
+min_specific_enthalpy = -500 # kJ/kg
+max_specific_enthalpy = 20 # kJ/kg
+
+# How far off the middle of a cell can be before everything in it goes to the iterative solver
+cell_tolerance = 0.01 # K
+
+# Only loaded the first time that it is used
+_table = None
+
+
+#region Reference
+def calculate_temperatures(specific_volume, specific_enthalpy, iters=60):
+    """
+    The same bisection as calculate_temperature, but for arrays of the specific volume (m^3/kg) and the specific enthalpy (kJ/kg).
+    Returns arrays of the temperature, the phase value, and the fraction of the mass that is liquid.
+    """
+    specific_volume, specific_enthalpy = np.broadcast_arrays(np.asarray(specific_volume, dtype="float64"), np.asarray(specific_enthalpy, dtype="float64"))
+
+    minimum = np.zeros(specific_volume.shape)
+    maximum = np.full(specific_volume.shape, critical_temperature)
+
+    with np.errstate(all="ignore"):
+        for _ in range(iters):
+            temperature = (minimum + maximum) / 2
+            liquid_fraction = get_liquid_fraction(specific_volume, temperature)
+            enthalpy = get_specific_enthalpy(temperature, liquid_fraction)
+
+            # If this system is too hot, we need a cooler temperature.
+            too_hot = enthalpy > specific_enthalpy
+            maximum = np.where(too_hot, temperature, maximum)
+            minimum = np.where(too_hot, minimum, temperature)
+
+        phase = np.full(specific_volume.shape, NitrousState.EQUILIBRIUM.value)
+        phase[liquid_fraction == 0] = NitrousState.GAS_ONLY.value
+        phase[liquid_fraction == 1] = NitrousState.LIQUID_ONLY.value
+
+        # Same shortcut as calculate_temperature for anything with enough heat and mass to go supercritical
+        required_enthalpy = get_specific_enthalpy_of_nitrous_vapor(critical_temperature)
+        supercritical = (specific_enthalpy >= required_enthalpy) & (1 / specific_volume >= get_gaseous_nitrous_density(critical_temperature, override_low=True))
+
+        temperature = np.where(supercritical, critical_temperature + (specific_enthalpy - required_enthalpy) / 2, temperature)
+        phase[supercritical] = NitrousState.SUPERCRITICAL.value
+        liquid_fraction = np.where(supercritical, np.nan, liquid_fraction)
+
+    return temperature, phase, liquid_fraction
+
+
+def get_liquid_fraction(specific_volume, temperature):
+    """get_liquid_mass for one kilogram, for arrays"""
+    gas_density = get_gaseous_nitrous_density(temperature, override_low=True)
+    liquid_density = get_liquid_nitrous_density(temperature, override_low=True)
+
+    fraction = (specific_volume - 1 / gas_density) / (1 / liquid_density - 1 / gas_density)
+    # If all of the gas can evaporate, assume that it does.
+    fraction = np.where(gas_density * specific_volume > 1, 0, fraction)
+
+    return np.where(temperature < 200, 1, fraction)
+
+
+def get_gas_only_temperatures(specific_volume, iters=60):
+    """The temperature where all of the nitrous has just evaporated, or the critical temperature if it is dense enough that it never does"""
+    minimum = np.zeros(np.shape(specific_volume))
+    maximum = np.full(np.shape(specific_volume), critical_temperature)
+
+    with np.errstate(all="ignore"):
+        for _ in range(iters):
+            temperature = (minimum + maximum) / 2
+            # The gas gets denser as it gets hotter
+            evaporated = get_gaseous_nitrous_density(temperature, override_low=True) * specific_volume > 1
+            maximum = np.where(evaporated, temperature, maximum)
+            minimum = np.where(evaporated, minimum, temperature)
+
+    return maximum
+
+
+def get_specific_enthalpy(temperature, liquid_fraction):
+    """get_enthalpy for one kilogram, for arrays"""
+    gas_only = get_specific_enthalpy_of_gaseous_nitrous(temperature, override_low=True)
+    equilibrium = (1 - liquid_fraction) * get_specific_enthalpy_of_nitrous_vapor(temperature, override_low=True) + liquid_fraction * get_specific_enthalpy_of_liquid_nitrous(temperature, override_low=True)
+
+    return np.where(liquid_fraction == 0, gas_only, equilibrium)
+
+#endregion
+
+
+#region Building
+def build_table(path=table_path, volume_points=600, enthalpy_points=1041):
+    """
+    Solve for every point on the grid and save it. Takes a little while, which is why the result is saved with the code.
+    Cells that cross a phase boundary, are too curved to interpolate across, or touch the critical temperature are marked, and anything in them goes to the iterative solver.
+    """
+    log_specific_volumes = np.linspace(min_log_specific_volume, max_log_specific_volume, volume_points)
+    specific_enthalpies = np.linspace(min_specific_enthalpy, max_specific_enthalpy, enthalpy_points)
+
+    temperature, phase, liquid_fraction = calculate_temperatures(np.exp(log_specific_volumes)[:, np.newaxis], specific_enthalpies[np.newaxis, :])
+
+    # Compare the middle of every cell to what interpolating would give
+    middle_volumes = (log_specific_volumes[1:] + log_specific_volumes[:-1]) / 2
+    middle_enthalpies = (specific_enthalpies[1:] + specific_enthalpies[:-1]) / 2
+    middle_temperature, middle_phase, _ = calculate_temperatures(np.exp(middle_volumes)[:, np.newaxis], middle_enthalpies[np.newaxis, :])
+
+    corners = [(slice(None, -1), slice(None, -1)), (slice(1, None), slice(None, -1)), (slice(None, -1), slice(1, None)), (slice(1, None), slice(1, None))]
+    interpolated = sum(temperature[corner] for corner in corners) / 4
+
+    # Going from gas only to equilibrium, the enthalpy jumps from one model to the other, so there is a whole band of enthalpies pinned right at the edge
+    # The phase in there comes down to rounding, and the table can't tell which side it is on
+    boundary = get_gas_only_temperatures(np.exp(log_specific_volumes))[:, np.newaxis]
+    near_boundary = np.abs(temperature - boundary) < cell_tolerance
+
+    exact = np.abs(interpolated - middle_temperature) > cell_tolerance
+    for corner in corners:
+        exact |= phase[corner] != middle_phase
+        exact |= near_boundary[corner]
+        # Rounding to save the table could push these over the critical temperature, where none of the properties work
+        exact |= temperature[corner] > critical_temperature - cell_tolerance
+
+    np.savez_compressed(path,
+        log_specific_volumes=log_specific_volumes,
+        specific_enthalpies=specific_enthalpies,
+        temperature=temperature.astype("float32"),
+        exact=exact
+    )
+
+
+def load_table(path=table_path):
+    global _table
+
+    if _table is None:
+        if not os.path.exists(path):
+            print(f"Building the nitrous table at {path}. This only has to happen once.")
+            build_table(path)
+
+        _table = NitrousTable(path)
+
+    return _table
+
+#endregion
+
+
+class NitrousTable:
+    """
+    Bilinear interpolation on a grid of the log of the specific volume and the specific enthalpy.
+    Interpolating straight lines between the grid points can't overshoot them, so the temperature still only goes up as the heat goes up.
+    """
+
+    def __init__(self, path=table_path):
+        data = np.load(path)
+
+        log_specific_volumes = data["log_specific_volumes"]
+        specific_enthalpies = data["specific_enthalpies"]
+
+        # The axes are evenly spaced, so the cell can be found without searching
+        self.volume_start = float(log_specific_volumes[0])
+        self.volume_step = float(log_specific_volumes[1] - log_specific_volumes[0])
+        self.volume_cells = len(log_specific_volumes) - 1
+        self.enthalpy_start = float(specific_enthalpies[0])
+        self.enthalpy_step = float(specific_enthalpies[1] - specific_enthalpies[0])
+        self.enthalpy_cells = len(specific_enthalpies) - 1
+
+        # Python lists are much quicker to index one element at a time than numpy arrays
+        self.temperature = data["temperature"].astype("float64").tolist()
+        self.exact = data["exact"].tolist()
+        # But arrays are what you want for looking up a lot of points at once
+        self.temperature_array = data["temperature"].astype("float64")
+        self.exact_array = data["exact"]
+
+    def find_cell(self, specific_volume, specific_enthalpy):
+        """Returns the indices of the cell and how far across it we are in each direction, or None if it can't be interpolated"""
+        if specific_volume <= 0:
+            return None
+
+        x = (log(specific_volume) - self.volume_start) / self.volume_step
+        y = (specific_enthalpy - self.enthalpy_start) / self.enthalpy_step
+
+        if not (0 <= x <= self.volume_cells and 0 <= y <= self.enthalpy_cells):
+            return None
+
+        i = min(int(x), self.volume_cells - 1)
+        j = min(int(y), self.enthalpy_cells - 1)
+
+        if self.exact[i][j]:
+            return None
+
+        return i, j, x - i, y - j
+
+    def interpolate(self, values, i, j, fx, fy):
+        row = values[i]
+        next_row = values[i + 1]
+
+        return (row[j] * (1 - fx) + next_row[j] * fx) * (1 - fy) + (row[j + 1] * (1 - fx) + next_row[j + 1] * fx) * fy
+
+    def lookup(self, specific_volume, specific_enthalpy):
+        """Returns (temperature, phase, liquid fraction), or None if it has to be solved iteratively"""
+        cell = self.find_cell(specific_volume, specific_enthalpy)
+
+        if cell is None:
+            return None
+
+        temperature = self.interpolate(self.temperature, *cell)
+
+        # The edge of the gas only phase can run through a cell without the temperature noticing, so the phase comes from the temperature instead of from the corners
+        liquid_fraction = get_liquid_mass(specific_volume, 1, temperature, override_low=True)
+
+        phase = NitrousState.EQUILIBRIUM
+        if liquid_fraction == 0:
+            phase = NitrousState.GAS_ONLY
+        elif liquid_fraction == 1:
+            phase = NitrousState.LIQUID_ONLY
+
+        return temperature, phase, liquid_fraction
+
+    def lookup_array(self, specific_volume, specific_enthalpy):
+        """
+        The same as lookup, for arrays. Returns arrays of the temperature, the phase value, and the liquid fraction.
+        Points that can't be interpolated are NaN in all three.
+        """
+        with np.errstate(all="ignore"):
+            x = (np.log(specific_volume) - self.volume_start) / self.volume_step
+            y = (specific_enthalpy - self.enthalpy_start) / self.enthalpy_step
+
+        inside = (specific_volume > 0) & (x >= 0) & (x <= self.volume_cells) & (y >= 0) & (y <= self.enthalpy_cells)
+
+        i = np.clip(np.where(inside, x, 0).astype(int), 0, self.volume_cells - 1)
+        j = np.clip(np.where(inside, y, 0).astype(int), 0, self.enthalpy_cells - 1)
+        fx = x - i
+        fy = y - j
+
+        usable = inside & ~self.exact_array[i, j]
+
+        values = self.temperature_array
+        temperature = (values[i, j] * (1 - fx) + values[i + 1, j] * fx) * (1 - fy) + (values[i, j + 1] * (1 - fx) + values[i + 1, j + 1] * fx) * fy
+        temperature = np.where(usable, temperature, np.nan)
+
+        with np.errstate(all="ignore"):
+            liquid_fraction = get_liquid_fraction(specific_volume, temperature)
+
+        phase = np.full(np.shape(temperature), NitrousState.EQUILIBRIUM.value)
+        phase[liquid_fraction == 0] = NitrousState.GAS_ONLY.value
+        phase[liquid_fraction == 1] = NitrousState.LIQUID_ONLY.value
+
+        return temperature, phase, liquid_fraction
+
+
+def lookup_temperature(volume: float, mass: float, heat: float) -> tuple[float, NitrousState]:
+    """
+    A drop-in replacement for calculate_temperature that uses the table when it can.
+    Returns a tuple with the temperature first, then the phase.
+    """
+    if mass == 0:
+        return calculate_temperature(volume, mass, heat)
+
+    specific_volume = volume / mass
+    specific_enthalpy = heat / mass
+
+    # Supercritical is a closed form anyways, and it would make a mess of the cells next to it
+    required_enthalpy = get_specific_enthalpy_of_nitrous_vapor(critical_temperature)
+    if specific_enthalpy >= required_enthalpy and 1 / specific_volume >= get_gaseous_nitrous_density(critical_temperature, override_low=True):
+        return calculate_temperature(volume, mass, heat)
+
+    result = load_table().lookup(specific_volume, specific_enthalpy)
+    if result is None:
+        return calculate_temperature(volume, mass, heat, iters=60)
+
+    temperature, phase, liquid_fraction = result
+    return temperature, phase
+
+
+def lookup_temperatures(volume, mass, heat):
+    """
+    lookup_temperature for arrays of the volume (m^3), the mass (kg), and the heat (kJ).
+    Returns arrays of the temperature and the phase value (NitrousState(phase) gives the enum back).
+    Anything that lookup_temperature would solve iteratively goes through the array bisection in calculate_temperatures, which does the same thing as calculate_temperature with 60 iterations.
+    """
+    volume, mass, heat = np.broadcast_arrays(np.asarray(volume, dtype="float64"), np.asarray(mass, dtype="float64"), np.asarray(heat, dtype="float64"))
+
+    empty = mass == 0
+    with np.errstate(all="ignore"):
+        specific_volume = np.where(empty, 1, volume / mass)
+        specific_enthalpy = np.where(empty, 0, heat / mass)
+
+    # Supercritical is a closed form anyways, and it would make a mess of the cells next to it
+    required_enthalpy = get_specific_enthalpy_of_nitrous_vapor(critical_temperature)
+    supercritical = (specific_enthalpy >= required_enthalpy) & (1 / specific_volume >= get_gaseous_nitrous_density(critical_temperature, override_low=True))
+
+    temperature, phase, _ = load_table().lookup_array(specific_volume, specific_enthalpy)
+
+    solve = (np.isnan(temperature) | supercritical) & ~empty
+    if np.any(solve):
+        temperature[solve], phase[solve], _ = calculate_temperatures(specific_volume[solve], specific_enthalpy[solve])
+
+    # We return room temperature if there is nothing in there
+    temperature[empty] = 293
+    phase[empty] = NitrousState.GAS_ONLY.value
+
+    return temperature, phase
+
+
+def get_heat(volume: float, mass: float, temperature: float) -> float:
+    """
+    The inverse of calculate_temperature. Once you know the temperature, the enthalpy is a closed form, so this does not need a table or a search like calculate_heat.
+    """
+    if mass == 0:
+        return 0
+
+    liquid_fraction = get_liquid_fraction(volume / mass, temperature)
+
+    return float(mass * get_specific_enthalpy(temperature, liquid_fraction))
+
+
+def check_accuracy(samples=2000, seed=0):
+    """
+    Compare the table to the iterative solver at random points inside of it.
+    Returns the largest temperature error in Kelvin, and the fraction of points where the phase was different.
+    """
+    generator = np.random.default_rng(seed)
+    specific_volumes = np.exp(generator.uniform(min_log_specific_volume, max_log_specific_volume, samples))
+    specific_enthalpies = generator.uniform(min_specific_enthalpy, max_specific_enthalpy, samples)
+
+    max_error = 0
+    wrong_phases = 0
+    for specific_volume, specific_enthalpy in zip(specific_volumes, specific_enthalpies):
+        # One kilogram, so the heat is the specific enthalpy
+        temperature, phase = lookup_temperature(specific_volume, 1, specific_enthalpy)
+        expected_temperature, expected_phase = calculate_temperature(specific_volume, 1, specific_enthalpy, iters=60)
+
+        max_error = max(max_error, abs(temperature - expected_temperature))
+        wrong_phases += phase != expected_phase
+
+    return max_error, wrong_phases / samples
+
+
+if __name__ == "__main__":
+    build_table()
+    print(check_accuracy())
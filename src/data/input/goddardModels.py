@@ -6,67 +6,193 @@
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from math import isnan
+from bisect import bisect_right
+
+from lib.data import GridTable, SharedTable
+from src.data.input.models import get_aero_data, loaded_models
+
+
+class AeroTable(SharedTable):
+    """
+    The RASAero data compiled onto a regular grid of Mach numbers by angles of attack, so that the drag, lift, and center of pressure all come out of one search for the Mach bracket.
+    The alpha axis is in degrees, like the csv, but everything you pass in is in radians. Lookups outside of the grid are clamped to the edges.
+    Works with scalars (in pure Python, since that is what the rocket does every frame) or with arrays (for the batched simulation).
+    """
+
+    # Hard coding in 3.3 meters for the center of pressure at angle of attack of 90 degrees
+    # This is based off of what openrocket looks like
+    perpendicular_CP = 3.3
+    upside_down_CP = 5.29
+
+    def __init__(self, machs, alphas, CD, CNalpha, CP):
+        """
+        :param machs: the sorted Mach numbers
+        :param alphas: the sorted angles of attack, in degrees
+        :param CD: the zero angle of attack coefficient of drag at each Mach number
+        :param CNalpha: the normal force coefficient slope at each Mach number (per radian)
+        :param CP: the center of pressure in meters, with shape (len(machs), len(alphas)). The first column is used for zero angle of attack
+        """
+        self.machs = self.read_only(np.array(machs, dtype="float64"))
+        self.alphas = self.read_only(np.array(alphas, dtype="float64"))
+        self.CD = self.read_only(np.array(CD, dtype="float64"))
+        self.CNalpha = self.read_only(np.array(CNalpha, dtype="float64"))
+        self.CP = self.read_only(np.array(CP, dtype="float64"))
+
+        if len(self.machs) < 2 or len(self.alphas) < 2:
+            raise ValueError("The aero table needs at least two Mach numbers and two angles of attack to interpolate")
+
+        if self.CP.shape != (len(self.machs), len(self.alphas)) or len(self.CD) != len(self.machs) or len(self.CNalpha) != len(self.machs):
+            raise ValueError(f"The aero table has {len(self.machs)} Mach numbers by {len(self.alphas)} angles of attack, but CD has shape {self.CD.shape}, CNalpha has shape {self.CNalpha.shape}, and CP has shape {self.CP.shape}")
+
+        # Python lists are much quicker to bisect and index one element at a time than numpy arrays
+        self._mach_list = self.machs.tolist()
+        self._alpha_list = self.alphas.tolist()
+        self._CD_list = self.CD.tolist()
+        self._CNalpha_list = self.CNalpha.tolist()
+        self._CP_list = self.CP.tolist()
+        self.max_alpha = self._alpha_list[-1]
+
+        # Consecutive frames almost always land in the same Mach bracket
+        self.hint = None
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pd.DataFrame):
+        """
+        Not every angle of attack has every Mach number in the RASAero data, so the gaps are filled in with the closest Mach number that does.
+        CD and CNalpha do not change with the angle of attack, so they are taken from the smallest one
+        """
+        def grid(column):
+            return dataframe.pivot(index="Mach", columns="Alpha", values=column).sort_index().sort_index(axis=1).ffill().bfill()
+
+        CP = grid("CP") * 0.0254 # inches to meters
+
+        return cls(CP.index, CP.columns, grid("CD").iloc[:, 0], grid("CNalpha (0 to 4 deg) (per rad)").iloc[:, 0], CP)
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_dataframe(pd.read_csv(path))
 
-from lib.data import interpolated_lookup, interpolated_lookup_2D
-from src.constants import aero_path
+    def __call__(self, mach, alpha):
+        return self.get_aero_coefficients(mach, alpha)
 
+    def get_aero_coefficients(self, mach, alpha):
+        """The coefficient of drag, the coefficient of lift, and the center of pressure, which is what Rocket.set_aero_function expects"""
+        CD, CL, CNalpha, CP = self.lookup(mach, alpha)
 
-# TODO: get rid of this once I make models.py more customizable.
-# This code should run regardless of how you import this file
-# The idea is that it is a drop-in replacement for the RASAero data whenever you want to do it
-data = pd.read_csv(f'{aero_path}/aerodynamicQualities.csv')
-mach = data['Mach']
-alpha = data['Alpha']
-CD = data['CD Power-Off']
-CL = data['CL']
-CP = data['CP']
+        return CD, CL, CP
 
+    def lookup(self, mach, alpha):
+        """Returns CD, CL, CNalpha, and CP, all for one Mach bracket. alpha is in radians"""
+        if np.ndim(mach) == 0 and np.ndim(alpha) == 0:
+            return self.lookup_scalar(float(mach), float(alpha))
 
-def get_sine_interpolated_center_of_pressure(mach, alpha):
-    # I believe the self is necessary for using as a class function
-    if isnan(alpha):
-        raise Exception("Your angle of attack is NaN")
+        return self.lookup_array(mach, alpha)
 
-    degrees = alpha * 180 / np.pi
+    def lookup_scalar(self, mach: float, alpha: float):
+        if alpha != alpha: # NaN is never equal to itself
+            raise ValueError("Your angle of attack is NaN")
 
-    upside_down = 5.29
-    perpendicular_AOA = 3.3
+        machs = self._mach_list
+        hint = self.hint
 
-    if degrees > 90:
-        # We are just going to do some sine interpolation to put CP where the fins are, I don't really know
-        return upside_down + np.sin(alpha) * (perpendicular_AOA - upside_down)
+        if hint is not None and machs[hint] <= mach < machs[hint + 1]:
+            i = hint
+        else:
+            mach = min(max(mach, machs[0]), machs[-1])
+            i = min(bisect_right(machs, mach) - 1, len(machs) - 2)
+            self.hint = i
 
-    # We don't have any data for lookups beyond four
-    if degrees > 4:
-        zero_AOA = interpolated_lookup(data, "Mach", mach, "CP") * 0.0254
-        # Hard coding in 3.3 meters for the center of pressure at angle of attack of 90 degrees
-        # This is based off of what openrocket looks like
-        
+        t = (mach - machs[i]) / (machs[i + 1] - machs[i])
 
-        return zero_AOA + np.sin(alpha) * (perpendicular_AOA - zero_AOA)
+        CD = self._CD_list[i] + t * (self._CD_list[i + 1] - self._CD_list[i])
+        CNalpha = self._CNalpha_list[i] + t * (self._CNalpha_list[i + 1] - self._CNalpha_list[i])
+        CL = np.sin(alpha) * CNalpha
 
-    
-    # We know alpha is small enough to be contained in the RASAero data
-    return interpolated_lookup_2D(data, "Mach", "Alpha", mach, degrees, "CP")  * 0.0254
+        degrees = alpha * 180 / np.pi
+        CP_before = self._CP_list[i]
+        CP_after = self._CP_list[i + 1]
+
+        if degrees > 90:
+            # We are just going to do some sine interpolation to put CP where the fins are, I don't really know
+            CP = self.upside_down_CP + np.sin(alpha) * (self.perpendicular_CP - self.upside_down_CP)
+        elif degrees > self.max_alpha:
+            # We don't have any data for lookups beyond the largest angle of attack
+            zero_AOA = CP_before[0] + t * (CP_after[0] - CP_before[0])
+            CP = zero_AOA + np.sin(alpha) * (self.perpendicular_CP - zero_AOA)
+        else:
+            alphas = self._alpha_list
+            degrees = max(degrees, alphas[0])
+            j = min(bisect_right(alphas, degrees) - 1, len(alphas) - 2)
+            u = (degrees - alphas[j]) / (alphas[j + 1] - alphas[j])
+
+            before = CP_before[j] + u * (CP_before[j + 1] - CP_before[j])
+            after = CP_after[j] + u * (CP_after[j + 1] - CP_after[j])
+            CP = before + t * (after - before)
+
+        return CD, CL, CNalpha, CP
+
+    def lookup_array(self, mach, alpha):
+        mach, alpha = np.broadcast_arrays(np.asarray(mach, dtype="float64"), np.asarray(alpha, dtype="float64"))
+
+        if np.any(np.isnan(alpha)):
+            raise ValueError("Some of your angles of attack are NaN")
+
+        i, t = GridTable.find_bracket(self.machs, mach)
+        j, u = GridTable.find_bracket(self.alphas, alpha * 180 / np.pi)
+
+        CD = self.CD[i] + t * (self.CD[i + 1] - self.CD[i])
+        CNalpha = self.CNalpha[i] + t * (self.CNalpha[i + 1] - self.CNalpha[i])
+        CL = np.sin(alpha) * CNalpha
+
+        CP = self.CP
+        zero_AOA = CP[i, 0] + t * (CP[i + 1, 0] - CP[i, 0])
+        before = CP[i, j] + u * (CP[i, j + 1] - CP[i, j])
+        after = CP[i + 1, j] + u * (CP[i + 1, j + 1] - CP[i + 1, j])
+        in_table = before + t * (after - before)
+
+        degrees = alpha * 180 / np.pi
+        sine = np.sin(alpha)
+        CP = np.where(degrees > 90, self.upside_down_CP + sine * (self.perpendicular_CP - self.upside_down_CP),
+                      np.where(degrees > self.max_alpha, zero_AOA + sine * (self.perpendicular_CP - zero_AOA), in_table))
+
+        return CD, CL, CNalpha, CP
+
+
+def get_aero_table() -> AeroTable:
+    """The RASAero data as an AeroTable, compiled the first time anything looks something up"""
+    if "aero table" not in loaded_models:
+        loaded_models["aero table"] = AeroTable.from_dataframe(get_aero_data())
+
+    return loaded_models["aero table"]
+
+
+def get_rasaero_coefficients(mach, alpha):
+    """CD, CL, and CP from one lookup. Pass this to Rocket.set_aero_function"""
+    return get_aero_table().get_aero_coefficients(mach, alpha)
+
+
+def get_sine_interpolated_center_of_pressure(mach, alpha):
+    return get_aero_table().lookup(mach, alpha)[3]
 
 
 def linear_approximated_normal_force(mach, alpha):
     # This is giving values way higher than Open Rocket seems to be using
     # This is literally the only issue in the entire model. For some inexplicable reason the lift force coefficient works if it is a factor of 1000 smaller
     # I am getting values around a max of five outputted from OpenRocket
-    return np.sin(alpha) * interpolated_lookup(data, "Mach", mach, "CNalpha (0 to 4 deg) (per rad)")
+    return get_aero_table().lookup(mach, alpha)[1]
 
 
 def assumed_zero_AOA_CD(mach, alpha):
     # Hopefully angle of attack never gets so high that this assumption is a major issue
-    return interpolated_lookup(data, "Mach", mach, "CD")
+    return get_aero_table().lookup(mach, alpha)[0]
 
     
 
 def display_sine_interpolation():
-    # Unfortunately, this is really slow. Also, based on the visual, something is ever so slightly broken (some of the lines aren't between the dots). To be honest, it is close enough for now
+    # Based on the visual, something is ever so slightly broken (some of the lines aren't between the dots). To be honest, it is close enough for now
+    import matplotlib.pyplot as plt
+
+    data = get_aero_data()
     alphas = np.linspace(0, 4 * np.pi / 180, 5)
     machs = np.linspace(0, 15, 100)
 
@@ -1,25 +1,76 @@
 # Stores the fitted polynomials that are outputted from fitPolynomial.py
 # They have to be transferred manually
 
+# Nothing is read or fitted until something asks for it, since almost every simulation uses constant coefficients (or goddardModels), and the rocket imports this for the atmosphere models
+# Scipy and matplotlib are imported in the functions that need them for the same reason
+
+import os
+import hashlib
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d, interp2d, fitpack, bisplrep, bisplev
 from math import isnan
 
 
-from lib.data import interpolated_lookup, interpolated_lookup_2D
-from src.constants import aero_path
+from src.constants import aero_path, output_path
+
+
+aero_data_path = f'{aero_path}/aerodynamicQualities.csv'
+# The fitted splines by the hash of the csv they were fitted to, so that every process after the first just loads the coefficients
+spline_cache_path = f'{output_path}/splinecache'
+
+# Everything that has been loaded or fitted in this process, by name
+loaded_models = {}
+
+
+def get_aero_data() -> pd.DataFrame:
+    """The RASAero data, read the first time anything needs it. Do not modify it, since everything shares it"""
+    if "aero data" not in loaded_models:
+        loaded_models["aero data"] = pd.read_csv(aero_data_path)
+
+    return loaded_models["aero data"]
+
+
+def fit_aero_spline(column, kx, ky, s):
+    """
+    bisplrep of a column of the RASAero data by Mach and alpha, in the tck list that bisplev takes.
+    The coefficients are saved in the spline cache under the hash of the csv, so the fit is only done again if the data changes
+    """
+    with open(aero_data_path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+
+    path = f"{spline_cache_path}/{column}_k{kx}{ky}_s{s}_{digest}.npz"
+
+    if os.path.exists(path):
+        with np.load(path) as saved:
+            return [saved["tx"], saved["ty"], saved["c"], int(saved["kx"]), int(saved["ky"])]
+
+    from scipy.interpolate import bisplrep
+
+    data = get_aero_data()
+    tx, ty, c, kx, ky = bisplrep(data["Mach"], data["Alpha"], data[column], kx=kx, ky=ky, s=s)
 
+    try:
+        os.makedirs(spline_cache_path, exist_ok=True)
+        np.savez(path, tx=tx, ty=ty, c=c, kx=kx, ky=ky)
+    except OSError:
+        # Nowhere to save it, so it will just be fitted again next time
+        pass
 
-# This code should run regardless of how you import this file
-# TODO: move this path to exist elsewhere. Also make it one of those closure things.
-data = pd.read_csv(f'{aero_path}/aerodynamicQualities.csv')
-mach = data['Mach']
-alpha = data['Alpha']
-CD = data['CD']
-CL = data['CL']
-CP = data['CP']
+    return [tx, ty, c, kx, ky]
+
+
+def get_drag_spline():
+    if "drag spline" not in loaded_models:
+        loaded_models["drag spline"] = fit_aero_spline("CD", 1, 1, 0.3)
+
+    return loaded_models["drag spline"]
+
+
+def get_lift_spline():
+    if "lift spline" not in loaded_models:
+        loaded_models["lift spline"] = fit_aero_spline("CL", 2, 2, 0.1)
+
+    return loaded_models["lift spline"]
 
 
 def get_density(altitude: float):
@@ -30,8 +81,7 @@ def get_density(altitude: float):
 def get_speed_of_sound(altitude):
     """Altitude in kilometers"""
     # For some reason it flattens out here
-    if (altitude > 11):
-        altitude = 11
+    altitude = np.minimum(altitude, 11)
 
     return np.polyval(
         [-2.64851747e-02, - 3.81579975e+00, 3.40273658e+02],
@@ -55,15 +105,14 @@ def get_speed_of_sound(altitude):
 
 # FIXME: For some reason tis has unpredictable and concerning behavior. Try messing with s. I don't see why linearly interpolating 2d inputs is so hard. Half tempted to implement my own solution.
 # Note that CD doesn't change with angle but CA does
-drag_spline = bisplrep(mach, alpha, CD, kx=1, ky=1, s=0.3)
-
-
 def get_splined_coefficient_of_drag(mach, alpha):
+    from scipy.interpolate import bisplev
+
     if isnan(alpha):
         raise Exception("Your angle of attack is NaN")
 
     alpha = alpha / np.pi * 180
-    return bisplev(mach, alpha, drag_spline)
+    return bisplev(mach, alpha, get_drag_spline())
 
 
 def get_sine_interpolated_coefficient_of_drag(mach, alpha):
@@ -76,12 +125,11 @@ def get_sine_interpolated_coefficient_of_drag(mach, alpha):
 
 
 
-lift_spline = bisplrep(mach, alpha, CL, kx=2, ky=2, s=0.1)
-
-
 def get_coefficient_of_lift(mach, alpha):
+    from scipy.interpolate import bisplev
+
     alpha = alpha / np.pi * 180
-    return bisplev(mach, alpha, lift_spline)
+    return bisplev(mach, alpha, get_lift_spline())
 
 
 # region lift
@@ -157,7 +205,10 @@ def get_coefficient_of_lift(mach, angle_of_attack=0):
 
 
 def display_CD():
-    plt.scatter(mach, CD, label="data")
+    import matplotlib.pyplot as plt
+
+    data = get_aero_data()
+    plt.scatter(data["Mach"], data["CD"], label="data")
 
     get_coefficient_of_drag = get_splined_coefficient_of_drag
 
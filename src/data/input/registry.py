@@ -0,0 +1,40 @@
+# DATA REGISTRY
+# Every input file is read and compiled once per process, then everything that uses it shares the compiled version
+# A Monte Carlo makes thousands of motors and environments from the same few csv files, so there is no point in reading them thousands of times
+# Whatever comes out of here is shared, so nothing should modify it. The compiled tables (lib.data.SharedTable) enforce that with read-only arrays, and copying an object that holds one shares it instead of copying it
+
+import os
+import pandas as pd
+
+
+# Everything that has been loaded, by (absolute path, modification time, what it was compiled into)
+# The dataframe itself is stored under None
+loaded_data = {}
+
+
+def load(path, name=None, compile=None):
+    """
+    Read a csv and compile it with compile(dataframe), or just get the dataframe if there is nothing to compile.
+    name tells apart the different ways the same file gets compiled. The file is only read again if it changes
+    """
+    path = os.path.abspath(path)
+    modified = os.path.getmtime(path)
+    key = (path, modified, name)
+
+    if key not in loaded_data:
+        # Anything from before the file changed will never be looked up again
+        for old_key in [old_key for old_key in loaded_data if old_key[0] == path and old_key[1] != modified]:
+            del loaded_data[old_key]
+
+        dataframe = loaded_data.get((path, modified, None))
+        if dataframe is None:
+            dataframe = pd.read_csv(path)
+
+        loaded_data[key] = dataframe if compile is None else compile(dataframe)
+
+    return loaded_data[key]
+
+
+def clear():
+    """Forget everything that has been loaded. Only useful if you have been modifying the files and don't trust the modification times"""
+    loaded_data.clear()
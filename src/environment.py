@@ -3,6 +3,9 @@
 # It models the wind (hopefully it will eventually include gusts, but right now it's a DIY thing that's wrong)
 # Also models air density, pressure, and temperature.
 
+from dataclasses import dataclass, replace
+
+import numpy as np
 import pandas as pd
 
 from src.constants import atmosphere_path
@@ -10,10 +13,37 @@ from lib.general import interpolate, get_next
 from lib.presetObject import PresetObject
 from src.data.input.models import get_density, get_speed_of_sound
 from src.data.input.atmosphere.whiteSandsModels import speed_at_altitude
-from lib.data import interpolated_lookup
+from lib.data import LookupTable
+from src.data.input import registry
 from src.data.input.atmosphere.wind import Wind
 
 
+@dataclass(frozen=True)
+class AtmosphereState:
+    """
+    Everything about the air at one altitude (meters above sea level) at one time.
+    Every field is an array instead if it was made for an array of altitudes.
+    air_velocity is None if the wind was left out.
+    """
+    altitude: float
+    density: float # kg/m^3
+    pressure: float # Pa
+    temperature: float # K
+    speed_of_sound: float # m/s
+    gravity: float # m/s^2
+    air_velocity: np.ndarray = None # m/s
+
+
+def compile_atmosphere(dataframe: pd.DataFrame):
+    """The pressure, density, and atmosphere state lookups. These get looked up several times every frame, so they are compiled once"""
+    pressure_lookup = LookupTable.from_dataframe(dataframe, "Altitude", "Pressure")
+    density_lookup = LookupTable.from_dataframe(dataframe, "Altitude", "Density")
+    # All three at once for the atmosphere state, so that there is only one search
+    atmosphere_lookup = LookupTable.from_dataframe(dataframe, "Altitude", ["Density", "Pressure", "Temperature"])
+
+    return pressure_lookup, density_lookup, atmosphere_lookup
+
+
 # TODO: rewrite this object to use the same data methods and closure things as the other models
 class Environment(PresetObject):
     # TODO: make a separate model for motor simulations.
@@ -40,9 +70,17 @@ class Environment(PresetObject):
         self.previous_air_density_index = 0
 
         self.apply_wind = True
+        # Either "lookup" to interpolate the density from the atmospheric data, or "polynomial" to use the fitted model
+        self.atmosphere_backend = "lookup"
 
         super().overwrite_defaults(**kwargs)
 
+        # The rocket asks about the air a bunch of times every frame, always at the same time and altitude
+        self.last_atmosphere_query = None
+        self.last_atmosphere = None
+        # Set by hold_wind while an integrator takes a step
+        self.held_air_velocity = None
+
         self.load_atmospheric_data()
 
         
@@ -60,12 +98,76 @@ class Environment(PresetObject):
         self.load_atmospheric_data()
 
     def load_atmospheric_data(self):
-        self.atmospheric_data = pd.read_csv(f"{atmosphere_path}/{self._atmospheric_path}")
-        self.atmospheric_data.drop(
-            columns=["Viscosity", "Temperature"])
+        # Every environment with the same atmospheric data shares the same tables
+        self.pressure_lookup, self.density_lookup, self.atmosphere_lookup = registry.load(f"{atmosphere_path}/{self._atmospheric_path}", "atmosphere", compile_atmosphere)
+
+        self.last_atmosphere_query = None
+
+    def hold_wind(self, altitude):
+        """
+        Keep giving back the wind from the current time and this altitude until release_wind.
+        The wind is noisy in time, so an adaptive integrator that sees it change inside a step thinks its error is huge and shrinks the step down to nothing.
+        Holding it makes the wind an input to the step instead of part of the error estimate
+        """
+        self.held_air_velocity = None
+        self.held_air_velocity = self.get_air_speed(altitude)
+        self.last_atmosphere_query = None
+
+    def release_wind(self):
+        self.held_air_velocity = None
+        self.last_atmosphere_query = None
 
     def simulate_step(self):
-        pass
+        # Nothing should carry over from one frame to the next, in case something about the environment changes in between
+        self.last_atmosphere_query = None
+        self.wind.last_query = None
+
+    # region Atmosphere State
+    def get_atmosphere(self, altitude, include_wind=True):
+        """
+        Get an AtmosphereState for an altitude in meters (or an array of them) at the current time.
+        Asking again at the same time and altitude gives back the same state without looking anything up.
+        Leave out the wind if there is no simulation to get the time from, like for a motor on its own.
+        """
+        if np.ndim(altitude) > 0:
+            return self.calculate_atmosphere(np.asarray(altitude, dtype="float64"), include_wind)
+
+        simulation = getattr(self, "simulation", None)
+        query = (simulation.time if simulation is not None else None, altitude)
+
+        if self.last_atmosphere_query != query:
+            self.last_atmosphere = self.calculate_atmosphere(altitude, False)
+            self.last_atmosphere_query = query
+
+        if include_wind and self.last_atmosphere.air_velocity is None:
+            self.last_atmosphere = replace(self.last_atmosphere, air_velocity=self.get_air_speed(altitude))
+
+        return self.last_atmosphere
+
+    def calculate_atmosphere(self, altitude, include_wind=True):
+        density, pressure, temperature = np.moveaxis(self.atmosphere_lookup(altitude / 1000), -1, 0)
+
+        if self.atmosphere_backend == "polynomial":
+            density = self.get_air_density_from_model(altitude / 1000)
+
+        air_velocity = None
+        if include_wind:
+            if np.ndim(altitude) == 0:
+                air_velocity = self.get_air_speed(altitude)
+            else:
+                air_velocity = np.array([self.get_air_speed(a) for a in altitude], dtype="float64").reshape(len(altitude), 3)
+
+        return AtmosphereState(
+            altitude=altitude,
+            density=density,
+            pressure=pressure,
+            temperature=temperature,
+            speed_of_sound=self.get_speed_of_sound(altitude),
+            gravity=self.get_gravitational_attraction(1, altitude),
+            air_velocity=air_velocity
+        )
+
+    # endregion
 
     @property
     def gravitational_acceleration(self):
@@ -77,11 +179,14 @@ class Environment(PresetObject):
             self.earth_radius + altitude + self.base_altitude) ** 2
 
     def get_air_pressure(self, altitude):
-        return interpolated_lookup(self.atmospheric_data, "Altitude", altitude / 1000, "Pressure")
+        return self.pressure_lookup(altitude / 1000)
 
     def get_air_speed(self, altitude):
         if not self.apply_wind:
-            return [0, 0, 0]
+            return np.zeros(3)
+
+        if self.held_air_velocity is not None:
+            return np.copy(self.held_air_velocity)
         # this tells us how the rocket is moving through space relative to the surrounding fluids
         # Random things that might I come back to
         # https://retscreen.software.informer.com/4.0/
@@ -121,7 +226,7 @@ class Environment(PresetObject):
     def get_air_density_from_lookup(self, altitude):
         # TODO: Make these functions taht you can override like they are everywhere else.
         # This is mostly just here to double check that the model is working
-        return interpolated_lookup(self.atmospheric_data, "Altitude", altitude, "Density")
+        return self.density_lookup(altitude)
 
 
     def get_air_density(self, altitude):
@@ -129,5 +234,7 @@ class Environment(PresetObject):
 
         altitude /= 1000  # convert to kilometers
 
-        # return self.get_air_density_from_model(altitude)
+        if self.atmosphere_backend == "polynomial":
+            return self.get_air_density_from_model(altitude)
+
         return self.get_air_density_from_lookup(altitude)
@@ -7,6 +7,7 @@
 
 import numpy as np
 from math import isnan
+from functools import partial
 
 from lib.general import interpolate, project, combine
 from lib.general import angles_from_vector_3d, vector_from_angle, angle_between, magnitude
@@ -22,6 +23,12 @@ from lib.decorators import diametered
 from lib.vector import Vector
 from lib.rotation import Rotation
 
+
+def pick_coefficient(func, index, mach, alpha):
+    """One of the coefficients from a function that gives CD, CL, and CP all at once. A partial of this can still be pickled, unlike a lambda"""
+    return func(mach, alpha)[index]
+
+
 @diametered
 class Rocket(MassObject):
     """
@@ -68,6 +75,9 @@ class Rocket(MassObject):
         self.CL_data_type = dataType.CONSTANT
         self.CL = 0
 
+        # Looks each coefficient up on its own by default, override with set_aero_function to get all three from one lookup
+        self.aero_data_type = dataType.DEFAULT
+
 
         self.radius = 0.1016  # meters
         self.length = 7  # meters
@@ -107,6 +117,8 @@ class Rocket(MassObject):
 
         # This is overriden in the simulation initialization, so it is just here as a reminder
         self.apply_angular_forces = True
+        # Also set by the simulation. None means the frame-by-frame trapezoid scheme in apply_acceleration and apply_velocity
+        self.integrator = None
 
         self.calculate_cached()
         self.update_previous()
@@ -124,21 +136,37 @@ class Rocket(MassObject):
         # endregion
 
     def simulate_step(self):
-        self.calculate_cached()
+        """
+            Returns the time increment that was taken, which is only different from the simulation's for adaptive integrators
+        """
+        time = self.simulation.time
+        time_increment = self.simulation.time_increment
+        state = self.get_state()
+
+        if self.integrator is None:
+            self.calculate_cached()
+
 
+            # First, apply all of the forces to the rocket
+            self.apply_air_resistance()
+            self.apply_thrust()
+            self.apply_gravity()
 
-        # First, apply all of the forces to the rocket
-        self.apply_air_resistance()
-        self.apply_thrust()
-        self.apply_gravity()
+            # Then, update the object's position and speed
+            self.apply_acceleration()
+            self.apply_velocity()
 
-        # Then, update the object's position and speed
-        self.apply_acceleration()
-        self.apply_velocity()
+            if self.rotating:
+                self.apply_angular_acceleration()
+                self.apply_angular_velocity()
 
-        if (self.apply_angular_forces and self.off_rail and not self.parachute_deployed):
-            self.apply_angular_acceleration()
-            self.apply_angular_velocity()
+            new_state = self.get_state()
+            derivative, new_derivative = self.get_trapezoid_derivatives(state, new_state, time_increment)
+        else:
+            time_increment, derivative, new_state, new_derivative = self.integrate(state)
+
+        # The simulation uses this to find exactly when events happened during the frame
+        self.last_step = (time, time_increment, state, derivative, new_state, new_derivative)
 
 
         self.update_maxes()
@@ -149,6 +177,10 @@ class Rocket(MassObject):
                 if parachute.should_deploy(self):
                     parachute.deploy(self)
 
+                    if self.integrator is not None:
+                        # The drag just jumped, so nothing from the last step is any good anymore
+                        self.integrator.reset_step()
+
 
         # Set yourself up for the next frame
         if isnan(self.position[2]):
@@ -158,6 +190,8 @@ class Rocket(MassObject):
         self.force = Vector(0, 0, 0)
         self.torque = Rotation(0, 0)
 
+        return time_increment
+
     # region PROPERTIES
     @property
     def motor(self):
@@ -199,6 +233,11 @@ class Rocket(MassObject):
     def descending(self):
         return self.velocity[2] < 0
 
+    @property
+    def rotating(self):
+        """Return whether the angular kinematics should be updated this frame"""
+        return self.apply_angular_forces and self.off_rail and not self.parachute_deployed
+
     @property
     def thrusting(self):
         return self.motor.calculate_thrust(self.simulation.time) > 0
@@ -230,7 +269,7 @@ class Rocket(MassObject):
     @property
     def mach(self):
         # How many speed of sounds am I going
-        v = self.environment.get_speed_of_sound(self.altitude)
+        v = self.atmosphere.speed_of_sound
 
         return magnitude(self.velocity) / v
 
@@ -240,8 +279,7 @@ class Rocket(MassObject):
         Return the number of gees the rocket is accelerating at
         Adjusted for the variation as the rocket leaves the atmosphere (because I can)
         """
-        grav_acceleration = self.environment.get_gravitational_attraction(
-            self.total_mass, self.altitude) / self.total_mass
+        grav_acceleration = self.atmosphere.gravity
         return magnitude(self.acceleration) / grav_acceleration
 
     @property
@@ -249,6 +287,11 @@ class Rocket(MassObject):
         # Using Z as up vector
         return self.environment.base_altitude + self.position[2]
 
+    @property
+    def atmosphere(self):
+        """Everything about the air around the rocket right now. Only gets calculated once per frame"""
+        return self.environment.get_atmosphere(self.altitude)
+
     def update_maxes(self):
         if self.position[2] < -100 and not self.has_lifted:
             raise Exception("Your rocket fell straight into the ground. It might be because there is no 0,0 point in the thrust curve")
@@ -292,9 +335,15 @@ class Rocket(MassObject):
             self.p_angular_velocity, self.angular_velocity)
         self.rotation += combined_angular_velocity * self.simulation.time_increment
 
-        # Flip all of the rotation
-        # Change the theta_down so that it is never negative (should always be between 0 and pi)
-        # Swap the velocity so that it is still going the same way
+        self.flip_rotation()
+
+    def flip_rotation(self):
+        """
+            Flip all of the rotation
+            Change the theta_down so that it is never negative (should always be between 0 and pi)
+            Swap the velocity so that it is still going the same way
+            Returns whether anything was flipped
+        """
         if (self.rotation[1] > np.pi):
             self.rotation[0] += np.pi
             self.rotation[0] %= np.pi * 2
@@ -315,6 +364,10 @@ class Rocket(MassObject):
 
             self.angular_acceleration[1] *= -1
             self.angular_velocity[1] *= -1
+        else:
+            return False
+
+        return True
 
     def apply_angular_acceleration(self):
         combined_angular_acceleration = combine(
@@ -328,6 +381,123 @@ class Rocket(MassObject):
 
 
 
+    # region STATE VECTOR
+    # Everything the integrators in lib.integration need: the state flattened into one array and a function for its derivative
+
+    def get_state(self):
+        """Position, velocity, rotation, angular velocity, then the motor mass"""
+        return np.concatenate([self.position, self.velocity, self.rotation, self.angular_velocity, [self.motor.total_mass]])
+
+    def set_state(self, state):
+        self.position = Vector(*state[0:3])
+        self.velocity = Vector(*state[3:6])
+        self.rotation = Rotation(*state[6:8])
+        self.angular_velocity = Rotation(*state[8:10])
+        self.motor.set_mass_constant(state[10])
+
+    def get_derivative(self, time, state):
+        """
+            Evaluate all of the forces at the given time and state.
+            Leaves the force, acceleration, drag, and thrust variables however they were for this evaluation, so they can still be logged
+        """
+        self.set_state(state)
+
+        # Everything else (wind, parachutes) looks up the time from the simulation
+        frame_time = self.simulation.time
+        self.simulation.time = time
+
+        try:
+            self.force = Vector(0, 0, 0)
+            self.torque = Rotation(0, 0)
+
+            self.calculate_cached()
+            self.apply_air_resistance()
+
+            self.thrust = self.motor.get_thrust(time, self.altitude)
+            self.apply_force(self.thrust, vector_from_angle(self.rotation))
+            self.apply_gravity()
+
+            mass_flow = self.motor.get_mass_flow(time)
+            acceleration = self.get_acceleration()
+
+            if self.rotating:
+                angular_velocity = self.angular_velocity
+                angular_acceleration = self.get_angular_acceleration()
+            else:
+                angular_velocity = np.zeros(2)
+                angular_acceleration = np.zeros(2)
+                self.angular_acceleration = Rotation(0, 0)
+        finally:
+            self.simulation.time = frame_time
+
+        return np.concatenate([self.velocity, acceleration, angular_velocity, angular_acceleration, [-mass_flow]])
+
+    def get_max_time_increment(self):
+        """
+            How far the integrator can go before it would step over burnout.
+        """
+        time_to_burnout = self.motor.get_burn_time() - self.simulation.time
+        if time_to_burnout > 1e-9:
+            return time_to_burnout
+
+        return np.inf
+
+    @staticmethod
+    def get_trapezoid_derivatives(state, new_state, time_increment):
+        """
+            The derivatives at the start and end of a frame from the trapezoid scheme, for interpolating between them.
+            The averaged acceleration is constant over the frame, so everything except the position changes linearly.
+            Also works on a 2D array of states, one rocket per row.
+        """
+        change = (new_state - state) / time_increment
+
+        derivative = np.copy(change)
+        derivative[..., 0:3] = state[..., 3:6]
+
+        new_derivative = np.copy(change)
+        new_derivative[..., 0:3] = new_state[..., 3:6]
+
+        return derivative, new_derivative
+
+    def integrate(self, state):
+        """
+            Move the rocket forwards one step with self.integrator instead of the trapezoid scheme.
+            Returns the time increment that was taken and the derivatives at either end.
+        """
+        time = self.simulation.time
+        was_off_rail = self.off_rail
+
+        # This is the first thing the step needs anyways, so it is cached
+        derivative = self.integrator.evaluate(self.get_derivative, time, state)
+
+        # The wind from the start of the step is used for the whole step, which is the same wind that the derivative above used
+        hold_wind = self.environment.apply_wind
+        if hold_wind:
+            self.environment.hold_wind(self.altitude)
+
+        try:
+            new_state, time_increment = self.integrator.step(self.get_derivative, time, state, self.simulation.time_increment, self.get_max_time_increment())
+        finally:
+            if hold_wind:
+                self.environment.release_wind()
+
+        if hold_wind:
+            # The last evaluation of the step used the held wind, but the end of this step is the start of the next one, so it needs the wind from then
+            self.integrator.clear_cache()
+
+        # Evaluating at the end leaves the forces right for logging, and the integrator reuses it to start the next step
+        new_derivative = self.integrator.evaluate(self.get_derivative, time + time_increment, new_state)
+        self.set_state(new_state)
+
+        self.motor.finished_thrusting = time + time_increment >= self.motor.get_burn_time()
+
+        if self.flip_rotation() or was_off_rail != self.off_rail:
+            self.integrator.reset_step()
+
+        return time_increment, derivative, new_state, new_derivative
+
+    # endregion
+
     def update_previous(self):
         """Update the variables that hold last frame's rocket features"""
         # I am just going to start applying a normal force here because this is super annoying. Hopefully nobody is trying to do one second rocket flights.
@@ -468,7 +638,7 @@ class Rocket(MassObject):
 
         air_velocity = Vector(0, 0, 0)
         if self.apply_angular_forces:
-            air_velocity = self.environment.get_air_speed(self.altitude)
+            air_velocity = self.atmosphere.air_velocity
 
         self.relative_velocity = self.velocity - air_velocity
 
@@ -476,7 +646,7 @@ class Rocket(MassObject):
             # Direction doesn't matter, since mag is zero.
             return 0, Vector(0, 0, 1), 0, Vector(0, 0, -1)
 
-        self.air_speed = self.environment.get_air_speed(self.altitude)
+        self.air_speed = self.atmosphere.air_velocity
 
         # Drag force is applied in the same direction as freestream velocity
         drag_direction = - self.relative_velocity / \
@@ -517,7 +687,7 @@ class Rocket(MassObject):
         # However, I think it will fix the issue with the rocket going through major oscillations after the thrust finishes
         # If you think about an oscillating system, the restoring force is always increasing as the rocket progresses through the burn. However, when it begins to decelerate and the density of the air decreases, the restoring forces diminish and the oscillations of the rocket will become more violent
 
-        density = self.environment.get_air_density(self.altitude)
+        density = self.atmosphere.density
 
         multiplier = 0.275 * density * self.radius * self.length ** 4 * 2
 
@@ -558,11 +728,10 @@ class Rocket(MassObject):
 
     # region Cached Values
     def calculate_dynamic_pressure(self):
-        relative_velocity = self.velocity - \
-            self.environment.get_air_speed(self.altitude)
+        atmosphere = self.atmosphere
+        relative_velocity = self.velocity - atmosphere.air_velocity
 
-        self.dynamic_pressure = 1 / 2 * self.environment.get_air_density(
-            self.altitude) * magnitude(
+        self.dynamic_pressure = 1 / 2 * atmosphere.density * magnitude(
             relative_velocity) ** 2
 
     def calculate_angle_of_attack(self):
@@ -570,8 +739,7 @@ class Rocket(MassObject):
             # We will assume that it is falling straight down
             self.angle_of_attack = 0
         else:
-            relative_velocity = self.velocity - \
-                self.environment.get_air_speed(self.altitude)
+            relative_velocity = self.velocity - self.atmosphere.air_velocity
 
             self.angle_of_attack = angle_between(
                 relative_velocity, vector_from_angle(self.rotation))
@@ -617,6 +785,19 @@ class Rocket(MassObject):
                 self.mach, self.angle_of_attack)
 
 
+    def get_aero_coefficients(self, mach, alpha):
+        """The coefficient of drag, the coefficient of lift, and the center of pressure, all from one lookup. Override with set_aero_function"""
+        return self.CD, self.CL, self.CP
+
+    def calculate_aero_coefficients(self):
+        if self.aero_data_type is dataType.FUNCTION_MACH_ALPHA:
+            self.CD, self.CL, self.CP = self.get_aero_coefficients(self.mach, self.angle_of_attack)
+            return
+
+        self.calculate_coefficient_of_drag()
+        self.calculate_coefficient_of_lift()
+        self.calculate_center_of_pressure()
+
     def calculate_cp_cg_dist(self):
         # Note that this is only used for dynamic stability calculations, nothing during the simulations
         self.dist_press_grav = self.CP - self.total_CG
@@ -627,9 +808,7 @@ class Rocket(MassObject):
     def calculate_cached(self):
         self.calculate_dynamic_pressure()
         self.calculate_angle_of_attack()
-        self.calculate_coefficient_of_drag()
-        self.calculate_coefficient_of_lift()
-        self.calculate_center_of_pressure()
+        self.calculate_aero_coefficients()
         self.calculate_cp_cg_dist()
 
     # endregion
@@ -637,29 +816,45 @@ class Rocket(MassObject):
 
     # region data INPUTS
     def set_CP_constant(self, value):
+        self.aero_data_type = dataType.DEFAULT
         self.CP_data_type = dataType.CONSTANT
         self.CP = value
 
     def set_CP_function(self, func):
+        self.aero_data_type = dataType.DEFAULT
         self.CP_data_type = dataType.FUNCTION_MACH_ALPHA
         self.get_center_of_pressure = func
 
     def set_CD_constant(self, value):
+        self.aero_data_type = dataType.DEFAULT
         self.CD_data_type = dataType.CONSTANT
         self.CD = value
 
     def set_CD_function(self, func):
+        self.aero_data_type = dataType.DEFAULT
         self.CD_data_type = dataType.FUNCTION_MACH_ALPHA
         self.get_coefficient_of_drag = func
 
     def set_CL_constant(self, value):
+        self.aero_data_type = dataType.DEFAULT
         self.CL_data_type = dataType.CONSTANT
         self.CL = value
 
     def set_CL_function(self, func):
+        self.aero_data_type = dataType.DEFAULT
         self.CL_data_type = dataType.FUNCTION_MACH_ALPHA
         self.get_coefficient_of_lift = func
 
+    def set_aero_function(self, func):
+        """func(mach, alpha) has to return the coefficient of drag, the coefficient of lift, and the center of pressure, like AeroTable does"""
+        # Each one can still be looked up on its own if one of them gets overridden later
+        self.set_CD_function(partial(pick_coefficient, func, 0))
+        self.set_CL_function(partial(pick_coefficient, func, 1))
+        self.set_CP_function(partial(pick_coefficient, func, 2))
+
+        self.aero_data_type = dataType.FUNCTION_MACH_ALPHA
+        self.get_aero_coefficients = func
+
     # endregion
 
 
@@ -4,10 +4,57 @@
 
 
 
+import numpy as np
+
 from lib.data import dataType
 from lib.presetObject import PresetObject
 
 
+#region Cache
+def mass_properties_changed():
+    """
+    Throws out every cached total. Setting any of the attributes in MassObject.mass_property_attributes already does this automatically.
+    """
+    MassObject.mass_epoch += 1
+
+
+class MassPropertyCache(dict):
+    """
+    Holds the totals that have been calculated for one mass object, along with the epoch they were calculated in.
+    Copies and pickles come out empty, since the epoch they were calculated in means nothing to another object or another process.
+    """
+
+    def __deepcopy__(self, memo):
+        return MassPropertyCache()
+
+    def __reduce__(self):
+        return (MassPropertyCache, ())
+
+
+class MassObjectList(list):
+    """
+    A list of mass objects that throws out the cached totals whenever it is changed in place, like with append or extend.
+    """
+
+    def __reduce_ex__(self, protocol):
+        return (MassObjectList, (list(self),))
+
+
+def _changing_method(name):
+    method = getattr(list, name)
+
+    def changing(self, *args, **kwargs):
+        mass_properties_changed()
+        return method(self, *args, **kwargs)
+
+    return changing
+
+for name in ["append", "extend", "insert", "remove", "pop", "clear", "sort", "reverse", "__setitem__", "__delitem__", "__iadd__", "__imul__"]:
+    setattr(MassObjectList, name, _changing_method(name))
+
+#endregion
+
+
 # We inherit from preset object because we should be able to save the configuration of mass objects
 class MassObject(PresetObject):
     """
@@ -15,10 +62,26 @@ class MassObject(PresetObject):
     Aside from storing the mass, this class also deals with the moment of inertia and the center of gravity. 
 
     With moment of inertia, all items are assumed to be point masses
+
+    The totals are cached, since the whole tree used to be walked dozens of times every frame.
+    Anything that changes a total bumps the mass_epoch, and a cached total is only used if it was calculated in the current epoch.
     """
 
     # TODO: make items flat-headed cylinders with uniformly distributed mass instead of points
 
+    # Setting any of these could change the totals of this object or of anything it is inside of
+    mass_property_attributes = frozenset(["mass", "front", "center_of_gravity", "mass_objects", "mass_data_type", "CG_data_type", "moment_data_type", "moment_of_inertia"])
+    mass_epoch = 0
+
+    def __setattr__(self, name, value):
+        if name in MassObject.mass_property_attributes:
+            MassObject.mass_epoch += 1
+
+            if name == "mass_objects" and not isinstance(value, MassObjectList):
+                value = MassObjectList(value)
+
+        super().__setattr__(name, value)
+
     def __init__(self, **kwargs):
         # This has the nice side effect that everything has access to the simulation now
         self.simulation = None
@@ -41,12 +104,70 @@ class MassObject(PresetObject):
 
         super().overwrite_defaults(**kwargs)
 
+    # region Cached Totals
+    @property
+    def cacheable(self):
+        """Whether this object's own mass properties can be cached. Anything calculated on the fly (like the fin mass) could change without us knowing"""
+        if isinstance(getattr(type(self), "mass", None), property):
+            return False
+
+        return dataType.FUNCTION_TIME not in (self.mass_data_type, self.CG_data_type, self.moment_data_type)
+
+    def get_mass_property(self, name, calculate):
+        """
+        Only calls calculate if something has changed since the last time.
+        calculate should return the value and whether it is safe to cache, and so does this.
+        """
+        cache = self.__dict__.get("_mass_cache")
+        if cache is None:
+            cache = self.__dict__["_mass_cache"] = MassPropertyCache()
+
+        cached = cache.get(name)
+        if cached is not None and cached[0] == MassObject.mass_epoch:
+            return cached[1], True
+
+        value, cacheable = calculate()
+        if cacheable:
+            cache[name] = (MassObject.mass_epoch, value)
+
+        return value, cacheable
+
+    # endregion
+
+
     # region Total Mass
     @property
     def total_mass(self):
-        return self.get_total_mass()       
+        return self.find_total_mass()[0]
+
+    def find_total_mass(self):
+        """Returns the total mass and whether it can be cached"""
+        if self.mass_data_type is dataType.DEFAULT:
+            return self.get_mass_property("total_mass", self.calculate_total_mass)
+
+        if self.mass_data_type == dataType.CONSTANT:
+            return self.mass, self.cacheable
+
+        if self.mass_data_type == dataType.FUNCTION_TIME:
+            return self.mass_given_time(self.simulation.time), False
+
+        return None, False
+
+    def calculate_total_mass(self):
+        total = self.mass
+        cacheable = self.cacheable
+
+        for mass_object in self.mass_objects:
+            mass, child_cacheable = mass_object.find_total_mass()
+            total += mass
+            cacheable = cacheable and child_cacheable
+
+        return total, cacheable
 
     def get_total_mass(self, exclude_objects=[]):
+        if len(exclude_objects) == 0:
+            return self.total_mass
+
         if self.mass_data_type is dataType.DEFAULT:
             if self in exclude_objects:
                 return 0
@@ -107,30 +228,42 @@ class MassObject(PresetObject):
 
     # region Total Center of Gravity
     @property
-    def total_CG(self, local=False):
-        if self.CG_data_type == dataType.DEFAULT:
-            current_CG = self.center_of_gravity
-            current_CG_mass_weight = self.mass
-
-            for mass_object in self.mass_objects:
-                additional_mass = mass_object.total_mass
-                # Centers of gravity weighted by the mass of the objects
-                total_mass_distance = current_CG * current_CG_mass_weight + additional_mass * mass_object.total_CG
-                current_CG = (total_mass_distance) / (additional_mass + current_CG_mass_weight)
-                current_CG_mass_weight += additional_mass
-
-            # If we are wanting the CG of this relative to a parent object, 
-            # we need to add the distance from the front of the parent object that we are at
-            if not local:
-                current_CG += self.front
+    def total_CG(self):
+        return self.find_total_CG()[0]
 
-            return current_CG
+    def find_total_CG(self):
+        """Returns the total CG and whether it can be cached"""
+        if self.CG_data_type == dataType.DEFAULT:
+            return self.get_mass_property("total_CG", self.calculate_total_CG)
 
         if self.CG_data_type == dataType.CONSTANT:
-            return self.center_of_gravity
+            return self.center_of_gravity, self.cacheable
         
         if self.CG_data_type == dataType.FUNCTION_TIME:
-            return self.CG_given_time(self.simulation.time)
+            return self.CG_given_time(self.simulation.time), False
+
+        return None, False
+
+    def calculate_total_CG(self):
+        current_CG = self.center_of_gravity
+        current_CG_mass_weight = self.mass
+        cacheable = self.cacheable
+
+        for mass_object in self.mass_objects:
+            additional_mass, mass_cacheable = mass_object.find_total_mass()
+            CG, CG_cacheable = mass_object.find_total_CG()
+            cacheable = cacheable and mass_cacheable and CG_cacheable
+
+            # Centers of gravity weighted by the mass of the objects
+            total_mass_distance = current_CG * current_CG_mass_weight + additional_mass * CG
+            current_CG = (total_mass_distance) / (additional_mass + current_CG_mass_weight)
+            current_CG_mass_weight += additional_mass
+
+        # We want the CG of this relative to a parent object, 
+        # so we need to add the distance from the front of the parent object that we are at
+        current_CG += self.front
+
+        return current_CG, cacheable
 
     def CG_given_time(self, time):
         raise NotImplementedError("If you are going to use a custom function for the CG over the time, you have to specify it by using 'set_CG_as_function_of_time'")
@@ -150,19 +283,8 @@ class MassObject(PresetObject):
     @property
     def total_moment_of_inertia(self):
         if self.moment_data_type == dataType.DEFAULT:
-            # Right now, there are no individual moments of inertia anyways, but I will keep the convention
-            total_moment = 0
-            total_CG = self.total_CG
-
-            # This one is much harder. We have to go through every single child individually, we can't do it recursively
-            all_mass_subobjects = self.flattened_mass_objects
-            for CG_from_front, mass_object in all_mass_subobjects:
-                # Notice that here we have to use the single mass of the object, not the total of the subobjects
-                total_moment += mass_object.mass * (CG_from_front - total_CG) ** 2
-
-            return total_moment
+            return self.get_mass_property("total_moment_of_inertia", self.calculate_total_moment_of_inertia)[0]
 
-    
         if self.moment_data_type == dataType.CONSTANT:
             # Notice that it is not set by default, so it will throw an error if you don't override it
             return self.moment_of_inertia
@@ -170,6 +292,18 @@ class MassObject(PresetObject):
         if self.moment_data_type == dataType.FUNCTION_TIME:
             return self.moment_given_time(self.simulation.time)
 
+    def calculate_total_moment_of_inertia(self):
+        # Right now, there are no individual moments of inertia anyways, but I will keep the convention
+        total_CG, CG_cacheable = self.find_total_CG()
+
+        # This one is much harder. We have to go through every single child individually, we can't do it recursively
+        (positions, masses, objects), flattened_cacheable = self.find_flattened_arrays()
+
+        # Notice that here we have to use the single mass of the object, not the total of the subobjects
+        total_moment = np.sum(masses * (positions - total_CG) ** 2)
+
+        return total_moment, CG_cacheable and flattened_cacheable
+
     def moment_given_time(self, time):
         raise NotImplementedError("If you are going to use a custom function for the moment of inertia over the time, you have to specify it by using 'set_moment_as_function_of_time'")
 
@@ -184,7 +318,41 @@ class MassObject(PresetObject):
     # endregion
 
 
+    @property
+    def flattened_mass_objects(self):
+        """
+        Return a flattened array of all of tuples of the mass objects that are underneath this
+        First index is the CG distance from the start
+        Second index is the actual mass object without any parent information
+        """
+        (positions, masses, objects), cacheable = self.find_flattened_arrays()
+
+        return list(zip(positions.tolist(), objects))
+
+    def find_flattened_arrays(self):
+        """
+        The flattened tree as numpy arrays of the positions and the single masses, along with the objects themselves.
+        Returns that and whether it can be cached
+        """
+        return self.get_mass_property("flattened", self.calculate_flattened_arrays)
+
+    def calculate_flattened_arrays(self):
+        flattened = self.collect_flattened_mass_objects()
+
+        positions = np.array([position for position, mass_object in flattened], dtype="float64")
+        masses = np.array([mass_object.mass for position, mass_object in flattened], dtype="float64")
+        objects = [mass_object for position, mass_object in flattened]
+
+        return (positions, masses, objects), all(mass_object.cacheable for mass_object in objects)
+
     def get_flattened_mass_objects(self, distance_from_original_front=0, exclude_objects=[]):
+        if distance_from_original_front == 0 and len(exclude_objects) == 0:
+            return self.flattened_mass_objects
+
+        return self.collect_flattened_mass_objects(distance_from_original_front, exclude_objects)
+
+    def collect_flattened_mass_objects(self, distance_from_original_front=0, exclude_objects=[]):
+        """Walks the whole tree without using the cache"""
         if self in exclude_objects:
             return []
 
@@ -193,18 +361,9 @@ class MassObject(PresetObject):
             if mass_object in exclude_objects:
                 continue
 
-            newly_flattened = mass_object.get_flattened_mass_objects(distance_from_original_front + self.front, exclude_objects)
+            newly_flattened = mass_object.collect_flattened_mass_objects(distance_from_original_front + self.front, exclude_objects)
             flattened.extend(newly_flattened)
             # exclude_objects.extend(newly_flattened)
         
         return flattened
-
-    @property
-    def flattened_mass_objects(self):
-        """
-        Return a flattened array of all of tuples of the mass objects that are underneath this
-        First index is the CG distance from the start
-        Second index is the actual mass object without any parent information
-        """
-        return self.get_flattened_mass_objects(0, [])
         
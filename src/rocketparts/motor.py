@@ -2,13 +2,16 @@
 # Started off as just a place to store the code to get a thrust curve up and running for a rocket class
 # Now there is a custom motor that can simulate a hybrid's combustion process
 
+from bisect import bisect_right
+
 import numpy as np
 import pandas as pd
 
 from src.rocketparts.massObject import MassObject
-from lib.data import interpolated_lookup, interpolated_lookup_2D, riemann_sum
+from lib.data import GridTable, LookupTable, riemann_sum
 from src.environment import Environment
-from src.constants import thrust_curve_path
+from src.constants import chem_path, thrust_curve_path
+from src.data.input import registry
 
 # Imports for defaults
 from src.rocketparts.motorparts.oxtank import OxTank
@@ -19,6 +22,17 @@ from src.simulation.motor.logger import MotorLogger
 
 
 
+def compile_thrust_lookup(dataframe: pd.DataFrame) -> LookupTable:
+    if dataframe.empty:
+        raise ValueError("The indicated dataframe has no values.")
+
+    if dataframe.iloc[0]["time"] != 0:
+        print("Passed motor thrust data has no zero time data point, it is added automatically")
+        dataframe.iloc[0]["time"] = 0
+
+    return LookupTable.from_dataframe(dataframe, "time", "thrust")
+
+
 class Motor(MassObject):
     # TODO: rewrite so I can have some variable names that actually make sense. Right now, .total_impulse just gives you a value that is literally not the total impulse
     # make some unscaled_variable names
@@ -57,22 +71,29 @@ class Motor(MassObject):
 
     def set_thrust_data_path(self, path):
         self.thrust_curve = path
-        dataframe = pd.read_csv(path)
-        self.set_thrust_data(dataframe)
+        # Every motor with the same thrust curve shares the same lookup, and copies of the motor share it too
+        # The dataframe isn't kept on the motor at all, so copying a motor doesn't copy the whole csv
+        self._thrust_data = None
+        self.set_thrust_lookup(registry.load(path, "thrust lookup", compile_thrust_lookup))
 
     def set_thrust_data(self, dataframe: pd.DataFrame):
-        if dataframe.empty:
-            raise ValueError("The indicated dataframe has no values.")
-        
-        if dataframe.iloc[0]["time"] != 0:
-            print("Passed motor thrust data has no zero time data point, it is added automatically")
-            dataframe.iloc[0]["time"] = 0
-
         self.thrust_curve = None
-        self.thrust_data = dataframe
+        self._thrust_data = dataframe
+        self.set_thrust_lookup(compile_thrust_lookup(dataframe))
 
-        self.total_impulse = riemann_sum(self.thrust_data["time"], self.thrust_data["thrust"])
-        self.burn_time = self.thrust_data.iloc[-1]["time"]
+    @property
+    def thrust_data(self) -> pd.DataFrame:
+        """The thrust curve as it was read in. For a thrust curve path it is shared with every other motor, so copy it before changing it"""
+        if self._thrust_data is None:
+            return registry.load(self.thrust_curve)
+
+        return self._thrust_data
+
+    def set_thrust_lookup(self, thrust_lookup: LookupTable):
+        self.thrust_lookup = thrust_lookup
+
+        self.total_impulse = riemann_sum(thrust_lookup.keys, thrust_lookup.values)
+        self.burn_time = thrust_lookup.max_key
         self.mass_per_thrust = self.propellant_mass / self.total_impulse
 
 
@@ -86,7 +107,7 @@ class Motor(MassObject):
 
         
         try:
-            self.thrust = self.thrust_multiplier * interpolated_lookup(self.thrust_data, "time", lookup_time, "thrust")
+            self.thrust = self.thrust_multiplier * self.thrust_lookup(lookup_time)
 
             new_mass = self.total_mass - self.thrust_to_mass(self.thrust, self.simulation.time_increment)
             self.set_mass_constant(new_mass)
@@ -100,13 +121,37 @@ class Motor(MassObject):
             self.finished_thrusting = True
             return 0
 
+    def get_thrust(self, time, altitude=0):
+        """
+            Same as calculate_thrust, but without changing the mass, so it can be evaluated at any time by the integrators in lib.integration
+        """
+        try:
+            thrust = self.thrust_multiplier * self.thrust_lookup(time / self.time_multiplier)
+        except IndexError:
+            return 0
+
+        self.thrust = thrust + self.get_nozzle_force_difference(altitude)
+
+        return self.thrust
+
+    def get_mass_flow(self, time):
+        """
+            How fast the propellant is leaving in kg/s. Matches the mass that calculate_thrust takes away each frame
+        """
+        try:
+            thrust = self.thrust_multiplier * self.thrust_lookup(time / self.time_multiplier)
+        except IndexError:
+            return 0
+
+        return self.thrust_to_mass(thrust, 1)
+
     def get_nozzle_force_difference(self, altitude):
         if not self.adjust_for_atmospheric:
             return 0
 
         # We assume that the inputted nozzle was simulated at sea level
         # so the thrust curve data is based on a rocket that has more environmental pressure compared to what it currently has
-        environmental_pressure = self.environment.get_air_pressure(altitude)
+        environmental_pressure = self.environment.get_atmosphere(altitude, include_wind=False).pressure
 
         # The higher the external pressure you tested at, the more of an increase we will get when the pressure is actually lower
         try:
@@ -151,6 +196,7 @@ class Motor(MassObject):
 
 
 class CustomMotor(Motor):
+    # To fly one, wrap it in a SubsteppedMotor (src.simulation.motor.substepped), so that it keeps its own clock instead of changing the flight's time increment
     # FIXME: scaling the burn time does not work for custom motors
     # TODO: add a simulation for the gas phase
 
@@ -158,6 +204,12 @@ class CustomMotor(Motor):
         self.pressurization_time_increment = None
         self.post_pressurization_time_increment = None
 
+        # Set this to pick the time increment every frame so that the chamber pressure changes by about this fraction per frame. It replaces the two time increments above
+        # The frames are tiny while the chamber charges up and grow to the max time increment once the burn settles down
+        self.relative_pressure_step = None
+        self.min_time_increment = 1e-4 # s
+        self.max_time_increment = 0.05 # s
+
         self.finished_thrusting = False
 
         self._ox_tank = OxTank()
@@ -165,10 +217,11 @@ class CustomMotor(Motor):
         self.combustion_chamber = CombustionChamber()
         self._nozzle = Nozzle()
 
-        self.data_path = "./Data/Input/CEA/CombustionLookup.csv"
+        self.data_path = f"{chem_path}/CombustionLookup.csv"
         self.update_data()
 
-        self.logger = MotorLogger(self)
+        # Set by the MotorSimulation
+        self.logger = None
 
         self.cstar_efficiency = 0.85
 
@@ -179,10 +232,6 @@ class CustomMotor(Motor):
 
         self.overwrite_defaults(**kwargs)
 
-        self.pressurization_time_increment = self.pressurization_time_increment or self.simulation.time_increment
-        self.post_pressurization_time_increment = self.post_pressurization_time_increment or self.simulation.time_increment
-        self.simulation.time_increment = self.pressurization_time_increment
-
         self.nozzle_area = self._nozzle.exit_area
 
         # This is only defined as a cached variable to provide easier graphing
@@ -202,29 +251,33 @@ class CustomMotor(Motor):
         self._data_path = d
         self.update_data()
     
+    # The columns of the CEA data that get updated every frame
+    CEA_keys = [
+        "Throat Velocity [m/s]",
+        "Exit Pressure [bar]",
+        "gamma",
+        "Chamber Density [kg/m^3]",
+        "Chamber Temperature [K]",
+        "C-star [m/s]",
+        "Molar Mass [g/mol]",
+    ]
+
     def update_data(self):
-        self.data = pd.read_csv(self.data_path)
+        # Every motor with the same propellants shares the same table
+        self.CEA_table = registry.load(self.data_path, "CEA table", self.compile_CEA_table)
+
+    @classmethod
+    def compile_CEA_table(cls, dataframe: pd.DataFrame) -> GridTable:
+        # Reshaping it into a grid once means that every frame is just one bilinear interpolation instead of filtering the dataframe over and over
+        return GridTable.from_dataframe(dataframe, "Chamber Pressure [bar]", "O/F Ratio", cls.CEA_keys)
 
     def update_values_from_CEA(self, chamber_pressure, OF):
         """
         This is doing a look up for the chamber pressure in Pascals.
-        It will always round the O/F and pressure up
+        Values outside of the table are clamped to its edges
         """
 
-        target_data = {
-            "Throat Velocity [m/s]": 0,
-            "Exit Pressure [bar]": 0,
-            "gamma": 0,
-            "Chamber Density [kg/m^3]": 0,
-            "Chamber Temperature [K]": 0,
-            "C-star [m/s]": 0,
-            "Molar Mass [g/mol]": 0,
-        }
-        target_keys = target_data.keys()
-        target_values = interpolated_lookup_2D(self.data, "Chamber Pressure [bar]", "O/F Ratio", chamber_pressure / 1e5, OF, target_keys, safe=True)
-        
-        for key, value in zip(target_keys, target_values):
-            target_data[key] = value
+        target_data = dict(zip(self.CEA_keys, self.CEA_table(chamber_pressure / 1e5, OF).tolist()))
 
         self.nozzle.throat_velocity = target_data["Throat Velocity [m/s]"]
         # TODO: add nozzle exit velocity just to check that the methods are the same (they should not be anymore; I added the effect of separation)
@@ -240,9 +293,35 @@ class CustomMotor(Motor):
         # Eventually, I should probably add an output for the nozzle throat temperature over time. We want to be certain that our graphite won't be damaged by the extreme heat
 
     def initialize_simulation(self):
-        self.ox_tank.start_drain()
+        if self.relative_pressure_step is not None:
+            # The chamber starts out changing as fast as it ever will
+            self.simulation.time_increment = self.min_time_increment
+            return
+
+        # The simulation is attached after the motor is made, so its time increment is only available now
+        self.pressurization_time_increment = self.pressurization_time_increment or self.simulation.time_increment
+        self.post_pressurization_time_increment = self.post_pressurization_time_increment or self.simulation.time_increment
+        self.simulation.time_increment = self.pressurization_time_increment
     
+    def get_next_time_increment(self, previous_pressure):
+        """
+        Scale the time increment so that the next frame changes the chamber pressure by about the relative pressure step, assuming it keeps changing as fast as it did this frame.
+        It can at most double each frame, so one quiet frame does not jump straight to the max.
+        """
+        time_increment = self.simulation.time_increment
+        pressure = self.combustion_chamber.pressure
+        relative_change = abs(pressure - previous_pressure) / pressure
+
+        if relative_change * 2 < self.relative_pressure_step:
+            factor = 2
+        else:
+            factor = self.relative_pressure_step / relative_change
+
+        return min(max(time_increment * factor, self.min_time_increment), self.max_time_increment)
+
     def calculate_thrust(self, altitude=0):
+        previous_pressure = self.combustion_chamber.pressure
+
         self.ox_tank.update_mass(-self.ox_flow * self.simulation.time_increment)
         self.combustion_chamber.update_combustion(self.ox_flow, self.nozzle, self.simulation.time_increment)
 
@@ -264,7 +343,10 @@ class CustomMotor(Motor):
 
         self.total_impulse += self.thrust * self.simulation.time_increment
 
-        if not self.combustion_chamber.pressurizing:
+        # The simulation has to have read the time increment for this frame before it changes
+        if self.relative_pressure_step is not None:
+            self.simulation.time_increment = self.get_next_time_increment(previous_pressure)
+        elif not self.combustion_chamber.pressurizing:
             self.simulation.time_increment = self.post_pressurization_time_increment
 
         return self.thrust
@@ -373,6 +455,12 @@ class CustomMotor(Motor):
     def average_regression_rate(self):
         return self.fuel_grain.approximate_average_regression_rate(self.get_burn_time())
 
+    def get_thrust(self, time, altitude=0):
+        raise NotImplementedError("The custom motor has to be simulated frame by frame, so it only works with the default trapezoid scheme (integrator=None)")
+
+    def get_mass_flow(self, time):
+        raise NotImplementedError("The custom motor has to be simulated frame by frame, so it only works with the default trapezoid scheme (integrator=None)")
+
     def end(self):
         self.finished_simulating = True
         self.burn_time = self.simulation.time
@@ -380,3 +468,126 @@ class CustomMotor(Motor):
     # endregion
 
 
+class ReplayMotor(Motor):
+    """
+    Plays back a custom motor burn that was simulated ahead of time, usually by a MotorCache (src.simulation.motor.cache).
+    None of the tank, injector, or chamber is simulated again. The chamber pressure of every frame is stored, so the thrust still goes through the same nozzle coefficient as the custom motor, just with the atmospheric pressure at the current altitude.
+
+    The thrust is held constant over each frame of the burn like it was in the motor simulation, so flights with the same time increment get exactly the thrust the custom motor would have given them.
+    The mass includes the propellant, like a normal Motor, and the propellant that the burn used is taken away from it.
+    """
+
+    # The columns that a burn needs to be played back
+    burn_columns = ["time", "thrust", "chamber_pressure", "isentropic_exponent", "exit_pressure", "mass_flow", "propellant_mass", "propellant_CG"]
+
+    def __init__(self, burn: pd.DataFrame = None, **kwargs):
+        """
+        :param burn: one row for the start of every frame, with the burn_columns. The last row is the end of the burn, with no thrust
+        :param Nozzle nozzle: the nozzle from the custom motor, used to correct the thrust for the atmospheric pressure
+        """
+        self.burn = burn
+        self.nozzle = Nozzle()
+
+        super().__init__(**kwargs)
+
+        self.adjust_for_atmospheric = True
+        self.overwrite_defaults(**kwargs)
+
+        # Everything but the propellant stays at the center of gravity it started at
+        self.dry_center_of_gravity = self.center_of_gravity
+        self.dry_mass = self.mass - self.initial_propellant_mass
+
+        if self.dry_mass < 0:
+            raise ValueError(f"The replay motor was given a mass of {self.mass} kg, which is less than the {self.initial_propellant_mass} kg of propellant in the burn. The mass has to include the propellant")
+
+        self.update_mass(0)
+
+    def set_thrust_data_path(self, path):
+        # The burn stands in for the thrust curve
+        self.set_burn(self.burn)
+
+    def set_burn(self, burn: pd.DataFrame):
+        if burn is None or burn.empty:
+            raise ValueError("The replay motor needs a burn to play back. Get one from a MotorCache")
+
+        missing = set(self.burn_columns) - set(burn.columns)
+        if missing:
+            raise ValueError(f"The burn is missing the columns {missing}")
+
+        self.burn = burn
+
+        times = burn["time"].to_numpy()
+        # Python lists are much quicker to bisect and index one element at a time than numpy arrays
+        self.frame_times = times.tolist()
+        self.frame_values = burn[["chamber_pressure", "isentropic_exponent", "exit_pressure", "mass_flow"]].to_numpy().tolist()
+        self.propellant_lookup = LookupTable.from_dataframe(burn, "time", ["propellant_mass", "propellant_CG"], safe=True)
+
+        self.burn_time = self.frame_times[-1]
+        self.total_impulse = float(np.sum(burn["thrust"].to_numpy()[:-1] * np.diff(times)))
+        self.initial_propellant_mass = burn["propellant_mass"].iloc[0]
+        self.propellant_mass = self.initial_propellant_mass
+        self.mass_per_thrust = self.propellant_mass / self.total_impulse
+
+    @property
+    def thrust_data(self) -> pd.DataFrame:
+        return self.burn[["time", "thrust"]]
+
+    def get_frame(self, time):
+        """The chamber pressure, isentropic exponent, exit pressure, and mass flow of the frame that the time is in, or None if it is not during the burn"""
+        lookup_time = time / self.time_multiplier
+
+        if lookup_time < 0 or lookup_time >= self.burn_time:
+            return None
+
+        return self.frame_values[bisect_right(self.frame_times, lookup_time) - 1]
+
+    def update_mass(self, time):
+        propellant_mass, propellant_CG = self.propellant_lookup(time / self.time_multiplier)
+        self.propellant_mass = propellant_mass
+
+        mass = self.dry_mass + propellant_mass
+        self.set_mass_constant(mass)
+        self.set_CG_constant((self.dry_mass * self.dry_center_of_gravity + propellant_mass * propellant_CG) / mass)
+
+    def calculate_thrust(self, altitude=0):
+        if self.finished_thrusting:
+            return 0
+
+        time = self.simulation.time
+        self.thrust = self.get_thrust(time, altitude)
+        # The mass at the end of the frame, the same way that Motor takes the propellant away
+        self.update_mass(time + self.simulation.time_increment)
+
+        if self.thrust == 0 and time >= self.get_burn_time():
+            print("Finished thrusting")
+            self.finished_thrusting = True
+
+        return self.thrust
+
+    def get_thrust(self, time, altitude=0):
+        frame = self.get_frame(time)
+
+        if frame is None:
+            self.thrust = 0
+            return 0
+
+        chamber_pressure, isentropic_exponent, exit_pressure, mass_flow = frame
+
+        if not self.adjust_for_atmospheric:
+            altitude = 0
+
+        self.nozzle.isentropic_exponent = isentropic_exponent
+        self.nozzle.exit_pressure = exit_pressure
+        nozzle_coefficient = self.nozzle.get_nozzle_coefficient(chamber_pressure, self.environment.get_air_pressure(altitude))
+
+        self.thrust = nozzle_coefficient * self.nozzle.throat_area * chamber_pressure * self.thrust_multiplier
+
+        return self.thrust
+
+    def get_mass_flow(self, time):
+        frame = self.get_frame(time)
+
+        if frame is None:
+            return 0
+
+        return frame[3] / self.time_multiplier
@@ -40,8 +40,13 @@ class CombustionChamber(PresetObject):
         self.density = 4  # kg/m^3
         self.cstar = 1500 # m/s
 
+        # "explicit" is forward Euler, which blows up once the time increment is longer than it takes the nozzle to empty the chamber (a few milliseconds), so it needs the limits
+        # "implicit" solves for the pressure at the end of the frame (backward Euler), so it is stable at any time increment and the limits below never kick in. Use it with CustomMotor.relative_pressure_step
+        # Explicit stays the default so that existing motors keep the same burns
+        self.pressure_integrator = "explicit"
+
         self.limit_pressure_change = True
-        # These values are currently designed around a 30 bar chamber with time increment 0.1, but there is no substitute for time increment 0.02
+        # Only used by the explicit integrator. These values are currently designed around a 30 bar chamber with time increment 0.1, but there is no substitute for time increment 0.02
         self.relative_pressure_increase_limit = 0.5
         self.relative_pressure_decrease_limit = 0.4
 
@@ -99,19 +104,38 @@ class CombustionChamber(PresetObject):
             self.pressure += planned_increment
             self.pressurizing = planned_increment > 0         
 
-    def update_combustion(self, ox_mass_flow, nozzle, time_increment):
-        # Calculate the mass flow out
-        self.mass_flow_out = self.pressure * nozzle.throat_area / self.cstar
+    def update_pressure_implicit(self, mass_flow_in, throat_area, time_increment):
+        """
+        Backward Euler on the mass continuity. Everything but the pressure is held at its value from the start of the frame, and the flow out of the nozzle is proportional to the pressure, so the pressure at the end of the frame comes straight out:
+        P_new = P + dt * R*T/V * (m-dot_in - P_new * A_t / c*)
+        Big time increments just land closer to the steady state pressure instead of overshooting it, so nothing needs to be clamped.
+        """
+        gas_factor = self.ideal_gas_constant * self.temperature / self.volume
+        outflow_per_pressure = throat_area / self.cstar
+
+        new_pressure = (self.pressure + time_increment * gas_factor * mass_flow_in) / (1 + time_increment * gas_factor * outflow_per_pressure)
 
+        self.pressurizing = new_pressure > self.pressure
+        self.pressure = new_pressure
+        # The flow out at the new pressure is what the mass balance used
+        self.mass_flow_out = new_pressure * outflow_per_pressure
+
+    def update_combustion(self, ox_mass_flow, nozzle, time_increment):
         # From the grain and the ox mass flow, calculate the mass flow of fuel
         self.fuel_grain.update_regression(ox_mass_flow, time_increment)
         volume_regression = self.fuel_grain.get_volume_flow()
 
-        # Update the pressure in the system. Uses the previously calculated mass flux out
-        effective_mass_flow_total = ox_mass_flow + (self.fuel_grain.density - self.density) * volume_regression - self.mass_flow_out
-        
-        self.update_pressure(effective_mass_flow_total, time_increment)
-        
+        # Everything flowing into the chamber, minus the gas it takes to fill the space the grain regressed out of
+        mass_flow_in = ox_mass_flow + (self.fuel_grain.density - self.density) * volume_regression
+
+        if self.pressure_integrator == "implicit" and self.pressure_data_type is dataType.DEFAULT:
+            self.update_pressure_implicit(mass_flow_in, nozzle.throat_area, time_increment)
+        else:
+            # Calculate the mass flow out
+            self.mass_flow_out = self.pressure * nozzle.throat_area / self.cstar
+
+            # Update the pressure in the system. Uses the previously calculated mass flux out
+            self.update_pressure(mass_flow_in - self.mass_flow_out, time_increment)
 
 
     def set_pressure_constant(self, pressure):
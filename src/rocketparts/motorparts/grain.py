@@ -346,11 +346,27 @@ class Grain(MassObject):
 
 
     def get_outer_cross_sectional_area(self):
-        return np.pi * self.outer_radius ** 2
+        return np.pi * self.geometry.outer_radius ** 2
 
     def get_volume_flow(self):
         return self.mass_flow / self.density
 
+    def get_station_view(self, mass_flow, port_radius):
+        """
+        A stand-in for this grain with an array wherever the flow and the port would be a float, one value for each station along the grain.
+        The regression rate functions can be evaluated for every station at once by passing them this instead of the grain.
+        """
+        return GrainArrays(
+            geometry=ArrayView(port_area=np.pi * port_radius ** 2, effective_radius=port_radius, length=self.geometry.length, outer_radius=self.geometry.outer_radius),
+            # Everything that is flowing through the port at that station, so it gives the local flux
+            ox_flow=mass_flow,
+            density=self.density,
+            fuel_temperature=self.fuel_temperature,
+            flame_temperature=self.flame_temperature,
+            verbose=False,
+            **{key: getattr(self, key) for key in regression_function_keys}
+        )
+
     def update_regression(self, ox_flow, time_increment, flame_temperature=2000):
         self.ox_flow = ox_flow
         self.flame_temperature = flame_temperature
@@ -364,8 +380,8 @@ class Grain(MassObject):
         if self.geometry.burned_through:
             raise Warning("You have burned through the entire fuel grain")
 
-        # Right now this is space-averaged. TODO: It might be kind of fun to do a not space-averaged thing, just simulating about 25 separate points along the grain
-        regression_rate = self.regression_rate
+        # This is space-averaged, unless the geometry is split into stations along the grain (like AxialAnnular)
+        regression_rate = self.geometry.get_regression_rate(self)
 
         regressed_distance = regression_rate * time_increment
         volume_flow = self.geometry.update_regression(regressed_distance)
@@ -400,6 +416,36 @@ class Grain(MassObject):
 
 
 
+# Every function on the grain that the regression rate functions might call
+regression_function_keys = ["regression_rate_function", "prandtl_number_function", "latent_heat_function", "friction_coefficient_function", "oxidizer_dynamic_viscosity_function", "enthalpy_difference_function"]
+
+
+class ArrayView:
+    """Holds arrays under the same attribute names as the object it stands in for"""
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+
+class GrainArrays(ArrayView):
+    """
+    Stands in for a grain (or a group of grains that share their property functions), with an array wherever the Grain would have a float.
+    The properties are borrowed straight from Grain, so the regression rate functions read it exactly the same way.
+    """
+    regression_rate = Grain.regression_rate
+    prandtl_number = Grain.prandtl_number
+    friction_coefficient = Grain.friction_coefficient
+    latent_heat = Grain.latent_heat
+    enthalpy_difference = Grain.enthalpy_difference
+    oxidizer_dynamic_viscosity = Grain.oxidizer_dynamic_viscosity
+    reynolds_number = Grain.reynolds_number
+    get_flux = Grain.get_flux
+    flux = Grain.flux
+    port_radius = Grain.port_radius
+    port_diameter = Grain.port_diameter
+    get_outer_cross_sectional_area = Grain.get_outer_cross_sectional_area
+
+
 class HTPBGrain(Grain):
     """Exact same as Grain, just uses different defaults. Be aware that you must also override the motor data_path to correct CEA data"""
     # This would probably be better implemented with the prototype design pattern, but I do not know how to use that
@@ -7,8 +7,10 @@ import numpy as np
 
 import pandas as pd
 from lib.decorators import diametered
-from lib.data import interpolated_lookup, interpolated_lookup_2D
+from lib.data import LookupTable
 from lib.presetObject import PresetObject
+from src.constants import input_path
+from src.data.input import registry
 
 # For now, I am assuming that all grains have a constant OD
 
@@ -76,6 +78,10 @@ class GrainGeometry(PresetObject, ABC):
         self.burn_area, self.port_area, self._port_volume = self.area_function(self)
         self._fuel_volume = self.total_volume - self.port_volume
 
+    def get_regression_rate(self, grain) -> float:
+        """How fast the port is growing. Space-averaged, so it just uses the regression rate of the whole grain"""
+        return grain.regression_rate
+
     def update_regression(self, regression_amount: float):
         self.length_regressed += regression_amount
 
@@ -104,19 +110,20 @@ class GrainGeometry(PresetObject, ABC):
 #region Burn Area Equations/Algorithms/Lookups
 # Ideally, all of these would work for any grain, but there are probably specialized algorithms, so we will just roll with it.
 # Since the burn area and the cross sectional area are inherently coupled, these functions return both those things
+def compile_area_table(dataframe: pd.DataFrame) -> LookupTable:
+    return LookupTable.from_dataframe(dataframe, "LengthRegressed", ["BurnArea", "PortArea", "PortVolume"], safe=True)
+
+def load_area_table(table_path: string) -> LookupTable:
+    """The burn area, port area, and port volume by length regressed from a regression csv, in that order. Every grain that burns from the same csv shares one, and it is only read again if the file has changed"""
+    return registry.load(table_path, "area table", compile_area_table)
+
 def get_areas_csv(table_path: string, per_meter: bool = True):
     """Create a function to lookup the burn area from the port volume. If per_meter is true, it will be multiplied by the length of the grain."""
-    # I do not know if passing this variable like this will work how I want
-    df = pd.read_csv(table_path)
+    table = load_area_table(table_path)
 
-    
     def burn_area_func(grain: GrainGeometry):
-        # TODO: write port volume function; adds regression * burn_area every time
-        r = grain.length_regressed
-        
-        burn_area = interpolated_lookup(df, "LengthRegressed", r, "BurnArea", safe=True)
-        port_area = interpolated_lookup(df, "LengthRegressed", r, "PortArea", safe=True)
-        port_volume = interpolated_lookup(df, "LengthRegressed", r, "PortVolume", safe=True)
+        # All three come out of the same search of the table
+        burn_area, port_area, port_volume = table.lookup_scalar(grain.length_regressed)
 
         if per_meter:
             burn_area *= grain.length
@@ -133,6 +140,17 @@ def get_areas_cylindrical(grain: "Annular"):
 
     return burn_area, port_area, port_volume
 
+def get_areas_axial(grain: "AxialAnnular"):
+    """Add up the cylinders of every station along the grain"""
+    station_length = grain.station_length
+
+    burn_area = np.pi * 2 * np.sum(grain.station_radii) * station_length
+    port_volume = np.pi * np.sum(grain.station_radii ** 2) * station_length
+    # The average cross section, so that the effective radius is the same as an annular grain with the same port volume
+    port_area = port_volume / grain.length
+
+    return burn_area, port_area, port_volume
+
 def multiply_areas(original_func: Callable, burn_area_multiplier=1, port_area_multiplier=1, port_volume_multiplier=1):
     # Unfortunatel coupled to the return signature of burn area func
     def new_func(*args, **kwargs):
@@ -173,11 +191,81 @@ class Annular(GrainGeometry):
 
 
 
+class AxialAnnular(Annular):
+    """
+    An annular grain that is split into stations along its length, each with its own port radius.
+    The flow picks up the fuel from every station upstream of it, so the flux (and usually the regression rate) goes up toward the nozzle.
+    Every station is regressed at once by evaluating the regression rate functions with arrays.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        """Accepts a station_count along with everything Annular does. Setting the port radius sets it for every station"""
+        self.station_radii = np.full(25, 0.05) # m
+        # The regression rate of each station last frame, which gives the fuel that is flowing past the stations downstream of it
+        self.station_regression_rates = np.zeros(25)
+
+        # Annular would calculate the area from a single port radius before there are any stations
+        GrainGeometry.__init__(self, **kwargs)
+
+        self.area_function = get_areas_axial
+
+        self.overwrite_defaults(**kwargs)
+
+    @property
+    def station_count(self):
+        return len(self.station_radii)
+
+    @station_count.setter
+    def station_count(self, count):
+        # Starts every station over at the effective radius
+        self.station_radii = np.full(count, self.port_radius)
+        self.station_regression_rates = np.zeros(count)
+        self.calculate_area()
+
+    @property
+    def station_length(self):
+        return self.length / self.station_count
+
+    @property
+    def port_radius(self):
+        return np.sqrt(np.mean(self.station_radii ** 2))
+
+    @port_radius.setter
+    def port_radius(self, r):
+        self.station_radii = np.full(self.station_count, r, dtype="float64")
+        self.calculate_area()
+
+    def get_regression_rate(self, grain) -> np.ndarray:
+        """The regression rate of every station, found with the oxidizer and all of the fuel from the stations upstream of it"""
+        fuel_flows = grain.density * self.station_regression_rates * np.pi * 2 * self.station_radii * self.station_length
+        # Half of the fuel from a station has joined the flow by the middle of it
+        mass_flow = grain.ox_flow + np.cumsum(fuel_flows) - fuel_flows / 2
+
+        self.station_regression_rates = np.broadcast_to(grain.get_station_view(mass_flow, self.station_radii).regression_rate, self.station_radii.shape)
+
+        return self.station_regression_rates
+
+    def update_regression(self, regression_amount):
+        """The regression amount can be one distance for every station, or an array with a distance for each"""
+        previous_port_volume = self.port_volume
+
+        self.station_radii = self.station_radii + regression_amount
+        self.length_regressed += np.mean(regression_amount)
+        self.calculate_area()
+
+        return self.port_volume - previous_port_volume
+
+    @property
+    def burned_through(self):
+        # The flame reaches the casing as soon as any station burns through
+        return np.any(self.station_radii > self.outer_radius)
+
+
 class StarSwirl(GrainGeometry):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
 
-        self.area_function = get_areas_csv("Data/Input/Regression/regressionLookup.csv")
+        self.area_function = get_areas_csv(f"{input_path}/regression/regressionlookup.csv")
 
         self.overwrite_defaults(**kwargs)
     
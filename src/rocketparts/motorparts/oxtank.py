@@ -2,12 +2,14 @@
 # Describes the ox tank - mostly just how to calculate ullage
 # In addition, it provides some design equations for determining the safety of the tank given the thickness and pressure
 
+from contextlib import contextmanager
 from math import pi
 from src.environment import Environment
 from src.rocketparts.massObject import MassObject
 
 from lib.general import cylindrical_volume, cylindrical_length
 from src.data.input.chemistry.nitrousproperties import *
+from src.data.input.chemistry.nitroustable import lookup_temperature, get_heat
 from lib.chemistry import van_der_waals_pressure
 from lib.decorators import diametered
 
@@ -35,6 +37,9 @@ class OxTank(MassObject):
         The ullage will be calculated automatically.
         """
         self.initializing = True
+        # While this is more than zero, changing the state variables does not solve for the state until it is read or the outermost deferred_update finishes
+        self.deferring = 0
+        self.state_outdated = False
         super().__init__()
 
         # State variables. They are all properties, so setting them will automatically update the state.
@@ -42,6 +47,8 @@ class OxTank(MassObject):
         self._length = 3.7 # m
         self.radius = 0.1016 # m
         self._ox_mass = 70.0 # kg
+        # Solved for from the others. The iterative backend starts from the last one
+        self._temperature = None # K
 
         self._volume = self.get_volume()
 
@@ -57,9 +64,12 @@ class OxTank(MassObject):
 
         self.environment = Environment()
 
+        # Either "table" to interpolate the temperature from the precomputed nitrous table, or "iterative" to solve for it every time, starting from the last temperature
+        self.nitrous_backend = "table"
+
         temperature = 293
         # That way it doesn't get to the override.
-        if temperature in kwargs:
+        if "temperature" in kwargs:
             temperature = kwargs["temperature"]
             del kwargs["temperature"]
 
@@ -83,11 +93,16 @@ class OxTank(MassObject):
         """
         if self.initializing:
             return
+
+        self.state_outdated = False
         
         # Recalculate all cached variables.
 
         self._volume = self.get_volume()
-        self._temperature, self._phase = calculate_temperature(self._volume, self.ox_mass, self._heat, iters=60)
+        if self.nitrous_backend == "table":
+            self._temperature, self._phase = lookup_temperature(self._volume, self.ox_mass, self._heat)
+        else:
+            self._temperature, self._phase = calculate_temperature_from_guess(self._volume, self.ox_mass, self._heat, self._temperature)
 
         if self.phase == NitrousState.LIQUID_ONLY:
             self._liquid_mass = self.ox_mass
@@ -114,6 +129,39 @@ class OxTank(MassObject):
             self._liquid_volume = None
             self._gas_volume = None
             self._ullage = 0 # Meh, I feel like this kinda represents ullage of 0.
+
+    def state_changed(self):
+        if self.deferring > 0:
+            self.state_outdated = True
+        else:
+            self.update_state()
+
+    def refresh_state(self):
+        """Solve for the state if anything changed since the last time. Everything that reads the state calls this first"""
+        if self.state_outdated:
+            self.update_state()
+
+    @contextmanager
+    def deferred_update(self):
+        """
+        Change as many of the state variables as you want inside of this, and the state is only solved once, when the block ends.
+        Reading the temperature, phase, ullage, or pressure inside of the block solves it early. The underscored variables are out of date until then.
+        """
+        self.deferring += 1
+
+        try:
+            yield self
+        finally:
+            self.deferring -= 1
+
+            if self.deferring == 0:
+                self.refresh_state()
+
+    def apply(self, mass_change: float, enthalpy_change: float):
+        """Change the mass (kg) and the heat (kJ) together, solving for the state only once"""
+        with self.deferred_update():
+            self.ox_mass += mass_change
+            self.heat += enthalpy_change
         
     #region State Variables: Updating state variables automatically updates state.
     @property
@@ -123,7 +171,7 @@ class OxTank(MassObject):
     @length.setter
     def length(self, l):
         self._length = l
-        self.update_state()
+        self.state_changed()
 
     @property
     def heat(self):
@@ -132,7 +180,7 @@ class OxTank(MassObject):
     @heat.setter
     def heat(self, h):
         self._heat = h
-        self.update_state()
+        self.state_changed()
     
     @property
     def ox_mass(self):
@@ -141,7 +189,7 @@ class OxTank(MassObject):
     @ox_mass.setter
     def ox_mass(self, m):
         self._ox_mass = m
-        self.update_state()
+        self.state_changed()
 
     #endregion
 
@@ -154,6 +202,7 @@ class OxTank(MassObject):
 
     @property
     def temperature(self):
+        self.refresh_state()
         return self._temperature
 
     @temperature.setter
@@ -162,8 +211,17 @@ class OxTank(MassObject):
 
     @property
     def ullage(self):
+        self.refresh_state()
         return self._ullage
 
+    def get_liquid_mass(self):
+        self.refresh_state()
+        return self._liquid_mass
+
+    def get_gas_mass(self):
+        self.refresh_state()
+        return self._gas_mass
+
     @property
     def oxidizer_center_of_mass(self):
         # All centers of mass are with reference to the top of the ox tank
@@ -219,13 +277,17 @@ class OxTank(MassObject):
 
     @property
     def phase(self):
+        self.refresh_state()
         return self._phase
 
     #endregion
 
     def set_temperature(self, temperature: float):
         # State will be automatically updated.
-        self.heat = calculate_heat(self._volume, self._ox_mass, temperature)
+        if self.nitrous_backend == "table":
+            self.heat = get_heat(self._volume, self._ox_mass, temperature)
+        else:
+            self.heat = calculate_heat(self._volume, self._ox_mass, temperature)
 
 
     def update_mass(self, mass_change: float, temperature: float = None, phase: NitrousState = None):
@@ -241,8 +303,6 @@ class OxTank(MassObject):
         if phase is None:
             phase = self.phase
 
-        self.ox_mass += mass_change
-
         if phase == NitrousState.SUPERCRITICAL:
             # Hopefully this is kind of right.
             specific_enthalpy = get_specific_enthalpy_of_liquid_nitrous(critical_temperature)
@@ -252,11 +312,13 @@ class OxTank(MassObject):
         elif phase == NitrousState.GAS_ONLY:
             specific_enthalpy = get_specific_enthalpy_of_gaseous_nitrous(temperature, override_low=True)
 
-        self.heat += mass_change * specific_enthalpy
+        # Setting the mass and then the heat would solve for a state in between that just gets thrown away
+        self.apply(mass_change, mass_change * specific_enthalpy)
 
     def drain_mass(self, drain_amount: float):
         """For a specific case of updating the mass."""
-        self.update_mass(-drain_amount, self._temperature, self._phase)
+        self.update_mass(-drain_amount, self.temperature, self.phase)
 
     def __repr__(self) -> str:
+        self.refresh_state()
         return f"OxTank(ox_mass={self.ox_mass:.1f} kg, pressure={self.pressure/100_000:.1f} bar, temperature={self.temperature:.0f} K, ullage={self.ullage*100:.0f}%, liquid_mass={self._liquid_mass:.1f})"
\ No newline at end of file
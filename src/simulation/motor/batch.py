@@ -0,0 +1,567 @@
+# BATCHED MOTOR SIMULATION
+# Steps a whole list of custom motor simulations at the same time, with the tank, chamber, grain and nozzle state of every motor stored in numpy arrays
+# It follows CustomMotor.calculate_thrust step for step, just for every motor in one go. Mostly useful for Monte Carlo dispersions, where the motors would otherwise be simulated one after another
+
+import numpy as np
+import pandas as pd
+
+from lib.simulation import Simulation
+from lib.data import dataType
+from lib.chemistry import van_der_waals_pressure
+from src.rocketparts.motor import CustomMotor
+from src.rocketparts.motorparts.grain import ArrayView, GrainArrays, regression_function_keys
+from src.rocketparts.motorparts.graingeometry import Annular, get_areas_cylindrical
+from src.rocketparts.motorparts.injector import Injector
+from src.data.input.chemistry.nitrousproperties import NitrousState, critical_temperature, get_vapor_pressure, get_specific_enthalpy_of_liquid_nitrous, get_specific_enthalpy_of_gaseous_nitrous
+from src.data.input.chemistry.nitroustable import lookup_temperatures
+
+
+class InjectorArrays(ArrayView):
+    """Same idea as GrainArrays, for the mass flow functions in injector.py"""
+    liquid_density = Injector.liquid_density
+    liquid_dynamic_viscosity = Injector.liquid_dynamic_viscosity
+    total_orifice_area = Injector.total_orifice_area
+    upstream_pressure = Injector.upstream_pressure
+    downstream_pressure = Injector.downstream_pressure
+    pressure_drop = Injector.pressure_drop
+
+
+def group_by(keys):
+    """Returns the index of the group for every key, and the first key of each group. Functions only equal themselves, so motors are grouped by which functions they use"""
+    groups = np.zeros(len(keys), dtype=int)
+    unique = []
+
+    for index, key in enumerate(keys):
+        for group, existing in enumerate(unique):
+            if existing == key:
+                groups[index] = group
+                break
+        else:
+            groups[index] = len(unique)
+            unique.append(key)
+
+    return groups, unique
+
+
+class BatchMotorSimulation(Simulation):
+    """
+    Run a list of MotorSimulations with CustomMotors in lockstep.
+    Set up every simulation like you would to run it by itself; the batch reads the motors in, steps all of them together, and writes the results back into the motor objects when it ends.
+    Each motor stops as soon as MotorSimulation.is_finished would stop it, and the rest keep going.
+
+    All of the simulations have to share one time increment, so the motors cannot switch to a different time increment after pressurizing.
+    Only annular grains are supported. The mass flow and regression rate functions are called with arrays for a whole group of motors at once, so they have to work with numpy arrays (the ones in injector.py and grain.py do).
+    Nothing is logged frame by frame, but the thrust of every motor is stored in thrust_curves.
+    """
+
+    def __init__(self, simulations, **kwargs):
+        super().__init__(**kwargs)
+        self.logger = None
+
+        # This is set after the defaults are saved, otherwise the preset would deep copy every single motor in the batch
+        self.simulations = list(simulations)
+        # If a motor throws an error partway through, it is stored here by its index instead of stopping the whole batch
+        self.errors = {}
+
+        self.compile()
+
+    #region Compiling
+    def compile(self):
+        """Read the current state of every simulation into arrays"""
+        if len(self.simulations) == 0:
+            raise ValueError("There are no simulations in the batch")
+
+        first = self.simulations[0]
+        for simulation in self.simulations:
+            motor = simulation.motor
+
+            if not isinstance(motor, CustomMotor) or type(motor).calculate_thrust is not CustomMotor.calculate_thrust:
+                raise NotImplementedError("The batched motor simulation only supports custom motors")
+
+            # The same as CustomMotor.initialize_simulation
+            pressurization_time_increment = motor.pressurization_time_increment or simulation.time_increment
+            post_pressurization_time_increment = motor.post_pressurization_time_increment or simulation.time_increment
+
+            if simulation.time_increment != first.time_increment or simulation.time != first.time:
+                raise ValueError("Every simulation in a batch must have the same time increment and start at the same time")
+
+            if pressurization_time_increment != simulation.time_increment or post_pressurization_time_increment != simulation.time_increment:
+                raise ValueError("The batch steps every motor together, so the motors cannot use a different time increment while pressurizing")
+
+            if motor.relative_pressure_step is not None:
+                raise ValueError("The batch steps every motor together, so the motors cannot pick their own time increments")
+
+            geometry = motor.fuel_grain.geometry
+            if not isinstance(geometry, Annular) or geometry.area_function is not get_areas_cylindrical:
+                raise NotImplementedError("The batched motor simulation only supports annular grains")
+
+            if motor.combustion_chamber.pressure_data_type not in [dataType.DEFAULT, dataType.CONSTANT]:
+                raise NotImplementedError("The batched motor simulation does not support a chamber pressure that is a function of time")
+
+        self.time_increment = first.time_increment
+        self.time = first.time
+
+        self.motors = [simulation.motor for simulation in self.simulations]
+        self.count = len(self.motors)
+
+        self.compile_tanks()
+        self.compile_injectors()
+        self.compile_chambers()
+        self.compile_grains()
+        self.compile_nozzles()
+
+        motors = self.motors
+        self.thrust_multiplier = np.array([motor.thrust_multiplier for motor in motors], dtype="float64")
+        self.cstar_efficiency = np.array([motor.cstar_efficiency for motor in motors], dtype="float64")
+        self.thrust = np.array([motor.thrust for motor in motors], dtype="float64")
+        self.OF = np.array([motor.OF for motor in motors], dtype="float64")
+        self.total_impulse = np.array([motor.total_impulse for motor in motors], dtype="float64")
+        # The motor simulation always asks for the thrust at an altitude of zero
+        self.atmospheric_pressure = np.array([motor.environment.get_air_pressure(0) for motor in motors], dtype="float64")
+
+        # Motors that read the same CEA data share one table, so it is looked up once per frame for all of them
+        self.CEA_group, paths = group_by([motor.data_path for motor in motors])
+        self.CEA_tables = [motors[list(self.CEA_group).index(group)].CEA_table for group in range(len(paths))]
+
+        self.frames_per_motor = np.array([simulation.frames for simulation in self.simulations])
+        self.max_frames_per_motor = np.array([simulation.max_frames for simulation in self.simulations])
+        self.times = np.array([simulation.time for simulation in self.simulations], dtype="float64")
+        self.finished = np.zeros(self.count, dtype=bool)
+        self.failed = np.zeros(self.count, dtype=bool)
+
+        # One row for each motor and one column for each frame. The columns double whenever they fill up
+        self.curve_frames = 0
+        self.curve_capacity = 1024
+        self.thrust_data = np.full((self.count, self.curve_capacity), np.nan)
+        self.time_data = np.zeros(self.curve_capacity)
+
+        self.update_finished(np.arange(self.count))
+
+    def compile_tanks(self):
+        tanks = [motor.ox_tank for motor in self.motors]
+
+        for tank in tanks:
+            tank.refresh_state()
+
+        self.ox_mass = np.array([tank.ox_mass for tank in tanks], dtype="float64")
+        self.heat = np.array([tank.heat for tank in tanks], dtype="float64")
+        self.tank_volume = np.array([tank.get_volume() for tank in tanks], dtype="float64")
+        self.tank_radius = np.array([tank.radius for tank in tanks], dtype="float64")
+        self.tank_gravitational_acceleration = np.array([tank.environment.gravitational_acceleration for tank in tanks], dtype="float64")
+        self.molar_mass = np.array([tank.molar_mass for tank in tanks], dtype="float64")
+        self.van_der_waals_a = np.array([tank.a for tank in tanks], dtype="float64")
+        self.van_der_waals_b = np.array([tank.b for tank in tanks], dtype="float64")
+
+        self.tank_temperature = np.array([tank.temperature for tank in tanks], dtype="float64")
+        self.phase = np.array([tank.phase.value for tank in tanks])
+        self.tank_pressure = np.zeros(self.count)
+
+        rows = np.arange(self.count)
+        supercritical = self.phase == NitrousState.SUPERCRITICAL.value
+        self.tank_pressure[~supercritical] = self.get_tank_pressure(rows[~supercritical])
+        self.fail(rows[supercritical], NotImplementedError("The ox tank started off supercritical"))
+
+    def compile_injectors(self):
+        injectors = [motor.injector for motor in self.motors]
+
+        self.orifice_count = np.array([injector.orifice_count for injector in injectors], dtype="float64")
+        self.orifice_diameter = np.array([injector.orifice_diameter for injector in injectors], dtype="float64")
+        self.injector_group, self.mass_flow_functions = group_by([injector.mass_flow_function for injector in injectors])
+
+    def compile_chambers(self):
+        chambers = [motor.combustion_chamber for motor in self.motors]
+
+        self.chamber_pressure = np.array([chamber.pressure for chamber in chambers], dtype="float64")
+        self.chamber_temperature = np.array([chamber.temperature for chamber in chambers], dtype="float64")
+        self.chamber_density = np.array([chamber.density for chamber in chambers], dtype="float64")
+        self.cstar = np.array([chamber.cstar for chamber in chambers], dtype="float64")
+        self.ideal_gas_constant = np.array([chamber.ideal_gas_constant for chamber in chambers], dtype="float64")
+        self.mass_flow_out = np.array([chamber.mass_flow_out for chamber in chambers], dtype="float64")
+        self.pressurizing = np.array([chamber.pressurizing for chamber in chambers], dtype=bool)
+
+        self.constant_pressure = np.array([chamber.pressure_data_type is dataType.CONSTANT for chamber in chambers], dtype=bool)
+        self.implicit_pressure = np.array([chamber.pressure_integrator == "implicit" for chamber in chambers], dtype=bool)
+        self.limit_pressure_change = np.array([chamber.limit_pressure_change for chamber in chambers], dtype=bool)
+        self.relative_pressure_increase_limit = np.array([chamber.relative_pressure_increase_limit for chamber in chambers], dtype="float64")
+        self.relative_pressure_decrease_limit = np.array([chamber.relative_pressure_decrease_limit for chamber in chambers], dtype="float64")
+        # Everything in the chamber volume except for the port stays the same
+        self.mixing_volume = np.array([chamber.precombustion_chamber.volume + chamber.postcombustion_chamber.volume for chamber in chambers], dtype="float64")
+
+    def compile_grains(self):
+        grains = [motor.fuel_grain for motor in self.motors]
+
+        self.port_radius = np.array([grain.geometry.port_radius for grain in grains], dtype="float64")
+        self.outer_radius = np.array([grain.geometry.outer_radius for grain in grains], dtype="float64")
+        self.grain_length = np.array([grain.geometry.length for grain in grains], dtype="float64")
+        self.length_regressed = np.array([grain.geometry.length_regressed for grain in grains], dtype="float64")
+        self.grain_density = np.array([grain.density for grain in grains], dtype="float64")
+        self.fuel_temperature = np.array([grain.fuel_temperature for grain in grains], dtype="float64")
+        self.fuel_flow = np.array([grain.mass_flow for grain in grains], dtype="float64")
+
+        self.grain_group, self.grain_functions = group_by([tuple(getattr(grain, key) for key in regression_function_keys) for grain in grains])
+
+    def compile_nozzles(self):
+        nozzles = [motor.nozzle for motor in self.motors]
+
+        self.throat_area = np.array([nozzle.throat_area for nozzle in nozzles], dtype="float64")
+        self.area_ratio = np.array([nozzle.area_ratio for nozzle in nozzles], dtype="float64")
+        self.nozzle_efficiency = np.array([nozzle.efficiency for nozzle in nozzles], dtype="float64")
+        self.isentropic_exponent = np.array([nozzle.isentropic_exponent for nozzle in nozzles], dtype="float64")
+        self.exit_pressure = np.array([nozzle.exit_pressure for nozzle in nozzles], dtype="float64")
+        self.throat_velocity = np.array([getattr(nozzle, "throat_velocity", np.nan) for nozzle in nozzles], dtype="float64")
+
+    #endregion
+
+    @property
+    def active(self):
+        """Which motors are still being simulated"""
+        frames_remaining = (self.max_frames_per_motor == -1) | (self.max_frames_per_motor > self.frames_per_motor)
+
+        return ~self.finished & ~self.failed & frames_remaining
+
+    def is_finished(self):
+        return not np.any(self.active)
+
+    def update_finished(self, rows):
+        """The same check as MotorSimulation.is_finished"""
+        burned_through = self.port_radius[rows] > self.outer_radius[rows]
+        burning = (self.tank_pressure[rows] > self.chamber_pressure[rows]) & (self.ox_mass[rows] > 0) & ~burned_through
+
+        self.finished[rows] |= ~burning
+
+    def fail(self, rows, error):
+        for row in rows:
+            self.failed[row] = True
+            self.errors[row] = error
+
+    def simulate_step(self):
+        rows = np.flatnonzero(self.active)
+
+        if len(rows) > 0:
+            self.simulate_rows(rows)
+
+        super().simulate_step()
+
+    def simulate_rows(self, rows):
+        """The same thing as CustomMotor.calculate_thrust followed by MotorSimulation.simulate_step, for every motor in rows at once"""
+        time_increment = self.time_increment
+
+        # The motor does not cache the ox flow, so it is found again after each thing that it depends on changes
+        ox_flow = self.get_ox_flow(rows)
+
+        #region OxTank.update_mass
+        phase = self.phase[rows]
+        temperature = self.tank_temperature[rows]
+        gas_only = phase == NitrousState.GAS_ONLY.value
+        supercritical = phase == NitrousState.SUPERCRITICAL.value
+
+        # In equilibrium, there's a puddle at the bottom, so the liquid is what drains
+        specific_enthalpy = get_specific_enthalpy_of_liquid_nitrous(np.where(supercritical, critical_temperature, temperature), override_low=True)
+        if np.any(gas_only):
+            specific_enthalpy[gas_only] = get_specific_enthalpy_of_gaseous_nitrous(temperature[gas_only], override_low=True)
+
+        mass_change = -ox_flow * time_increment
+        self.ox_mass[rows] += mass_change
+        self.heat[rows] += mass_change * specific_enthalpy
+        self.update_tank_state(rows)
+        #endregion
+
+        ox_flow = self.get_ox_flow(rows)
+
+        #region CombustionChamber.update_combustion
+        fuel_flow = self.update_regression(rows, ox_flow, time_increment)
+        volume_regression = fuel_flow / self.grain_density[rows]
+
+        mass_flow_in = ox_flow + (self.grain_density[rows] - self.chamber_density[rows]) * volume_regression
+        self.update_pressure(rows, mass_flow_in, time_increment)
+        #endregion
+
+        ox_flow = self.get_ox_flow(rows)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            OF = np.where(fuel_flow == 0, 1e10, ox_flow / fuel_flow)
+        self.OF[rows] = OF
+
+        chamber_pressure = self.chamber_pressure[rows]
+        self.update_values_from_CEA(rows, chamber_pressure, OF)
+
+        nozzle_coefficient = self.get_nozzle_coefficient(rows, chamber_pressure, self.atmospheric_pressure[rows])
+        thrust = nozzle_coefficient * self.throat_area[rows] * chamber_pressure * self.thrust_multiplier[rows]
+
+        self.thrust[rows] = thrust
+        self.total_impulse[rows] += thrust * time_increment
+        self.record_thrust(rows, thrust)
+
+        self.frames_per_motor[rows] += 1
+        self.times[rows] += time_increment
+
+        broken = np.isnan(thrust)
+        if np.any(broken):
+            self.fail(rows[broken], Exception("Everything fell apart. NaN value in the thrust"))
+
+        self.update_finished(rows)
+
+    #region Ox tank
+    def update_tank_state(self, rows):
+        """Solve for the temperature, phase, and pressure of every tank in rows from its mass and heat, like OxTank.update_state"""
+        temperature, phase = lookup_temperatures(self.tank_volume[rows], self.ox_mass[rows], self.heat[rows])
+
+        self.tank_temperature[rows] = temperature
+        self.phase[rows] = phase
+
+        supercritical = phase == NitrousState.SUPERCRITICAL.value
+        if np.any(supercritical):
+            self.fail(rows[supercritical], NotImplementedError("The idea gas law doesn't work for supercritical fluids."))
+
+        self.tank_pressure[rows[~supercritical]] = self.get_tank_pressure(rows[~supercritical])
+
+    def get_tank_pressure(self, rows):
+        """Same as OxTank.pressure, in Pa"""
+        phase = self.phase[rows]
+        temperature = self.tank_temperature[rows]
+
+        # Return the pressure of the gas above the liquid.
+        pressure = get_vapor_pressure(temperature) * 100000
+
+        liquid_only = phase == NitrousState.LIQUID_ONLY.value
+        if np.any(liquid_only):
+            circle_area = np.pi * self.tank_radius[rows] ** 2
+            pressure[liquid_only] = (self.ox_mass[rows] / circle_area * self.tank_gravitational_acceleration[rows])[liquid_only]
+
+        gas_only = phase == NitrousState.GAS_ONLY.value
+        if np.any(gas_only):
+            moles = self.ox_mass[rows] / self.molar_mass[rows]
+            gas_pressure = van_der_waals_pressure(self.tank_volume[rows], moles, temperature, self.van_der_waals_a[rows], self.van_der_waals_b[rows])
+            pressure[gas_only] = gas_pressure[gas_only]
+
+        return pressure
+
+    #endregion
+
+    #region Injector
+    def get_ox_flow(self, rows):
+        """Same as Injector.mass_flow. Each mass flow function is called once with an InjectorArrays for all of the motors that use it"""
+        ox_flow = np.zeros(len(rows))
+        groups = self.injector_group[rows]
+
+        for group, function in enumerate(self.mass_flow_functions):
+            in_group = groups == group
+
+            if not np.any(in_group):
+                continue
+
+            grouped_rows = rows[in_group]
+            injector = InjectorArrays(
+                orifice_count=self.orifice_count[grouped_rows],
+                orifice_diameter=self.orifice_diameter[grouped_rows],
+                ox_tank=ArrayView(temperature=self.tank_temperature[grouped_rows], pressure=self.tank_pressure[grouped_rows]),
+                combustion_chamber=ArrayView(
+                    pressure=self.chamber_pressure[grouped_rows],
+                    fuel_grain=GrainArrays(geometry=ArrayView(outer_radius=self.outer_radius[grouped_rows]))
+                )
+            )
+
+            flowing = injector.pressure_drop >= 0
+            with np.errstate(invalid="ignore"):
+                ox_flow[in_group] = np.where(flowing, function(injector), 0)
+
+        return ox_flow
+
+    #endregion
+
+    #region Grain
+    def update_regression(self, rows, ox_flow, time_increment, flame_temperature=2000):
+        """Same as Grain.update_regression for annular grains. Returns the mass flow of fuel"""
+        port_radius = self.port_radius[rows]
+        port_area = np.pi * port_radius ** 2
+        ox_flux = ox_flow / port_area
+
+        # Give a warning if ox flux is too big: might blow fire out, might cause combustion instability
+        too_much_flux = ox_flux > 700
+        if np.any(too_much_flux):
+            self.fail(rows[too_much_flux], Warning("McLeod told us not to go past 500 kg/m^2-s. He warned of blowing the flame out, but I have also seen some combustion instability stuff."))
+
+        regression_rate = np.zeros(len(rows))
+        groups = self.grain_group[rows]
+
+        for group, functions in enumerate(self.grain_functions):
+            in_group = groups == group
+
+            if not np.any(in_group):
+                continue
+
+            grouped_rows = rows[in_group]
+            grain = GrainArrays(
+                geometry=ArrayView(port_area=port_area[in_group], effective_radius=port_radius[in_group], length=self.grain_length[grouped_rows], outer_radius=self.outer_radius[grouped_rows]),
+                ox_flow=ox_flow[in_group],
+                density=self.grain_density[grouped_rows],
+                fuel_temperature=self.fuel_temperature[grouped_rows],
+                flame_temperature=flame_temperature,
+                verbose=False,
+                **dict(zip(regression_function_keys, functions))
+            )
+
+            regression_rate[in_group] = grain.regression_rate
+
+        regressed_distance = regression_rate * time_increment
+        port_radius = port_radius + regressed_distance
+
+        self.port_radius[rows] = port_radius
+        self.length_regressed[rows] += regressed_distance
+
+        # The burn area is found after the port has already grown
+        burn_area = np.pi * port_radius * 2 * self.grain_length[rows]
+        fuel_flow = regressed_distance * burn_area / time_increment * self.grain_density[rows]
+        self.fuel_flow[rows] = fuel_flow
+
+        return fuel_flow
+
+    #endregion
+
+    #region Chamber
+    def update_pressure(self, rows, mass_flow_in, time_increment):
+        """Same as the end of CombustionChamber.update_combustion, with either integrator and without the print statements"""
+        pressure = self.chamber_pressure[rows]
+        volume = np.pi * self.port_radius[rows] ** 2 * self.grain_length[rows] + self.mixing_volume[rows]
+        gas_factor = self.ideal_gas_constant[rows] * self.chamber_temperature[rows] / volume
+        outflow_per_pressure = self.throat_area[rows] / self.cstar[rows]
+
+        # Explicit
+        mass_flow_out = pressure * outflow_per_pressure
+        planned_increment = (mass_flow_in - mass_flow_out) * gas_factor * time_increment
+
+        limiting = self.limit_pressure_change[rows]
+        increase_limit = pressure * self.relative_pressure_increase_limit[rows]
+        decrease_limit = pressure * self.relative_pressure_decrease_limit[rows]
+
+        increasing = planned_increment > 0
+        planned_increment = np.where(limiting & increasing & (planned_increment > increase_limit), increase_limit, planned_increment)
+        planned_increment = np.where(limiting & ~increasing & (np.abs(planned_increment) > decrease_limit), -decrease_limit, planned_increment)
+
+        new_pressure = pressure + planned_increment
+
+        # Implicit
+        implicit = self.implicit_pressure[rows] & ~self.constant_pressure[rows]
+        implicit_pressure = (pressure + time_increment * gas_factor * mass_flow_in) / (1 + time_increment * gas_factor * outflow_per_pressure)
+        new_pressure = np.where(implicit, implicit_pressure, new_pressure)
+        mass_flow_out = np.where(implicit, implicit_pressure * outflow_per_pressure, mass_flow_out)
+
+        constant = self.constant_pressure[rows]
+        self.chamber_pressure[rows] = np.where(constant, pressure, new_pressure)
+        self.pressurizing[rows] = np.where(constant, self.pressurizing[rows], new_pressure > pressure)
+        self.mass_flow_out[rows] = mass_flow_out
+
+    def update_values_from_CEA(self, rows, chamber_pressure, OF):
+        """Same as CustomMotor.update_values_from_CEA. Each table is looked up once for every motor that uses it"""
+        values = np.zeros((len(rows), len(CustomMotor.CEA_keys)))
+        groups = self.CEA_group[rows]
+
+        for group, table in enumerate(self.CEA_tables):
+            in_group = groups == group
+
+            if np.any(in_group):
+                values[in_group] = table(chamber_pressure[in_group] / 1e5, OF[in_group])
+
+        throat_velocity, exit_pressure, gamma, chamber_density, chamber_temperature, cstar, average_molar_mass = values.T
+
+        self.throat_velocity[rows] = throat_velocity
+        # Convert from bar to Pa
+        self.exit_pressure[rows] = exit_pressure * 10**5
+        self.isentropic_exponent[rows] = gamma
+        self.chamber_density[rows] = chamber_density
+        self.chamber_temperature[rows] = chamber_temperature * np.sqrt(self.cstar_efficiency[rows])
+        self.cstar[rows] = cstar * self.cstar_efficiency[rows]
+        # The molar mass is in g/mol by default, so we convert it to kg/mol
+        self.ideal_gas_constant[rows] = 8.314 / (average_molar_mass / 1000)
+
+    def get_nozzle_coefficient(self, rows, chamber_pressure, atmospheric_pressure):
+        """Same as Nozzle.get_nozzle_coefficient"""
+        isentropic_exponent = self.isentropic_exponent[rows]
+        isentropic_less = isentropic_exponent - 1
+        isentropic_more = isentropic_exponent + 1
+
+        with np.errstate(all="ignore"):
+            first_coefficient = 2 * isentropic_exponent ** 2 / isentropic_less
+            second_coefficient = (2 / isentropic_more) ** (isentropic_more / isentropic_less)
+            third_coefficient = 1 - (self.exit_pressure[rows] / chamber_pressure) ** (isentropic_less / isentropic_exponent)
+
+            momentum_component = self.nozzle_efficiency[rows] * np.sqrt(first_coefficient * second_coefficient * third_coefficient)
+
+            pressure_difference_component = (self.exit_pressure[rows] - atmospheric_pressure) / chamber_pressure * self.area_ratio[rows]
+
+        # Assume it does not actually get choked
+        return np.where(chamber_pressure / atmospheric_pressure < 2, 1, momentum_component + pressure_difference_component)
+
+    #endregion
+
+    #region Thrust curves
+    def record_thrust(self, rows, thrust):
+        if self.curve_frames == self.curve_capacity:
+            self.curve_capacity *= 2
+            self.thrust_data = np.concatenate([self.thrust_data, np.full(self.thrust_data.shape, np.nan)], axis=1)
+            self.time_data = np.concatenate([self.time_data, np.zeros(len(self.time_data))])
+
+        self.thrust_data[rows, self.curve_frames] = thrust
+        self.time_data[self.curve_frames] = self.time
+        self.curve_frames += 1
+
+    @property
+    def thrust_curves(self):
+        """An array with one row of thrusts for every motor, and one column for every frame. It is NaN after a motor stops"""
+        return self.thrust_data[:, :self.curve_frames]
+
+    @property
+    def curve_times(self):
+        """The time at the start of every frame in thrust_curves"""
+        return self.time_data[:self.curve_frames]
+
+    def get_thrust_curve(self, index) -> pd.DataFrame:
+        """The thrust curve of one motor, in the same layout as the csv files that Motor reads"""
+        thrust = self.thrust_curves[index]
+        simulated = ~np.isnan(thrust)
+
+        return pd.DataFrame({"time": self.curve_times[simulated], "thrust": thrust[simulated]})
+
+    #endregion
+
+    def end(self):
+        self.write_results()
+
+        return super().end()
+
+    def write_results(self):
+        """Copy the state of every motor back into the objects it came from"""
+        for index, (simulation, motor) in enumerate(zip(self.simulations, self.motors)):
+            tank = motor.ox_tank
+            with tank.deferred_update():
+                tank.ox_mass = self.ox_mass[index]
+                tank.heat = self.heat[index]
+
+            geometry = motor.fuel_grain.geometry
+            geometry.port_radius = self.port_radius[index]
+            geometry.length_regressed = self.length_regressed[index]
+            motor.fuel_grain.mass_flow = self.fuel_flow[index]
+
+            chamber = motor.combustion_chamber
+            chamber.pressure = self.chamber_pressure[index]
+            chamber.temperature = self.chamber_temperature[index]
+            chamber.density = self.chamber_density[index]
+            chamber.cstar = self.cstar[index]
+            chamber.ideal_gas_constant = self.ideal_gas_constant[index]
+            chamber.mass_flow_out = self.mass_flow_out[index]
+            chamber.pressurizing = bool(self.pressurizing[index])
+
+            nozzle = motor.nozzle
+            nozzle.throat_velocity = self.throat_velocity[index]
+            nozzle.exit_pressure = self.exit_pressure[index]
+            nozzle.isentropic_exponent = self.isentropic_exponent[index]
+
+            motor.thrust = self.thrust[index]
+            motor.OF = self.OF[index]
+            motor.total_impulse = self.total_impulse[index]
+
+            simulation.time = self.times[index]
+            simulation.frames = self.frames_per_motor[index]
+
+            motor.initialize_simulation()
+            motor.end()
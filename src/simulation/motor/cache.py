@@ -0,0 +1,234 @@
+# MOTOR BURN CACHE
+# Flight Monte Carlos with a custom motor usually fly the exact same motor thousands of times, and the motor simulation is most of the time of every flight
+# So the burn is simulated once for every configuration, saved to disk under a hash of the configuration, and played back by a ReplayMotor
+
+import copy
+import hashlib
+import os
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from types import FunctionType, MethodType
+
+import numpy as np
+import pandas as pd
+
+from src.constants import output_path
+from src.rocketparts.motor import CustomMotor, ReplayMotor
+from src.simulation.motor.simulation import MotorSimulation
+
+
+# References back up the tree and things that only matter while it is running. None of them change what the burn looks like
+ignored_attributes = frozenset(["saved_state", "simulation", "logger", "environment", "motor", "verbose", "_mass_cache", "hint", "already_warned"])
+
+# Bumped whenever the motor simulation changes in a way that changes the burns, so that nothing simulated before then is played back
+# 2: the implicit chamber pressure, the pressure step controller, and the motor clock advancing by the time increment it actually took
+burn_version = 2
+
+# The only things on the motor itself that change the burn. The thrust multiplier is applied when the burn is played back instead
+motor_attributes = ["cstar_efficiency", "data_path", "pressurization_time_increment", "post_pressurization_time_increment", "relative_pressure_step", "min_time_increment", "max_time_increment"]
+
+
+def describe(value, seen=None):
+    """
+    Turn a configuration into nested tuples of plain values that come out the same for every equal configuration, even in another process.
+    Functions are described by where they are defined and by what they close over, so two closures from the same factory with different constants are different.
+    """
+    if seen is None:
+        seen = {}
+
+    if value is None or isinstance(value, (bool, str, bytes)):
+        return value
+
+    # Otherwise an int and a float that are equal would give different hashes
+    if isinstance(value, (int, float, np.number)):
+        return float(value)
+
+    if isinstance(value, Enum):
+        return (type(value).__qualname__, value.name)
+
+    if isinstance(value, np.ndarray):
+        return ("array", str(value.dtype), value.shape, hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest())
+
+    if isinstance(value, pd.DataFrame):
+        return ("dataframe", tuple(value.columns), describe(value.to_numpy(), seen))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(describe(item, seen) for item in value)
+
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), describe(item, seen)) for key, item in value.items()))
+
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(repr(describe(item, seen)) for item in value))
+
+    if isinstance(value, type):
+        return ("class", value.__module__, value.__qualname__)
+
+    # Objects can show up more than once (the injector has the tank and the chamber), so after the first time they are described by when they were first seen
+    if id(value) in seen:
+        return ("seen", seen[id(value)])
+    seen[id(value)] = len(seen)
+
+    if isinstance(value, MethodType):
+        return ("method", value.__func__.__qualname__, describe(value.__self__, seen))
+
+    if isinstance(value, FunctionType):
+        closure = [cell.cell_contents for cell in value.__closure__ or []]
+        return ("function", value.__module__, value.__qualname__, describe(value.__defaults__, seen), describe(closure, seen))
+
+    if hasattr(value, "__dict__"):
+        attributes = {key: item for key, item in vars(value).items() if key not in ignored_attributes}
+        return (type(value).__module__, type(value).__qualname__, describe(attributes, seen))
+
+    return repr(value)
+
+
+def get_burn_key(motor: CustomMotor, time_increment=0.01) -> str:
+    """
+    The hash of everything that goes into the burn of a custom motor: the tank, injector, chamber, grain and nozzle, the few settings on the motor itself, and the pressure it is fired at.
+    This describes the current state of every part, not PresetObject.get_config, since the parts are usually changed after they are made (like setting the port diameter of the grain geometry).
+    """
+    description = (
+        burn_version,
+        describe([motor.ox_tank, motor.injector, motor.combustion_chamber, motor.fuel_grain, motor.nozzle]),
+        describe([getattr(motor, key) for key in motor_attributes]),
+        describe(time_increment),
+        describe(motor.environment.get_air_pressure(0)),
+    )
+
+    return hashlib.sha256(repr(description).encode()).hexdigest()
+
+
+def simulate_burn(motor: CustomMotor, time_increment=0.01) -> pd.DataFrame:
+    """
+    Fire a copy of the motor by itself at ground level, and return the ReplayMotor.burn_columns for the start of every frame.
+    The last row is the state of the motor once it has finished, with no thrust.
+    The thrust is stored without the thrust multiplier, since the ReplayMotor applies its own.
+    """
+    # Leave behind anything that it is attached to, like the rocket simulation
+    motor = copy.deepcopy(motor, {id(motor.simulation): None, id(motor.logger): None})
+    simulation = MotorSimulation(motor=motor, logger=None, environment=motor.environment, time_increment=time_increment)
+
+    rows = []
+    simulation.initialize_simulation()
+
+    try:
+        while not simulation.is_finished() and simulation.frames_remaining:
+            time = simulation.time
+            propellant_mass = motor.propellant_mass
+            propellant_CG = motor.propellant_CG
+
+            simulation.simulate_step()
+
+            mass_flow = (propellant_mass - motor.propellant_mass) / (simulation.time - time)
+            rows.append([time, motor.thrust / motor.thrust_multiplier, motor.combustion_chamber.pressure, motor.nozzle.isentropic_exponent, motor.nozzle.exit_pressure, mass_flow, propellant_mass, propellant_CG])
+    finally:
+        simulation.end()
+
+    rows.append([simulation.time, 0, motor.combustion_chamber.pressure, motor.nozzle.isentropic_exponent, motor.nozzle.exit_pressure, 0, motor.propellant_mass, motor.propellant_CG])
+
+    return pd.DataFrame(rows, columns=ReplayMotor.burn_columns)
+
+
+class MotorCache:
+    """
+    Stores the burns of custom motors on disk by the hash of their configuration, so every configuration is only simulated once.
+    The least recently used burns are deleted whenever the folder gets bigger than the size budget. A few burns are also kept in memory, so a Monte Carlo does not read the same file over and over.
+    """
+
+    def __init__(self, folder=f"{output_path}/motorcache", size_budget=100 * 2**20, memory_count=8):
+        """
+        :param folder: where the burns are saved. It is made if it does not exist
+        :param int size_budget: the most bytes of burns to keep in the folder
+        :param int memory_count: how many burns to keep loaded
+        """
+        self.folder = Path(folder)
+        self.size_budget = size_budget
+        self.memory_count = memory_count
+
+        self.loaded: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_path(self, key) -> Path:
+        return self.folder / f"{key}.csv"
+
+    def get_burn(self, motor: CustomMotor, time_increment=0.01) -> pd.DataFrame:
+        """Load the burn of the motor, or simulate it if it has not been cached yet"""
+        key = get_burn_key(motor, time_increment)
+        path = self.get_path(key)
+
+        if key in self.loaded:
+            self.hits += 1
+            self.loaded.move_to_end(key)
+            # Keep the file from looking unused
+            if path.is_file():
+                os.utime(path)
+
+            return self.loaded[key]
+
+        if path.is_file():
+            self.hits += 1
+            burn = pd.read_csv(path)
+            os.utime(path)
+        else:
+            self.misses += 1
+            burn = simulate_burn(motor, time_increment)
+
+            self.folder.mkdir(parents=True, exist_ok=True)
+            burn.to_csv(path, index=False)
+            self.evict(keep=path)
+
+        self.loaded[key] = burn
+        while len(self.loaded) > self.memory_count:
+            self.loaded.popitem(last=False)
+
+        return burn
+
+    def get_motor(self, motor: CustomMotor, time_increment=0.01, **kwargs) -> ReplayMotor:
+        """
+        A ReplayMotor that flies the same burn as the custom motor. It takes the position, mass, thrust multiplier, environment, and nozzle of the motor unless you override them with kwargs.
+        """
+        settings = {
+            "front": motor.front,
+            "center_of_gravity": motor.center_of_gravity,
+            "mass": motor.mass,
+            "thrust_multiplier": motor.thrust_multiplier,
+            "adjust_for_atmospheric": motor.adjust_for_atmospheric,
+            "environment": motor.environment,
+            "nozzle": copy.deepcopy(motor.nozzle),
+        }
+        settings.update(kwargs)
+
+        return ReplayMotor(burn=self.get_burn(motor, time_increment), **settings)
+
+    @property
+    def files(self) -> "list[Path]":
+        if not self.folder.is_dir():
+            return []
+
+        return list(self.folder.glob("*.csv"))
+
+    def evict(self, keep: Path=None):
+        """Delete the least recently used burns until the folder fits in the size budget. The burn at keep is never deleted"""
+        files = sorted(self.files, key=lambda path: path.stat().st_mtime)
+        size = sum(path.stat().st_size for path in files)
+
+        for path in files:
+            if size <= self.size_budget:
+                break
+
+            if path == keep:
+                continue
+
+            size -= path.stat().st_size
+            path.unlink()
+            self.loaded.pop(path.stem, None)
+
+    def clear(self):
+        for path in self.files:
+            path.unlink()
+
+        self.loaded.clear()
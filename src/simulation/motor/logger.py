@@ -6,9 +6,9 @@ class MotorLogger(FeedbackLogger):
         Logs the progress of the custom motor simulation along with some print statements.
     """
 
-    def __init__(self, motor, **kwargs):
+    def __init__(self, simulation, **kwargs):
         # You need to make sure the parent's override doesn't override the self values we have already established
-        super().__init__(motor)
+        super().__init__(simulation)
 
         # TODO: it would be nice to have the average molar mass of the products displayed
         self.features.union(base_features)   
@@ -21,15 +21,14 @@ class MotorLogger(FeedbackLogger):
         # Print every time it switches
         self.overexpanded = True
 
-        self.initial_pressure = self.motor.ox_tank.pressure
-
+    # Make it so that you can access the motor directly, like the rocket logger does
     @property
     def motor(self):
-        return self.logging_object
+        return self.simulation.motor
 
     @motor.setter
     def motor(self, m):
-        self.logging_object = m
+        self.simulation.motor = m
 
     def display_partial_data(self):
         print(f"Ox Tank pressure {self.motor.ox_tank.pressure} Pascals")
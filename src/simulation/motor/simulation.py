@@ -1,6 +1,8 @@
 from lib.simulation import Simulation
 from src.simulation.motor.logger import MotorLogger
 from src.environment import Environment
+from src.rocketparts.motor import Motor
+from src.rocketparts.motorparts.grain import Grain
 
 
 class MotorSimulation(Simulation):
@@ -14,6 +16,9 @@ class MotorSimulation(Simulation):
         super().override_subobjects()
 
         if self.motor is not None:
+            if self.motor.simulation is not self:
+                self.motor.simulation = self
+
             if self.motor.logger is not self.logger:
                 self.motor.logger = self.logger
 
@@ -44,12 +49,14 @@ class MotorSimulation(Simulation):
         self.motor.initialize_simulation()
 
     def simulate_step(self):
+        # The motor picks the time increment of the next frame while it calculates this one
+        time_increment = self.time_increment
+
         thrust = self.motor.calculate_thrust()
         self.environment.simulate_step()
         
-        super().simulate_step()
+        super().simulate_step(time_increment)
 
-    @property
     def is_finished(self):
         return not (self.tank.pressure > self.chamber.pressure and self.tank.ox_mass > 0 and not self.grain.burned_through)
         
@@ -0,0 +1,147 @@
+# SUB-STEPPED MOTOR
+# Flies a custom motor on its own clock inside of a flight
+# The chamber needs millisecond frames while it charges up, and the flight is fine with 0.05 s frames, so neither one should have to run at the other's time increment
+
+import numpy as np
+
+from src.rocketparts.motor import Motor, CustomMotor
+from src.simulation.motor.simulation import MotorSimulation
+
+
+class SubsteppedMotor(Motor):
+    """
+    Runs a CustomMotor in its own MotorSimulation, so the custom motor picks its time increments without changing the flight's.
+    Every flight frame, the motor takes frames until it catches up to the end of the flight frame, shortening the last one so that the two clocks line up exactly. The flight gets the thrust and mass flow averaged over the flight frame, so none of the impulse is lost.
+    Once the motor has finished, it is not simulated anymore.
+
+    The motor takes sub_steps frames for every flight frame, unless the custom motor has a relative_pressure_step, in which case it picks its own.
+    It only works with the default trapezoid scheme (integrator=None), since the integrators need the thrust at any time. Use a ReplayMotor from a MotorCache for those.
+    """
+
+    def __init__(self, custom_motor: CustomMotor = None, **kwargs):
+        """
+        :param CustomMotor custom_motor: the motor to fly. Its position, mass, and center of gravity are used unless you pass them in. The mass has to include the propellant
+        :param int sub_steps: how many motor frames to take for every flight frame
+        """
+        custom_motor = custom_motor or CustomMotor()
+        self.sub_steps = 10
+        self.motor_simulation: MotorSimulation = None
+
+        super().__init__(front=custom_motor.front, center_of_gravity=custom_motor.center_of_gravity, mass=custom_motor.mass, environment=custom_motor.environment)
+
+        self.overwrite_defaults(**kwargs)
+
+        # This is set after the defaults are saved, otherwise every preset up the tree would deep copy the whole custom motor again
+        self.custom_motor = custom_motor
+
+        # Everything but the propellant stays at the center of gravity it started at
+        self.dry_center_of_gravity = self.center_of_gravity
+        self.dry_mass = self.mass - custom_motor.propellant_mass
+
+        if self.dry_mass < 0:
+            raise ValueError(f"The sub-stepped motor was given a mass of {self.mass} kg, which is less than the {custom_motor.propellant_mass} kg of propellant in the custom motor. The mass has to include the propellant")
+
+        # Averaged over the last flight frame
+        self.thrust = 0
+        self.mass_flow = 0
+        self.total_impulse = 0
+        # Not known until the custom motor finishes
+        self.burn_time = np.inf
+
+        self.frame_time = None
+        self.update_mass()
+
+    def set_thrust_data_path(self, path):
+        # The custom motor stands in for the thrust curve
+        pass
+
+    def start_motor_simulation(self):
+        """Give the custom motor its own clock, starting from the current time of the flight"""
+        self.motor_simulation = MotorSimulation(logger=None, time=self.simulation.time, time_increment=self.simulation.time_increment / self.sub_steps)
+
+        # These are set after the defaults are saved, otherwise the preset would deep copy the whole flight through the environment
+        self.motor_simulation.motor = self.custom_motor
+        self.motor_simulation.environment = self.environment
+
+        self.motor_simulation.initialize_simulation()
+
+    def update_mass(self):
+        propellant_mass = self.custom_motor.propellant_mass
+        self.propellant_mass = propellant_mass
+
+        mass = self.dry_mass + propellant_mass
+        self.set_mass_constant(mass)
+        self.set_CG_constant((self.dry_mass * self.dry_center_of_gravity + propellant_mass * self.custom_motor.propellant_CG) / mass)
+
+    def calculate_thrust(self, altitude=0):
+        if self.finished_thrusting:
+            self.thrust = 0
+            self.mass_flow = 0
+            return 0
+
+        # Already caught up to the end of this flight frame
+        if self.frame_time == self.simulation.time:
+            return self.thrust
+
+        if self.motor_simulation is None:
+            self.start_motor_simulation()
+
+        motor_simulation = self.motor_simulation
+        flight_time_increment = self.simulation.time_increment
+        end_time = self.simulation.time + flight_time_increment
+        adaptive = self.custom_motor.relative_pressure_step is not None
+
+        impulse = 0
+        propellant_mass = self.custom_motor.propellant_mass
+
+        # A tiny bit of leeway so that floating point error does not take a sliver of a frame
+        while end_time - motor_simulation.time > flight_time_increment * 1e-9:
+            if motor_simulation.is_finished():
+                break
+
+            if not adaptive:
+                motor_simulation.time_increment = flight_time_increment / self.sub_steps
+
+            natural_time_increment = motor_simulation.time_increment
+            time_increment = min(natural_time_increment, end_time - motor_simulation.time)
+            motor_simulation.time_increment = time_increment
+
+            self.custom_motor.calculate_thrust(altitude)
+            # The flight steps the environment
+            motor_simulation.frames += 1
+            motor_simulation.time += time_increment
+
+            if adaptive and time_increment < natural_time_increment:
+                # Cutting the frame short to line up with the flight says nothing about how long the next one can be, so scale the one it would have taken instead
+                factor = motor_simulation.time_increment / time_increment
+                motor_simulation.time_increment = min(natural_time_increment * factor, self.custom_motor.max_time_increment)
+
+            impulse += self.custom_motor.thrust * time_increment
+
+        self.thrust = impulse / flight_time_increment
+        self.mass_flow = (propellant_mass - self.custom_motor.propellant_mass) / flight_time_increment
+        self.total_impulse += impulse
+        self.frame_time = self.simulation.time
+
+        self.update_mass()
+
+        if motor_simulation.is_finished():
+            print("Finished thrusting")
+            self.finished_thrusting = True
+            self.burn_time = motor_simulation.time
+            motor_simulation.end()
+
+        return self.thrust
+
+    def get_thrust(self, time, altitude=0):
+        raise NotImplementedError("The sub-stepped motor has to be simulated frame by frame, so it only works with the default trapezoid scheme (integrator=None). Use a ReplayMotor from a MotorCache for the integrators")
+
+    def get_mass_flow(self, time):
+        raise NotImplementedError("The sub-stepped motor has to be simulated frame by frame, so it only works with the default trapezoid scheme (integrator=None). Use a ReplayMotor from a MotorCache for the integrators")
+
+    def get_total_impulse(self):
+        # The custom motor already applied its thrust multiplier, and it is adjusted for the atmospheric pressure
+        return self.total_impulse
+
+    def get_burn_time(self):
+        return self.burn_time
@@ -0,0 +1,811 @@
+# BATCHED ROCKET SIMULATION
+# Steps a whole list of rocket simulations at the same time, with the state of every rocket stored in numpy arrays instead of in the Rocket objects
+# It uses exactly the same force model as Rocket.simulate_step, it just does every rocket in one go. Mostly useful for Monte Carlo, where stepping a thousand Rocket objects one by one takes forever
+
+import numpy as np
+
+from lib.simulation import Simulation
+from lib.data import dataType
+from lib.general import vector_from_angle
+from lib.vector import Vector
+from lib.rotation import Rotation
+from src.rocketparts.motor import Motor
+from src.rocket import Rocket
+from src.rocketparts.parachute import Parachute, ApogeeParachute
+
+
+def magnitudes(vectors):
+    """The magnitude of every row of an (N, 3) array"""
+    return np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+
+def dot_rows(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+
+class BatchRocketSimulation(Simulation):
+    """
+    Run a list of RocketSimulations in lockstep.
+    Set up every simulation like you would to run it by itself; the batch reads the rockets in, steps all of them together, and writes the results back into the rocket objects when it ends.
+    Rockets that land (or fail) are masked out while the rest keep going.
+
+    All of the simulations have to share a time increment, a start time, and the atmospheric data. Wind is still evaluated one rocket at a time, so it is much faster with the wind turned off.
+    Only motors with thrust curves are supported, and nothing is logged frame by frame.
+    """
+
+    def __init__(self, simulations, **kwargs):
+        super().__init__(**kwargs)
+        self.logger = None
+
+        # This is set after the defaults are saved, otherwise the preset would deep copy every single rocket in the batch
+        self.simulations = list(simulations)
+        # If a rocket throws an error partway through, it is stored here by its index instead of stopping the whole batch
+        self.errors = {}
+
+        self.compile()
+
+    #region Compiling
+    def compile(self):
+        """Read the current state of every simulation into arrays"""
+        if len(self.simulations) == 0:
+            raise ValueError("There are no simulations in the batch")
+
+        first = self.simulations[0]
+        for simulation in self.simulations:
+            if simulation.time_increment != first.time_increment or simulation.time != first.time:
+                raise ValueError("Every simulation in a batch must have the same time increment and start at the same time")
+
+            if simulation.environment.atmospheric_path != first.environment.atmospheric_path or simulation.environment.atmosphere_backend != first.environment.atmosphere_backend:
+                raise ValueError("Every simulation in a batch must use the same atmospheric data")
+
+            if simulation.integrator is not None:
+                raise ValueError("The batch always steps with the trapezoid scheme, so the simulations cannot have an integrator")
+
+            if [event.name for event in simulation.events] != self.event_names or any(event.terminal for event in simulation.events):
+                raise ValueError("The batch only knows how to find the default events, and cannot stop on any of them")
+
+        self.time_increment = first.time_increment
+        self.time = first.time
+
+        self.rockets = [simulation.rocket for simulation in self.simulations]
+        self.count = len(self.rockets)
+        rockets = self.rockets
+        environments = [rocket.environment for rocket in rockets]
+
+        # The atmosphere is shared, so the lookups come from the first one
+        self.atmosphere_environment = first.environment
+        self.density_lookup = first.environment.density_lookup
+        self.pressure_lookup = first.environment.pressure_lookup
+        self.get_speed_of_sound = first.environment.get_speed_of_sound
+
+        #region Kinematics
+        self.position = np.array([rocket.position for rocket in rockets], dtype="float64")
+        self.velocity = np.array([rocket.velocity for rocket in rockets], dtype="float64")
+        self.acceleration = np.array([rocket.acceleration for rocket in rockets], dtype="float64")
+        self.p_position = np.array([rocket.p_position for rocket in rockets], dtype="float64")
+        self.p_velocity = np.array([rocket.p_velocity for rocket in rockets], dtype="float64")
+        self.p_acceleration = np.array([rocket.p_acceleration for rocket in rockets], dtype="float64")
+
+        self.rotation = np.array([rocket.rotation for rocket in rockets], dtype="float64")
+        self.angular_velocity = np.array([rocket.angular_velocity for rocket in rockets], dtype="float64")
+        self.angular_acceleration = np.array([rocket.angular_acceleration for rocket in rockets], dtype="float64")
+        self.p_rotation = np.array([rocket.p_rotation for rocket in rockets], dtype="float64")
+        self.p_angular_velocity = np.array([rocket.p_angular_velocity for rocket in rockets], dtype="float64")
+        self.p_angular_acceleration = np.array([rocket.p_angular_acceleration for rocket in rockets], dtype="float64")
+        #endregion
+
+        #region Environment
+        self.base_altitude = np.array([environment.base_altitude for environment in environments], dtype="float64")
+        self.rail_length = np.array([environment.rail_length for environment in environments], dtype="float64")
+        self.earth_radius = np.array([environment.earth_radius for environment in environments], dtype="float64")
+        self.gravitational_parameter = np.array([environment.gravitational_constant * environment.earth_mass for environment in environments], dtype="float64")
+        self.apply_wind = np.array([environment.apply_wind for environment in environments], dtype=bool)
+        self.apply_angular_forces = np.array([rocket.apply_angular_forces for rocket in rockets], dtype=bool)
+        #endregion
+
+        #region Aerodynamics
+        self.reference_area = np.array([rocket.reference_area for rocket in rockets], dtype="float64")
+        self.CD, self.CD_group, self.CD_functions = self.compile_coefficient("CD_data_type", "get_coefficient_of_drag", "CD")
+        self.CL, self.CL_group, self.CL_functions = self.compile_coefficient("CL_data_type", "get_coefficient_of_lift", "CL")
+        self.aero_group, self.aero_functions = self.compile_aero_functions()
+        self.dynamic_pressure = np.zeros(self.count)
+        self.angle_of_attack = np.zeros(self.count)
+        self.relative_velocity = np.array([rocket.relative_velocity for rocket in rockets], dtype="float64")
+        self.drag = np.zeros((self.count, 3))
+        self.lift = np.zeros((self.count, 3))
+        #endregion
+
+        self.compile_masses()
+        self.compile_motors()
+        self.compile_parachutes()
+
+        #region Evaluators
+        self.apogee = np.array([np.nan if rocket.apogee is None else rocket.apogee for rocket in rockets], dtype="float64")
+        self.apogee_lateral_velocity = np.array([getattr(rocket, "apogee_lateral_velocity", np.nan) for rocket in rockets], dtype="float64")
+        self.max_mach = np.array([rocket.max_mach for rocket in rockets], dtype="float64")
+        self.max_velocity = np.array([rocket.max_velocity for rocket in rockets], dtype="float64")
+        self.max_net_force = np.array([rocket.max_net_force for rocket in rockets], dtype="float64")
+        self.landed = np.array([rocket.landed for rocket in rockets], dtype=bool)
+        self.failed = np.zeros(self.count, dtype=bool)
+
+        self.rail_gees = np.array([np.nan if simulation.rail_gees is None else simulation.rail_gees for simulation in self.simulations], dtype="float64")
+        self.rail_velocity = np.array([np.nan if simulation.rail_velocity is None else simulation.rail_velocity for simulation in self.simulations], dtype="float64")
+
+        self.frames_per_rocket = np.array([simulation.frames for simulation in self.simulations])
+        self.max_frames_per_rocket = np.array([simulation.max_frames for simulation in self.simulations])
+        self.times = np.array([simulation.time for simulation in self.simulations], dtype="float64")
+        #endregion
+
+    def compile_coefficient(self, data_type_key, function_key, constant_key):
+        """
+        Rockets that use a constant just store the value. Rockets that use a function are grouped by the function, so that each function is called once per frame with arrays of mach numbers and angles of attack.
+        That means the functions have to work with numpy arrays (all of the ones in goddardModels do).
+        """
+        constants = np.zeros(self.count)
+        groups = np.full(self.count, -1)
+        functions = []
+
+        for index, rocket in enumerate(self.rockets):
+            if rocket.aero_data_type is dataType.FUNCTION_MACH_ALPHA:
+                # Looked up along with the other coefficients in compile_aero_functions
+                continue
+
+            if getattr(rocket, data_type_key) is dataType.FUNCTION_MACH_ALPHA:
+                function = getattr(rocket, function_key)
+
+                for group, existing in enumerate(functions):
+                    if existing is function:
+                        groups[index] = group
+                        break
+                else:
+                    groups[index] = len(functions)
+                    functions.append(function)
+            else:
+                constants[index] = getattr(rocket, constant_key)
+
+        return constants, groups, functions
+
+    def compile_aero_functions(self):
+        """Same as compile_coefficient, but for the rockets that get all of their coefficients from one function (Rocket.set_aero_function)"""
+        groups = np.full(self.count, -1)
+        functions = []
+
+        for index, rocket in enumerate(self.rockets):
+            if rocket.aero_data_type is not dataType.FUNCTION_MACH_ALPHA:
+                continue
+
+            function = rocket.get_aero_coefficients
+
+            for group, existing in enumerate(functions):
+                if existing is function:
+                    groups[index] = group
+                    break
+            else:
+                groups[index] = len(functions)
+                functions.append(function)
+
+        return groups, functions
+
+    def compile_masses(self):
+        """
+        Everything except for the motor has a constant mass, so the mass tree gets boiled down to its total mass and its first and second moments about the nose.
+        The motor is added back in every frame.
+        """
+        self.dry_mass = np.zeros(self.count)
+        self.dry_moment = np.zeros(self.count)
+        self.dry_second_moment = np.zeros(self.count)
+        self.motor_count = np.zeros(self.count)
+        self.motor_moment = np.zeros(self.count)
+        self.motor_second_moment = np.zeros(self.count)
+        # NaN means that the moment of inertia is calculated from the mass objects
+        self.moment_of_inertia = np.full(self.count, np.nan)
+
+        for index, rocket in enumerate(self.rockets):
+            if rocket.moment_data_type is dataType.CONSTANT:
+                self.moment_of_inertia[index] = rocket.moment_of_inertia
+            elif rocket.moment_data_type is not dataType.DEFAULT:
+                raise NotImplementedError("The batched simulation cannot use a moment of inertia that is a function of time")
+
+            if len(rocket.motor.mass_objects) != 0:
+                raise NotImplementedError("The batched simulation assumes that the motor does not have any mass objects of its own")
+
+            for CG_from_front, mass_object in rocket.flattened_mass_objects:
+                if mass_object is rocket.motor:
+                    self.motor_count[index] += 1
+                    self.motor_moment[index] += CG_from_front
+                    self.motor_second_moment[index] += CG_from_front ** 2
+                    continue
+
+                if mass_object.mass_data_type is not dataType.DEFAULT or mass_object.CG_data_type is not dataType.DEFAULT:
+                    raise NotImplementedError(f"The batched simulation only supports the motor changing mass, but {mass_object} has a custom mass or CG")
+
+                self.dry_mass[index] += mass_object.mass
+                self.dry_moment[index] += mass_object.mass * CG_from_front
+                self.dry_second_moment[index] += mass_object.mass * CG_from_front ** 2
+
+    def compile_motors(self):
+        motors = [rocket.motor for rocket in self.rockets]
+
+        for motor in motors:
+            if type(motor).calculate_thrust is not Motor.calculate_thrust:
+                raise NotImplementedError("The batched simulation only supports motors that use a thrust curve")
+
+            if motor.adjust_for_atmospheric and motor.nozzle_area is None:
+                raise ValueError("You probably forgot to override the nozzle_area variable. It should be in m^2")
+
+        self.motor_mass = np.array([motor.total_mass for motor in motors], dtype="float64")
+        self.thrust = np.zeros(self.count)
+        self.motor_thrust = np.array([motor.thrust for motor in motors], dtype="float64")
+        self.finished_thrusting = np.array([motor.finished_thrusting for motor in motors], dtype=bool)
+
+        self.thrust_multiplier = np.array([motor.thrust_multiplier for motor in motors], dtype="float64")
+        self.time_multiplier = np.array([motor.time_multiplier for motor in motors], dtype="float64")
+        self.mass_per_thrust = np.array([motor.mass_per_thrust for motor in motors], dtype="float64")
+        self.burn_time = np.array([motor.get_burn_time() for motor in motors], dtype="float64")
+        self.adjust_for_atmospheric = np.array([motor.adjust_for_atmospheric for motor in motors], dtype=bool)
+        self.nozzle_area = np.array([motor.nozzle_area or 0 for motor in motors], dtype="float64")
+        self.assumed_exit_pressure = np.array([motor.assumed_exit_pressure for motor in motors], dtype="float64")
+
+        # Every distinct thrust curve gets shifted to start after the end of the last one, so that one search through the combined keys finds the bracket for every rocket at once
+        curves = []
+        curve_indices = np.zeros(self.count, dtype=int)
+        for index, motor in enumerate(motors):
+            for curve, existing in enumerate(curves):
+                if existing is motor.thrust_lookup:
+                    curve_indices[index] = curve
+                    break
+            else:
+                curve_indices[index] = len(curves)
+                curves.append(motor.thrust_lookup)
+
+        offsets = []
+        starts = []
+        shifted_keys = []
+        next_start = 0
+        next_key = 0
+        for curve in curves:
+            offset = next_key - curve.min_key
+            offsets.append(offset)
+            starts.append(next_start)
+            shifted_keys.append(curve.keys + offset)
+
+            next_start += len(curve.keys)
+            next_key = curve.max_key + offset + 1
+
+        self.thrust_keys = np.concatenate([curve.keys for curve in curves])
+        self.thrust_values = np.concatenate([curve.values for curve in curves])
+        self.shifted_thrust_keys = np.concatenate(shifted_keys)
+
+        self.thrust_offset = np.array(offsets)[curve_indices]
+        self.thrust_start = np.array(starts)[curve_indices]
+        self.thrust_end = self.thrust_start + np.array([len(curve.keys) - 1 for curve in curves])[curve_indices]
+        self.thrust_min_time = np.array([curve.min_key for curve in curves])[curve_indices]
+        self.thrust_max_time = np.array([curve.max_key for curve in curves])[curve_indices]
+
+    def compile_parachutes(self):
+        self.parachute_count = max(len(rocket.parachutes) for rocket in self.rockets)
+        shape = (self.count, self.parachute_count)
+
+        self.parachute_deployed = np.array([rocket.parachute_deployed for rocket in self.rockets], dtype=bool)
+        self.has_parachute = np.zeros(shape, dtype=bool)
+        self.parachute_area = np.zeros(shape)
+        self.parachute_CD = np.zeros(shape)
+        self.parachute_deployment_time = np.zeros(shape)
+        # Apogee parachutes deploy at any altitude
+        self.parachute_target_altitude = np.full(shape, np.inf)
+        self.each_parachute_deployed = np.zeros(shape, dtype=bool)
+        self.time_of_deployment = np.zeros(shape)
+
+        for index, rocket in enumerate(self.rockets):
+            for parachute_index, parachute in enumerate(rocket.parachutes):
+                if type(parachute).get_drag is not Parachute.get_drag:
+                    raise NotImplementedError("The batched simulation does not support parachutes with custom drag")
+
+                if type(parachute).should_deploy is Parachute.should_deploy:
+                    self.parachute_target_altitude[index, parachute_index] = parachute.target_altitude
+                elif type(parachute).should_deploy is not ApogeeParachute.should_deploy:
+                    raise NotImplementedError("The batched simulation does not support parachutes with custom deployment")
+
+                self.has_parachute[index, parachute_index] = True
+                self.parachute_area[index, parachute_index] = parachute.area
+                self.parachute_CD[index, parachute_index] = parachute.CD
+                self.parachute_deployment_time[index, parachute_index] = parachute.required_deployment_time
+                self.each_parachute_deployed[index, parachute_index] = parachute.deployed
+                self.time_of_deployment[index, parachute_index] = parachute.time_of_deployment
+
+    #endregion
+
+    @property
+    def active(self):
+        """Which rockets are still being simulated"""
+        frames_remaining = (self.max_frames_per_rocket == -1) | (self.max_frames_per_rocket > self.frames_per_rocket)
+
+        return ~self.landed & ~self.failed & frames_remaining
+
+    def is_finished(self):
+        return not np.any(self.active)
+
+    def fail(self, rows, error):
+        for row in rows:
+            self.failed[row] = True
+            self.errors[row] = error
+
+    def simulate_step(self):
+        rows = np.flatnonzero(self.active)
+
+        # The atmospheric lookups would throw an error, so we stop those rockets instead
+        altitude = (self.base_altitude[rows] + self.position[rows, 2]) / 1000
+        outside = ~((altitude >= self.density_lookup.min_key) & (altitude <= self.density_lookup.max_key))
+        if np.any(outside):
+            self.fail(rows[outside], IndexError("The rocket left the atmospheric data"))
+            rows = rows[~outside]
+
+        if len(rows) > 0:
+            self.simulate_rows(rows)
+
+        super().simulate_step()
+
+    def simulate_rows(self, rows):
+        """The same thing as Rocket.simulate_step followed by RocketSimulation.simulate_step, for every rocket in rows at once"""
+        time = self.time
+        time_increment = self.time_increment
+
+        position = self.position[rows]
+        velocity = self.velocity[rows]
+        # Has to be read before the thrust takes the mass away
+        state = self.get_states(rows, position, velocity, self.rotation[rows], self.angular_velocity[rows], self.motor_mass[rows])
+        p_position = self.p_position[rows]
+        p_velocity = self.p_velocity[rows]
+        p_acceleration = self.p_acceleration[rows]
+
+        rotation = self.rotation[rows]
+        angular_velocity = self.angular_velocity[rows]
+        angular_acceleration = self.angular_acceleration[rows]
+        p_angular_velocity = self.p_angular_velocity[rows]
+        p_angular_acceleration = self.p_angular_acceleration[rows]
+
+        base_altitude = self.base_altitude[rows]
+        apply_angular_forces = self.apply_angular_forces[rows]
+        parachute_deployed = self.parachute_deployed[rows]
+
+        force = np.zeros((len(rows), 3))
+
+        #region Cached values
+        altitude = base_altitude + position[:, 2]
+        air_velocity = self.get_air_velocity(rows, altitude)
+
+        # The wind is different for every rocket, so it is found separately
+        atmosphere = self.atmosphere_environment.get_atmosphere(altitude, include_wind=False)
+
+        air_relative_velocity = velocity - air_velocity
+        air_speed = magnitudes(air_relative_velocity)
+        dynamic_pressure = 1 / 2 * atmosphere.density * air_speed ** 2
+
+        heading = vector_from_angle(rotation.T).T
+        heading_magnitude = magnitudes(heading)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cosine = dot_rows(air_relative_velocity / air_speed[:, np.newaxis], heading / heading_magnitude[:, np.newaxis])
+
+        # Same as angle_between, which gives pi / 2 if either vector is zero
+        no_angle = np.isclose(air_speed, 0) | np.isclose(heading_magnitude, 0)
+        angle_of_attack = np.arccos(np.clip(np.where(no_angle, 0, cosine), -1, 1))
+        angle_of_attack[no_angle] = np.pi / 2
+        # We will assume that it is falling straight down
+        angle_of_attack[parachute_deployed] = 0
+
+        mach = magnitudes(velocity) / atmosphere.speed_of_sound
+        CD = self.find_coefficients(self.CD[rows], self.CD_group[rows], self.CD_functions, mach, angle_of_attack)
+        CL = self.find_coefficients(self.CL[rows], self.CL_group[rows], self.CL_functions, mach, angle_of_attack)
+        self.find_aero_coefficients(CD, CL, self.aero_group[rows], mach, angle_of_attack)
+        #endregion
+
+        #region Air resistance
+        has_drag = ~np.isclose(dynamic_pressure, 0)
+        reference_area = self.reference_area[rows]
+        drag_magnitude = dynamic_pressure * reference_area * CD
+        lift_magnitude = dynamic_pressure * reference_area * CL
+
+        # Wind only changes the direction of the drag if we are applying angular forces
+        relative_velocity = velocity - np.where(apply_angular_forces[:, np.newaxis], air_velocity, 0)
+        relative_speed = magnitudes(relative_velocity)
+        moving = relative_speed != 0
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drag_direction = - relative_velocity / relative_speed[:, np.newaxis]
+
+            # Lift is perpendicular to the freestream, in the same plane as the rocket
+            component_in_drag_direction = (dot_rows(heading, drag_direction) / dot_rows(drag_direction, drag_direction))[:, np.newaxis] * drag_direction
+            lift_direction = heading - component_in_drag_direction
+
+            # When the fins are over the nose, we still project to the same side, so the sign is wrong
+            lift_direction[angle_of_attack > np.pi / 2] *= -1
+
+            no_lift = np.all(np.isclose(lift_direction, 0), axis=1)
+            lift_direction = lift_direction / magnitudes(lift_direction)[:, np.newaxis]
+
+        lift_magnitude[no_lift | ~moving] = 0
+        lift_direction[no_lift | ~moving] = [0, 0, -1]
+        drag_magnitude[~moving] = 0
+        drag_direction[~moving] = [0, 0, 1]
+
+        if self.parachute_count > 0:
+            drag_magnitude += np.where(parachute_deployed, self.get_parachute_drag(rows, dynamic_pressure), 0)
+
+        applied_drag = np.where(has_drag, drag_magnitude, 0)[:, np.newaxis] * drag_direction
+        applied_lift = np.where(has_drag, lift_magnitude, 0)[:, np.newaxis] * lift_direction
+
+        force += applied_drag
+        # Once a parachute is out, lift doesn't matter anymore
+        force += np.where((apply_angular_forces & ~parachute_deployed)[:, np.newaxis], applied_lift, 0)
+        #endregion
+
+        thrust = self.calculate_thrust(rows, altitude)
+        force += thrust[:, np.newaxis] * heading
+
+        #region Gravity
+        motor_mass = self.motor_mass[rows]
+        total_mass = self.dry_mass[rows] + self.motor_count[rows] * motor_mass
+        gravitational_attraction = self.gravitational_parameter[rows] / (self.earth_radius[rows] + altitude + base_altitude) ** 2
+        force[:, 2] -= gravitational_attraction * total_mass
+        #endregion
+
+        # Every force in the rocket model is applied at the CG, so the distance for the torque is always zero
+        torque = self.get_torque(force, np.zeros(len(rows)), rotation)
+
+        #region Kinematics
+        acceleration = force / total_mass[:, np.newaxis]
+        velocity = velocity + (p_acceleration + acceleration) / 2 * time_increment
+        position = position + (p_velocity + velocity) / 2 * time_increment
+
+        rotating = apply_angular_forces & (position[:, 2] > self.rail_length[rows]) & ~parachute_deployed
+        if np.any(rotating):
+            moment_of_inertia = self.get_moment_of_inertia(rows, motor_mass, total_mass)
+
+            new_angular_acceleration = torque / moment_of_inertia[:, np.newaxis]
+            new_angular_velocity = angular_velocity + (p_angular_acceleration + new_angular_acceleration) / 2 * time_increment
+            new_rotation = rotation + (p_angular_velocity + new_angular_velocity) / 2 * time_increment
+
+            rotating = rotating[:, np.newaxis]
+            angular_acceleration = np.where(rotating, new_angular_acceleration, angular_acceleration)
+            angular_velocity = np.where(rotating, new_angular_velocity, angular_velocity)
+            rotation = np.where(rotating, new_rotation, rotation)
+
+            self.flip_rotation(rotation, angular_velocity, angular_acceleration, rotating[:, 0])
+        #endregion
+
+        #region Maxes
+        z = position[:, 2]
+        has_lifted = (z > 0) | (p_position[:, 2] > 0)
+
+        fell = (z < -100) & ~has_lifted
+        if np.any(fell):
+            self.fail(rows[fell], Exception("Your rocket fell straight into the ground. It might be because there is no 0,0 point in the thrust curve"))
+
+        self.landed[rows] |= (z < 0) & has_lifted
+
+        stored_relative_velocity = np.where(has_drag[:, np.newaxis], relative_velocity, self.relative_velocity[rows])
+
+        descending = velocity[:, 2] < 0
+        reached_apogee = descending & np.isnan(self.apogee[rows]) & has_lifted
+        self.apogee[rows[reached_apogee]] = p_position[reached_apogee, 2]
+        self.apogee_lateral_velocity[rows[reached_apogee]] = magnitudes(stored_relative_velocity[reached_apogee])
+
+        speed = magnitudes(velocity)
+        new_mach = speed / self.get_speed_of_sound(base_altitude + z)
+        self.max_mach[rows] = np.maximum(self.max_mach[rows], new_mach)
+        self.max_velocity[rows] = np.maximum(self.max_velocity[rows], speed)
+        self.max_net_force[rows] = np.maximum(self.max_net_force[rows], magnitudes(force))
+        #endregion
+
+        if self.parachute_count > 0:
+            parachute_deployed = parachute_deployed | self.deploy_parachutes(rows, z, descending)
+
+        broken = np.isnan(z)
+        if np.any(broken):
+            self.fail(rows[broken], Exception("Everything fell apart. NaN value in altitude"))
+
+        new_state = self.get_states(rows, position, velocity, rotation, angular_velocity, self.motor_mass[rows])
+
+        #region Update previous
+        if time < 1:
+            on_ground = z < 0
+            position[on_ground] = 0
+            velocity[on_ground] = 0
+            acceleration[on_ground] = 0
+        #endregion
+
+        # From RocketSimulation.simulate_step
+        leaving_rail = (self.rail_length[rows] < position[:, 2]) & np.isnan(self.rail_gees[rows])
+        if np.any(leaving_rail):
+            gravitational_acceleration = self.gravitational_parameter[rows] / (self.earth_radius[rows] + 2 * base_altitude + position[:, 2]) ** 2
+            self.rail_gees[rows[leaving_rail]] = (magnitudes(acceleration) / gravitational_acceleration)[leaving_rail]
+            self.rail_velocity[rows[leaving_rail]] = magnitudes(velocity)[leaving_rail]
+
+        self.detect_events(rows, time, state, new_state)
+
+        #region Save the state
+        self.position[rows] = position
+        self.velocity[rows] = velocity
+        self.acceleration[rows] = acceleration
+        self.p_position[rows] = position
+        self.p_velocity[rows] = velocity
+        self.p_acceleration[rows] = acceleration
+
+        self.rotation[rows] = rotation
+        self.angular_velocity[rows] = angular_velocity
+        self.angular_acceleration[rows] = angular_acceleration
+        self.p_rotation[rows] = rotation
+        self.p_angular_velocity[rows] = angular_velocity
+        self.p_angular_acceleration[rows] = angular_acceleration
+
+        self.parachute_deployed[rows] = parachute_deployed
+        self.dynamic_pressure[rows] = dynamic_pressure
+        self.angle_of_attack[rows] = angle_of_attack
+        self.relative_velocity[rows] = stored_relative_velocity
+        self.drag[rows] = np.where(has_drag[:, np.newaxis], drag_magnitude[:, np.newaxis] * drag_direction, 0)
+        self.lift[rows] = np.where(has_drag[:, np.newaxis], lift_magnitude[:, np.newaxis] * lift_direction, 0)
+        self.thrust[rows] = thrust
+        self.CD[rows] = CD
+        self.CL[rows] = CL
+
+        self.frames_per_rocket[rows] += 1
+        self.times[rows] += time_increment
+        #endregion
+
+    #region Events
+    # These have to be in the same order as RocketSimulation.get_default_events
+    event_names = ["rail exit", "burnout", "apogee", "landing"]
+
+    @staticmethod
+    def get_states(rows, position, velocity, rotation, angular_velocity, motor_mass):
+        """The same layout as Rocket.get_state, one row per rocket"""
+        return np.concatenate([position, velocity, rotation, angular_velocity, motor_mass[:, np.newaxis]], axis=1)
+
+    def detect_events(self, rows, time, state, new_state):
+        """
+            Only the rockets that crossed something this frame go through RocketSimulation.detect_events, since it interpolates one rocket at a time
+        """
+        z = state[:, 2]
+        new_z = new_state[:, 2]
+        rail_length = self.rail_length[rows]
+        burn_time = self.burn_time[rows]
+
+        crossed = (z < rail_length) & (new_z >= rail_length)
+        crossed |= (burn_time > time) & (burn_time <= time + self.time_increment)
+        crossed |= (state[:, 5] > 0) & (new_state[:, 5] <= 0)
+        crossed |= (z > 0) & (new_z <= 0)
+
+        if not np.any(crossed):
+            return
+
+        derivative, new_derivative = Rocket.get_trapezoid_derivatives(state[crossed], new_state[crossed], self.time_increment)
+
+        for i, index in enumerate(np.flatnonzero(crossed)):
+            row = rows[index]
+            simulation = self.simulations[row]
+
+            simulation.detect_events(time, self.time_increment, state[index], derivative[i], new_state[index], new_derivative[i])
+
+            # The event is more exact than the frame, and the simulation has already worked it out
+            if "rail exit" in simulation.event_results:
+                self.rail_velocity[row] = simulation.rail_velocity
+
+    #endregion
+
+    #region Helpers
+    def get_air_velocity(self, rows, altitude):
+        air_velocity = np.zeros((len(rows), 3))
+
+        for index in np.flatnonzero(self.apply_wind[rows]):
+            simulation = self.simulations[rows[index]]
+            # The wind reads the time off of the simulation
+            simulation.time = self.time
+            air_velocity[index] = simulation.environment.get_air_speed(altitude[index])
+
+        return air_velocity
+
+    @staticmethod
+    def find_coefficients(constants, groups, functions, mach, alpha):
+        coefficients = constants.copy()
+
+        for group, function in enumerate(functions):
+            in_group = groups == group
+
+            if np.any(in_group):
+                coefficients[in_group] = function(mach[in_group], alpha[in_group])
+
+        return coefficients
+
+    def find_aero_coefficients(self, CD, CL, groups, mach, alpha):
+        """Fills in CD and CL for the rockets that look everything up at once. The batch does not track the center of pressure"""
+        for group, function in enumerate(self.aero_functions):
+            in_group = groups == group
+
+            if np.any(in_group):
+                CD[in_group], CL[in_group], _ = function(mach[in_group], alpha[in_group])
+
+    def calculate_thrust(self, rows, altitude):
+        """Same as Motor.calculate_thrust. Calculate indicates there are side effects, namely, the mass of the motor decreases"""
+        finished = self.finished_thrusting[rows]
+        thrust_multiplier = self.thrust_multiplier[rows]
+        time_multiplier = self.time_multiplier[rows]
+
+        # The longer we want the burn time, the more we want to shrink the lookup time
+        lookup_time = self.time / time_multiplier
+        in_curve = (lookup_time >= self.thrust_min_time[rows]) & (lookup_time <= self.thrust_max_time[rows])
+        thrusting = ~finished & in_curve
+
+        # Look up every curve at once in the shifted keys
+        shifted_time = lookup_time + self.thrust_offset[rows]
+        start = self.thrust_start[rows]
+        end = self.thrust_end[rows]
+        before = np.clip(np.searchsorted(self.shifted_thrust_keys, shifted_time, side="right") - 1, start, end)
+        after = np.clip(np.searchsorted(self.shifted_thrust_keys, shifted_time, side="left"), start, end)
+
+        x1 = self.thrust_keys[before]
+        x2 = self.thrust_keys[after]
+        y1 = self.thrust_values[before]
+        y2 = self.thrust_values[after]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            curve_thrust = np.where(x2 == x1, (y1 + y2) / 2, (lookup_time - x1) / (x2 - x1) * (y2 - y1) + y1)
+
+        curve_thrust = np.where(thrusting, thrust_multiplier * curve_thrust, 0)
+
+        self.motor_mass[rows] -= curve_thrust * self.mass_per_thrust[rows] * self.time_increment / (thrust_multiplier * time_multiplier)
+        self.motor_thrust[rows] = np.where(thrusting, curve_thrust, self.motor_thrust[rows])
+
+        thrust = curve_thrust
+        finished = finished | ~in_curve
+
+        adjusting = thrusting & self.adjust_for_atmospheric[rows]
+        if np.any(adjusting):
+            altitude = altitude / 1000
+            in_table = (altitude >= self.pressure_lookup.min_key) & (altitude <= self.pressure_lookup.max_key)
+
+            # Overflowing the pressure data throws an IndexError in the motor, which it treats as being done with the thrust curve
+            finished = finished | (adjusting & ~in_table)
+            adjusting = adjusting & in_table
+
+            thrust = thrust.copy()
+            thrust[adjusting] += self.nozzle_area[rows][adjusting] * (self.assumed_exit_pressure[rows][adjusting] - self.pressure_lookup(altitude[adjusting]))
+            thrust[~in_table & thrusting & self.adjust_for_atmospheric[rows]] = 0
+
+        self.finished_thrusting[rows] = finished
+
+        return thrust
+
+    @staticmethod
+    def get_torque(force, distance_from_CG, rotation):
+        """The same decomposition as Rocket.apply_torque, for a force that is already broken into its x, y, and z components"""
+        theta_around = rotation[:, 0]
+        theta_down = rotation[:, 1]
+        torque = np.zeros((len(force), 2))
+
+        # When rocket is completely horizontal (90 degrees), it should apply 100%. When vertical, 0%
+        torque[:, 1] += distance_from_CG * force[:, 2] * np.sin(theta_down)
+
+        # When the rocket hasn't spun at all, all of the x component goes to the pitch
+        torque[:, 1] -= force[:, 0] * np.cos(theta_around) * np.cos(theta_down) * distance_from_CG
+        # Only apply the leftover x to the yaw
+        torque[:, 0] += force[:, 0] * np.sin(theta_around) * distance_from_CG
+
+        torque[:, 1] -= force[:, 1] * np.sin(theta_around) * np.cos(theta_down) * distance_from_CG
+        # x and y can't cause yaw in the same direction
+        torque[:, 0] -= force[:, 1] * np.cos(theta_around) * distance_from_CG
+
+        return torque
+
+    def get_moment_of_inertia(self, rows, motor_mass, total_mass):
+        # Sum of m * (x - CG) ^ 2, expanded so that the constant masses only have to be added up once
+        moment = self.dry_moment[rows] + motor_mass * self.motor_moment[rows]
+        second_moment = self.dry_second_moment[rows] + motor_mass * self.motor_second_moment[rows]
+        total_CG = moment / total_mass
+
+        from_masses = second_moment - total_mass * total_CG ** 2
+
+        constant = self.moment_of_inertia[rows]
+        return np.where(np.isnan(constant), from_masses, constant)
+
+    @staticmethod
+    def flip_rotation(rotation, angular_velocity, angular_acceleration, rotating):
+        """Same as the end of Rocket.apply_angular_velocity. Keeps theta down between 0 and pi for the rotating rockets, editing the arrays in place"""
+        over = rotating & (rotation[:, 1] > np.pi)
+        under = rotating & ~over & (rotation[:, 1] < 0)
+        flipped = over | under
+
+        if not np.any(flipped):
+            return
+
+        rotation[flipped, 0] += np.pi
+        rotation[flipped, 0] %= np.pi * 2
+
+        # basically just 360 - rotation down
+        rotation[over, 1] = np.pi - (rotation[over, 1] - np.pi)
+        rotation[under, 1] = -rotation[under, 1]
+
+        angular_acceleration[flipped, 1] *= -1
+        angular_velocity[flipped, 1] *= -1
+
+    def get_parachute_drag(self, rows, dynamic_pressure):
+        """Same as Parachute.get_drag, added up for every parachute on each rocket"""
+        deployed = self.each_parachute_deployed[rows]
+        area = self.parachute_area[rows]
+        start = self.time_of_deployment[rows]
+        duration = self.parachute_deployment_time[rows]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            interpolated_area = np.where(duration == 0, area / 2, (self.time - start) / duration * area)
+        interpolated_area = np.minimum(interpolated_area, area)
+
+        drag = dynamic_pressure[:, np.newaxis] * self.parachute_CD[rows] * interpolated_area
+
+        return np.sum(np.where(deployed, drag, 0), axis=1)
+
+    def deploy_parachutes(self, rows, z, descending):
+        """Returns which rockets have a parachute out now"""
+        deployed = self.each_parachute_deployed[rows]
+
+        # I am going to pretend that we have some kind of safety mechanism to make sure they don't deploy while we are under thrust
+        deploying = (self.time > self.burn_time[rows])[:, np.newaxis] & descending[:, np.newaxis] & (z[:, np.newaxis] < self.parachute_target_altitude[rows]) & ~deployed & self.has_parachute[rows]
+
+        self.each_parachute_deployed[rows] = deployed | deploying
+        self.time_of_deployment[rows] = np.where(deploying, self.time, self.time_of_deployment[rows])
+
+        return np.any(deploying, axis=1)
+    #endregion
+
+    def end(self):
+        self.write_results()
+
+        return super().end()
+
+    def write_results(self):
+        """Copy the state of every rocket back into the objects it came from"""
+        for index, (simulation, rocket) in enumerate(zip(self.simulations, self.rockets)):
+            rocket.position = Vector(*self.position[index])
+            rocket.velocity = Vector(*self.velocity[index])
+            rocket.acceleration = Vector(*self.acceleration[index])
+            rocket.p_position = self.p_position[index].copy()
+            rocket.p_velocity = self.p_velocity[index].copy()
+            rocket.p_acceleration = self.p_acceleration[index].copy()
+
+            rocket.rotation = Rotation(*self.rotation[index])
+            rocket.angular_velocity = Rotation(*self.angular_velocity[index])
+            rocket.angular_acceleration = Rotation(*self.angular_acceleration[index])
+            rocket.p_rotation = self.p_rotation[index].copy()
+            rocket.p_angular_velocity = self.p_angular_velocity[index].copy()
+            rocket.p_angular_acceleration = self.p_angular_acceleration[index].copy()
+
+            rocket.dynamic_pressure = self.dynamic_pressure[index]
+            rocket.angle_of_attack = self.angle_of_attack[index]
+            rocket.relative_velocity = Vector(*self.relative_velocity[index])
+            rocket.drag = self.drag[index].copy()
+            rocket.lift = self.lift[index].copy()
+            rocket.thrust = self.thrust[index]
+            rocket.CD = self.CD[index]
+            rocket.CL = self.CL[index]
+
+            rocket.landed = bool(self.landed[index])
+            rocket.parachute_deployed = bool(self.parachute_deployed[index])
+            rocket.apogee = None if np.isnan(self.apogee[index]) else self.apogee[index]
+            if not np.isnan(self.apogee_lateral_velocity[index]):
+                rocket.apogee_lateral_velocity = self.apogee_lateral_velocity[index]
+            rocket.max_mach = self.max_mach[index]
+            rocket.max_velocity = self.max_velocity[index]
+            rocket.max_net_force = self.max_net_force[index]
+
+            motor = rocket.motor
+            if self.motor_mass[index] != motor.total_mass:
+                motor.set_mass_constant(self.motor_mass[index])
+            motor.thrust = self.motor_thrust[index]
+            motor.finished_thrusting = bool(self.finished_thrusting[index])
+
+            for parachute_index, parachute in enumerate(rocket.parachutes):
+                parachute.deployed = bool(self.each_parachute_deployed[index, parachute_index])
+                parachute.time_of_deployment = self.time_of_deployment[index, parachute_index]
+
+            simulation.time = self.times[index]
+            simulation.frames = self.frames_per_rocket[index]
+            simulation.rail_gees = None if np.isnan(self.rail_gees[index]) else self.rail_gees[index]
+            simulation.rail_velocity = None if np.isnan(self.rail_velocity[index]) else self.rail_velocity[index]
@@ -1,4 +1,7 @@
+from dataclasses import replace
+
 from lib.simulation import Simulation
+from lib.events import Event, find_event
 from src.simulation.rocket.logger import RocketLogger
 from src.environment import Environment
 from lib.general import magnitude
@@ -18,6 +21,8 @@ class RocketSimulation(Simulation):
         # This might be called by the environment setter before we have established the rocket
         if self.rocket is not None:
             self.rocket.apply_angular_forces = self.apply_angular_forces
+            # The rocket can be passed in before the integrator has been set up
+            self.rocket.integrator = getattr(self, "integrator", None)
             self.rocket.simulation = self
 
             # The simulation logger wins out over the rocket logger.
@@ -39,12 +44,23 @@ class RocketSimulation(Simulation):
         self.rocket: Rocket = None
 
         self.apply_angular_forces = True
+        # Anything from lib.integration. None keeps the original frame-by-frame trapezoid scheme
+        self.integrator = None
         self.logger = RocketLogger(self)
+        # Leave as None for the defaults from get_default_events
+        self.events: list[Event] = None
 
         # Now we override defaults to get rid of anything we don't want.
         self.overwrite_defaults(**kwargs)
         self.override_subobjects()
 
+        if self.events is None:
+            self.events = self.get_default_events()
+
+        # The first time and state that each event happened at, by name
+        self.event_results = {}
+        self.stopped_on_event = False
+
         self.rail_gees = None
         self.rail_velocity = None
 
@@ -90,22 +106,82 @@ class RocketSimulation(Simulation):
         return RocketSimulation(environment=new_environment, rocket=new_rocket, logger=new_logger)
 
 
+    #region Events
+    def get_default_events(self):
+        """
+            The flight milestones. The state is the one from Rocket.get_state, so index 2 is the altitude and index 5 is the vertical velocity
+        """
+        # Bound methods instead of lambdas, so the simulation can still be pickled, and a copy of it checks its own rocket
+        return [
+            Event("rail exit", self.height_above_rail, direction=1),
+            Event("burnout", self.time_to_burnout, direction=-1),
+            Event("apogee", self.vertical_velocity, direction=-1, after="rail exit"),
+            Event("landing", self.height, direction=-1, after="apogee"),
+        ]
+
+    def height_above_rail(self, time, state):
+        return state[2] - self.environment.rail_length
+
+    def time_to_burnout(self, time, state):
+        return self.rocket.motor.get_burn_time() - time
+
+    def vertical_velocity(self, time, state):
+        return state[5]
+
+    def height(self, time, state):
+        return state[2]
+
+    def detect_events(self, time, time_increment, state, derivative, new_state, new_derivative):
+        """
+            Check every event that has not happened yet against the last frame.
+            Returns the first terminal event that happened, if there was one
+        """
+        for event in self.events:
+            if event.name in self.event_results:
+                continue
+
+            if event.after is not None and event.after not in self.event_results:
+                continue
+
+            result = find_event(event, time, time_increment, state, derivative, new_state, new_derivative)
+            if result is None:
+                continue
+
+            self.event_results[event.name] = result
+
+            if event.name == "rail exit":
+                self.rail_velocity = magnitude(result.state[3:6])
+
+            if event.terminal:
+                return result
+
+        return None
+
+    #endregion
+
     def simulate_step(self):
-        self.rocket.simulate_step()
+        time_increment = self.rocket.simulate_step()
         self.environment.simulate_step()
 
         if self.environment.rail_length < self.rocket.position[2] and self.rail_gees is None:
             self.rail_gees = self.rocket.gees
             self.rail_velocity = magnitude(self.rocket.velocity)
+
+        terminal_result = self.detect_events(*self.rocket.last_step)
+        if terminal_result is not None:
+            # Go back to exactly where the event happened and stop there
+            self.rocket.set_state(terminal_result.state)
+            time_increment = terminal_result.time - self.time
+            self.stopped_on_event = True
         
-        super().simulate_step()
+        super().simulate_step(time_increment)
 
     def is_finished(self):
         """
         Return true if the rocket hasn't landed, false if it has.
         Used in run_simulation
         """
-        return self.rocket.landed
+        return self.rocket.landed or self.stopped_on_event
 
 
     #region helpers to evaluate the flight
@@ -119,6 +195,9 @@ class RocketSimulation(Simulation):
         if not self.rocket.landed:
             raise Exception("Rocket has not yet landed.")
 
+        if "landing" in self.event_results:
+            return self.event_results["landing"].state[5]
+
         # Hopefully the rocket is frozen in its last frame
         return self.rocket.velocity[2]
 
@@ -126,6 +205,10 @@ class RocketSimulation(Simulation):
     # The property means that it re-looks it up every time, so it is automatically updated when the rocket changes
     @property
     def apogee(self):
+        # The event is exact, the rocket only knows the frame before it started descending
+        if "apogee" in self.event_results:
+            return self.event_results["apogee"].state[2]
+
         return self.rocket.apogee
 
     @property
@@ -147,7 +230,10 @@ class RocketSimulation(Simulation):
     # endregion
 
 class RocketSimulationToApogee(RocketSimulation):
-    @property
+    def get_default_events(self):
+        # Stop exactly at apogee instead of on the frame after it
+        return [replace(event, terminal=True) if event.name == "apogee" else event for event in super().get_default_events()]
+
     def is_finished(self):
         # We only need to go until the apogee is set
-        return self.apogee is not None
+        return super().is_finished() or self.apogee is not None
@@ -0,0 +1,93 @@
+# TEST THE BATCHED ROCKET SIMULATION
+# The batch is supposed to use exactly the same force model as the Rocket class, so running the same rockets both ways should give the same flights
+
+
+import unittest
+import numpy as np
+import pandas as pd
+
+from src.environment import Environment
+from src.rocketparts.motor import Motor
+from src.rocketparts.massObject import MassObject
+from src.rocketparts.parachute import ApogeeParachute
+from src.rocket import Rocket
+from src.simulation.rocket.simulation import RocketSimulation
+from src.simulation.rocket.batch import BatchRocketSimulation
+from src.data.input.goddardModels import linear_approximated_normal_force, assumed_zero_AOA_CD, get_rasaero_coefficients
+from lib.rotation import Rotation
+
+
+def get_sim(thrust_multiplier=1, rotation=Rotation(0, 0), apply_angular_forces=False, parachute=False, aero_function=False):
+    env = Environment(apply_wind=False)
+    motor = Motor(front=2, center_of_gravity=2, mass=15, propellant_mass=15, environment=env, thrust_multiplier=thrust_multiplier)
+    # A short burn, so that the flights are only a few hundred frames
+    motor.set_thrust_data(pd.DataFrame({"time": [0, 1, 4], "thrust": [2500, 2500, 0]}))
+
+    parachutes = [ApogeeParachute(diameter=4.8768)] if parachute else []
+    rocket = Rocket(radius=0.1016, length=5.7912, rotation=rotation, environment=env, motor=motor, parachutes=parachutes)
+    if aero_function:
+        rocket.set_aero_function(get_rasaero_coefficients)
+    else:
+        rocket.set_CL_function(linear_approximated_normal_force)
+        rocket.set_CD_function(assumed_zero_AOA_CD)
+    rocket.set_moment_constant(250)
+
+    rocket.mass_objects = [motor, *parachutes, MassObject(center_of_gravity=0.7, mass=20), MassObject(center_of_gravity=4.4, mass=40)]
+
+    sim = RocketSimulation(time_increment=0.1, apply_angular_forces=apply_angular_forces, environment=env, rocket=rocket, max_frames=150)
+    sim.logger = None
+    motor.simulation = sim
+
+    return sim
+
+
+class TestBatchRocketSimulation(unittest.TestCase):
+    def setUp(self):
+        self.settings = [
+            {},
+            {"thrust_multiplier": 1.05, "rotation": Rotation(0.3, 0.1), "apply_angular_forces": True, "parachute": True},
+            {"rotation": Rotation(0.2, 0), "apply_angular_forces": True, "aero_function": True},
+        ]
+
+    def test_matches_individual_simulations(self):
+        individual = [get_sim(**settings) for settings in self.settings]
+        for sim in individual:
+            sim.run_simulation()
+
+        batched = [get_sim(**settings) for settings in self.settings]
+        batch = BatchRocketSimulation(batched)
+        batch.run_simulation()
+
+        self.assertEqual(batch.errors, {})
+
+        for expected, actual in zip(individual, batched):
+            self.assertEqual(expected.frames, actual.frames)
+            self.assertAlmostEqual(expected.apogee, actual.apogee, places=6)
+            self.assertAlmostEqual(expected.max_mach, actual.max_mach, places=8)
+            self.assertAlmostEqual(expected.rail_velocity, actual.rail_velocity, places=8)
+            self.assertTrue(np.allclose(expected.rocket.position, actual.rocket.position))
+            self.assertTrue(np.allclose(expected.rocket.velocity, actual.rocket.velocity))
+            self.assertEqual(expected.rocket.parachute_deployed, actual.rocket.parachute_deployed)
+            self.assertAlmostEqual(expected.rocket.motor.total_mass, actual.rocket.motor.total_mass)
+
+    def test_aero_function(self):
+        rocket = get_sim(aero_function=True).rocket
+        rocket.calculate_aero_coefficients()
+        self.assertEqual(rocket.CP, get_rasaero_coefficients(rocket.mach, rocket.angle_of_attack)[2])
+
+        # Overriding one coefficient still looks the others up from the aero function
+        rocket.set_CD_constant(0.4)
+        rocket.calculate_aero_coefficients()
+        self.assertEqual(rocket.CD, 0.4)
+        self.assertEqual(rocket.CL, get_rasaero_coefficients(rocket.mach, rocket.angle_of_attack)[1])
+
+    def test_mismatched_time_increment(self):
+        sims = [get_sim(), get_sim()]
+        sims[1].time_increment = 0.01
+
+        with self.assertRaises(ValueError):
+            BatchRocketSimulation(sims)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+# TESTS FOR THE DATA HELPERS
+# Mostly making sure that the compiled lookup tables give the same answers as the original dataframe lookups
+
+
+import os
+import tempfile
+import unittest
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+
+from lib.data import GridTable, LookupTable, interpolated_lookup, interpolated_lookup_2D
+from src.data.input.goddardModels import AeroTable, get_aero_table
+from src.data.input.models import get_aero_data
+from src.data.input import registry
+from src.environment import Environment
+from src.rocketparts.motor import Motor, CustomMotor
+
+
+class TestLookupTable(unittest.TestCase):
+    def setUp(self):
+        self.dataframe = pd.DataFrame({
+            "time": [0, 0.5, 1, 2, 4],
+            "thrust": [0, 100, 300, 250, 0]
+        })
+
+        self.table = LookupTable.from_dataframe(self.dataframe, "time", "thrust")
+        self.safe_table = LookupTable.from_dataframe(self.dataframe, "time", "thrust", safe=True)
+
+    def test_matches_interpolated_lookup(self):
+        for time in np.linspace(0, 4, 37):
+            self.assertAlmostEqual(self.table(time), interpolated_lookup(self.dataframe, "time", time, "thrust"))
+
+    def test_exact_keys(self):
+        self.assertEqual(self.table(1), 300)
+        self.assertEqual(self.table(4), 0)
+
+    def test_matches_repeated_blocks(self):
+        # Like the RASAero data, where every angle of attack has its own block of Mach numbers
+        dataframe = pd.DataFrame({
+            "Mach": [0, 1, 2, 0, 1, 2],
+            "CD": [0.5, 0.7, 0.6, 0.55, 0.75, 0.65]
+        })
+        table = LookupTable.from_dataframe(dataframe, "Mach", "CD", safe=True)
+
+        for mach in [0, 0.3, 1, 1.5, 2, 3]:
+            self.assertAlmostEqual(table(mach), interpolated_lookup(dataframe, "Mach", mach, "CD", safe=True))
+
+    def test_out_of_range(self):
+        with self.assertRaises(IndexError):
+            self.table(-1)
+
+        with self.assertRaises(IndexError):
+            self.table(5)
+
+        with self.assertRaises(IndexError):
+            self.table(np.nan)
+
+        self.assertEqual(self.safe_table(-1), 0)
+        self.assertEqual(self.safe_table(5), 0)
+
+    def test_hint(self):
+        # Going forwards and backwards through the same bracket should not change anything
+        self.assertAlmostEqual(self.table(1.5), 275)
+        self.assertAlmostEqual(self.table(1.25), 287.5)
+        self.assertAlmostEqual(self.table(3), 125)
+        self.assertAlmostEqual(self.table(0.25), 50)
+
+    def test_array(self):
+        times = np.array([-1, 0, 0.25, 1.5, 3, 5])
+        expected = [self.safe_table(time) for time in times]
+
+        self.assertTrue(np.allclose(self.safe_table(times), expected))
+
+        with self.assertRaises(IndexError):
+            self.table(times)
+
+    def test_columns(self):
+        self.dataframe["mass"] = [10, 9, 7, 5, 4]
+        table = LookupTable.from_dataframe(self.dataframe, "time", ["thrust", "mass"], safe=True)
+        mass_table = LookupTable.from_dataframe(self.dataframe, "time", "mass", safe=True)
+
+        times = np.array([-1, 0, 0.25, 1.5, 3, 5])
+        for time in times:
+            self.assertTrue(np.array_equal(table(time), [self.safe_table(time), mass_table(time)]))
+
+        self.assertTrue(np.array_equal(table(times), np.column_stack([self.safe_table(times), mass_table(times)])))
+
+
+class TestGridTable(unittest.TestCase):
+    def setUp(self):
+        pressures = [1, 2, 4]
+        OFs = [1, 3, 5, 7]
+        # Sorted by O/F first, just like the CEA data
+        self.dataframe = pd.DataFrame([{
+            "Pc": pressure,
+            "OF": OF,
+            "cstar": 1000 + 10 * pressure + OF ** 2,
+            "gamma": 1.2 + 0.01 * OF * pressure
+        } for OF in OFs for pressure in pressures])
+
+        self.table = GridTable.from_dataframe(self.dataframe, "Pc", "OF", ["cstar", "gamma"])
+
+    def test_matches_interpolated_lookup_2D(self):
+        sorted_dataframe = self.dataframe.sort_values(["Pc", "OF"])
+
+        for pressure in [0, 1, 1.5, 2, 3.9, 4, 6]:
+            for OF in [0, 1, 2.2, 5, 6.9, 7, 9]:
+                expected = interpolated_lookup_2D(sorted_dataframe, "Pc", "OF", pressure, OF, ["cstar", "gamma"], safe=True)
+
+                self.assertTrue(np.allclose(self.table(pressure, OF), np.array(expected, dtype="float64")))
+
+    def test_array(self):
+        pressures = np.array([1.5, 3, 10])
+        OFs = np.array([2, 6, 0])
+
+        result = self.table(pressures, OFs)
+        self.assertEqual(result.shape, (3, 2))
+
+        for i in range(3):
+            self.assertTrue(np.allclose(result[i], self.table(pressures[i], OFs[i])))
+
+    def test_incomplete_grid(self):
+        with self.assertRaises(ValueError):
+            GridTable.from_dataframe(self.dataframe.iloc[1:], "Pc", "OF", ["cstar"])
+
+
+class TestAeroTable(unittest.TestCase):
+    def setUp(self):
+        self.table = get_aero_table()
+        # The grid is padded where an angle of attack is missing a Mach number, so stay inside of the data that is there for every one
+        self.machs = np.array([0.05, 0.3, 0.955, 1.2, 2.5, 7.31, 24])
+        self.alphas = np.radians([0, 0.5, 2, 3.3, 4, 10, 60, 135])
+
+    def test_matches_dataframe_lookups(self):
+        rasaero_data = get_aero_data()
+        sorted_data = rasaero_data.sort_values(["Mach", "Alpha"])
+        zero_AOA = rasaero_data[rasaero_data["Alpha"] == 0]
+
+        for mach in self.machs:
+            for alpha in self.alphas:
+                CD, CL, CNalpha, CP = self.table.lookup(mach, alpha)
+
+                self.assertAlmostEqual(CD, interpolated_lookup(zero_AOA, "Mach", mach, "CD"))
+                self.assertAlmostEqual(CNalpha, interpolated_lookup(zero_AOA, "Mach", mach, "CNalpha (0 to 4 deg) (per rad)"))
+                self.assertAlmostEqual(CL, np.sin(alpha) * CNalpha)
+
+                if np.degrees(alpha) <= 4:
+                    self.assertAlmostEqual(CP, interpolated_lookup_2D(sorted_data, "Mach", "Alpha", mach, np.degrees(alpha), "CP") * 0.0254)
+                elif np.degrees(alpha) <= 90:
+                    zero_AOA_CP = interpolated_lookup(zero_AOA, "Mach", mach, "CP") * 0.0254
+                    self.assertAlmostEqual(CP, zero_AOA_CP + np.sin(alpha) * (AeroTable.perpendicular_CP - zero_AOA_CP))
+                else:
+                    self.assertAlmostEqual(CP, AeroTable.upside_down_CP + np.sin(alpha) * (AeroTable.perpendicular_CP - AeroTable.upside_down_CP))
+
+    def test_array(self):
+        machs, alphas = np.meshgrid(self.machs, self.alphas)
+        result = self.table.lookup(machs, alphas)
+
+        for index in np.ndindex(machs.shape):
+            expected = self.table.lookup(machs[index], alphas[index])
+
+            for array, value in zip(result, expected):
+                self.assertAlmostEqual(array[index], value)
+
+    def test_clamped(self):
+        # Mach numbers past the end of the data stay at the last one instead of throwing
+        self.assertEqual(self.table.lookup(40, 0), self.table.lookup(self.table.machs[-1], 0))
+
+    def test_nan(self):
+        with self.assertRaises(ValueError):
+            self.table.lookup(1, np.nan)
+
+        with self.assertRaises(ValueError):
+            self.table.lookup(np.array([1, 2]), np.array([0, np.nan]))
+
+
+class TestRegistry(unittest.TestCase):
+    def test_shared(self):
+        first, second = Environment(apply_wind=False), Environment(apply_wind=False)
+        self.assertIs(first.atmosphere_lookup, second.atmosphere_lookup)
+
+        first, second = Motor(environment=first), Motor(environment=second)
+        self.assertIs(first.thrust_lookup, second.thrust_lookup)
+        self.assertIs(first.thrust_data, second.thrust_data)
+
+        self.assertIs(CustomMotor().CEA_table, CustomMotor().CEA_table)
+
+    def test_reloads_changed_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "thrust.csv")
+            pd.DataFrame({"time": [0, 1], "thrust": [100, 100]}).to_csv(path, index=False)
+
+            lookup = registry.load(path, "thrust lookup", lambda dataframe: LookupTable.from_dataframe(dataframe, "time", "thrust"))
+            self.assertIs(registry.load(path, "thrust lookup"), lookup)
+
+            pd.DataFrame({"time": [0, 1], "thrust": [200, 200]}).to_csv(path, index=False)
+            os.utime(path, (0, os.path.getmtime(path) + 10))
+
+            self.assertEqual(registry.load(path, "thrust lookup", lambda dataframe: LookupTable.from_dataframe(dataframe, "time", "thrust"))(0.5), 200)
+            self.assertEqual(registry.load(path)["thrust"].iloc[0], 200)
+            # Only the new version is left
+            self.assertEqual(len({key[1] for key in registry.loaded_data if key[0] == os.path.abspath(path)}), 1)
+
+
+class TestSharedTables(unittest.TestCase):
+    def test_copies_share_tables(self):
+        environment = Environment(apply_wind=False)
+        self.assertIs(environment.copy().atmosphere_lookup, environment.atmosphere_lookup)
+
+        motor = Motor(environment=environment)
+        copied = motor.copy()
+        self.assertIs(copied.thrust_lookup, motor.thrust_lookup)
+        self.assertIs(copied.thrust_data, motor.thrust_data)
+        # But not the things that do change
+        self.assertIsNot(copied.environment, motor.environment)
+
+        custom_motor = CustomMotor()
+        self.assertIs(custom_motor.copy().CEA_table, custom_motor.CEA_table)
+        self.assertIs(deepcopy(get_aero_table()), get_aero_table())
+
+    def test_read_only(self):
+        table = LookupTable(np.array([0.0, 1.0]), np.array([0.0, 2.0]))
+        with self.assertRaises(ValueError):
+            table.values[0] = 1
+
+        axis = np.array([0.0, 1.0])
+        grid = GridTable(axis, axis, np.zeros((2, 2)))
+        with self.assertRaises(ValueError):
+            grid.values[0, 0, 0] = 1
+        # What was passed in is left alone
+        axis[0] = -1
+        self.assertEqual(grid.axis1[0], 0)
+
+    def test_thrust_data(self):
+        motor = Motor(environment=Environment(apply_wind=False))
+        dataframe = pd.read_csv(motor.thrust_curve)
+
+        self.assertTrue(np.array_equal(motor.thrust_data["thrust"], dataframe["thrust"]))
+        self.assertAlmostEqual(motor.burn_time, dataframe["time"].iloc[-1])
+
+        motor.set_thrust_data(pd.DataFrame({"time": [0, 2], "thrust": [50, 50]}))
+        self.assertEqual(motor.total_impulse, 100)
+        self.assertEqual(motor.thrust_data["thrust"].iloc[0], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
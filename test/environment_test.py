@@ -0,0 +1,64 @@
+# TEST THE ENVIRONMENT
+# The atmosphere state should give exactly the same numbers as asking for everything separately
+
+
+import unittest
+import numpy as np
+
+from src.environment import Environment
+
+
+class FakeSimulation:
+    time = 0
+
+
+class TestAtmosphereState(unittest.TestCase):
+    def setUp(self):
+        self.environment = Environment(apply_wind=False)
+        self.environment.simulation = FakeSimulation()
+
+    def test_matches_getters(self):
+        for altitude in [1300, 1412.5, 5000, 30000]:
+            atmosphere = self.environment.get_atmosphere(altitude)
+
+            self.assertEqual(atmosphere.density, self.environment.get_air_density(altitude))
+            self.assertEqual(atmosphere.pressure, self.environment.get_air_pressure(altitude))
+            self.assertEqual(atmosphere.speed_of_sound, self.environment.get_speed_of_sound(altitude))
+            self.assertEqual(atmosphere.gravity, self.environment.get_gravitational_attraction(1, altitude))
+            self.assertTrue(np.array_equal(atmosphere.air_velocity, [0, 0, 0]))
+
+    def test_array(self):
+        altitudes = np.array([1300, 1412.5, 5000, 30000])
+        atmosphere = self.environment.get_atmosphere(altitudes)
+
+        for index, altitude in enumerate(altitudes):
+            single = self.environment.get_atmosphere(altitude)
+
+            self.assertAlmostEqual(atmosphere.density[index], single.density)
+            self.assertAlmostEqual(atmosphere.temperature[index], single.temperature)
+            self.assertAlmostEqual(atmosphere.speed_of_sound[index], single.speed_of_sound)
+
+        self.assertEqual(atmosphere.air_velocity.shape, (4, 3))
+
+    def test_remembered(self):
+        first = self.environment.get_atmosphere(2000)
+        self.assertIs(self.environment.get_atmosphere(2000), first)
+
+        self.environment.simulation.time = 1
+        self.assertIsNot(self.environment.get_atmosphere(2000), first)
+
+        # A new frame starts from scratch
+        second = self.environment.get_atmosphere(2000)
+        self.environment.simulate_step()
+        self.assertIsNot(self.environment.get_atmosphere(2000), second)
+
+    def test_polynomial_backend(self):
+        self.environment.atmosphere_backend = "polynomial"
+        atmosphere = self.environment.get_atmosphere(np.array([1000.0, 2000.0]))
+
+        self.assertTrue(np.allclose(atmosphere.density, self.environment.get_air_density_from_model(np.array([1, 2]))))
+        self.assertAlmostEqual(self.environment.get_air_density(1000), atmosphere.density[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# TEST THE EVENT DETECTION
+# Throws a ball straight up, where the exact answers are easy to work out
+
+
+import copy
+import pickle
+import unittest
+import numpy as np
+import pandas as pd
+
+from lib.events import Event, find_event
+from lib.integration import DormandPrinceIntegrator
+from src.environment import Environment
+from src.rocketparts.motor import Motor
+from src.rocketparts.massObject import MassObject
+from src.rocket import Rocket
+from src.simulation.rocket.simulation import RocketSimulation, RocketSimulationToApogee
+from src.data.input.goddardModels import assumed_zero_AOA_CD
+from lib.rotation import Rotation
+
+
+g = 9.81
+
+def ball(time, state):
+    return np.array([state[1], -g])
+
+def ball_state(time):
+    # Thrown at 20 m/s
+    return np.array([20 * time - g * time ** 2 / 2, 20 - g * time])
+
+
+apogee = Event("apogee", lambda time, state: state[1], direction=-1)
+landing = Event("landing", lambda time, state: state[0], direction=-1)
+
+
+def get_sim(integrator, simulation_class=RocketSimulation):
+    env = Environment(apply_wind=False)
+    motor = Motor(front=2, center_of_gravity=2, mass=15, propellant_mass=15, environment=env)
+    # A short burn, so that the whole flight is only a few hundred frames even for the fine steps
+    motor.set_thrust_data(pd.DataFrame({"time": [0, 1, 4], "thrust": [5000, 5000, 0]}))
+
+    rocket = Rocket(radius=0.1016, length=5.7912, rotation=Rotation(np.pi / 2, 0), environment=env, motor=motor, parachutes=[])
+    rocket.set_CD_function(assumed_zero_AOA_CD)
+    rocket.mass_objects = [motor, MassObject(center_of_gravity=0.7, mass=20), MassObject(center_of_gravity=4.4, mass=40)]
+
+    sim = simulation_class(time_increment=0.05, apply_angular_forces=False, integrator=integrator, environment=env, rocket=rocket)
+    sim.logger = None
+    motor.simulation = sim
+
+    return sim
+
+
+def find_ball_event(event, time, time_increment):
+    state = ball_state(time)
+    new_state = ball_state(time + time_increment)
+
+    return find_event(event, time, time_increment, state, ball(time, state), new_state, ball(time + time_increment, new_state))
+
+
+class TestEvents(unittest.TestCase):
+    def test_exact_crossing(self):
+        # The interpolation is cubic, so a parabola should come out exactly even with a huge step
+        result = find_ball_event(apogee, 1, 2)
+
+        self.assertAlmostEqual(result.time, 20 / g)
+        self.assertAlmostEqual(result.state[0], 20 ** 2 / (2 * g))
+        self.assertAlmostEqual(result.state[1], 0)
+
+    def test_no_crossing(self):
+        self.assertIsNone(find_ball_event(apogee, 0, 1))
+        self.assertIsNone(find_ball_event(landing, 1, 2))
+
+    def test_direction(self):
+        rising_apogee = Event("apogee", apogee.function, direction=1)
+
+        self.assertIsNone(find_ball_event(rising_apogee, 1, 2))
+        self.assertIsNotNone(find_ball_event(Event("apogee", apogee.function), 1, 2))
+
+
+class TestRocketEvents(unittest.TestCase):
+    def test_stops_at_apogee(self):
+        sim = get_sim(DormandPrinceIntegrator(), RocketSimulationToApogee)
+        sim.run_simulation()
+
+        self.assertIn("apogee", sim.event_results)
+        self.assertAlmostEqual(sim.rocket.velocity[2], 0, places=6)
+        self.assertAlmostEqual(sim.rocket.position[2], sim.apogee)
+        self.assertAlmostEqual(sim.time, sim.event_results["apogee"].time)
+
+    def test_coarse_steps(self):
+        # Without the events, apogee is off by however far the rocket goes in the frame after it
+        coarse = get_sim(DormandPrinceIntegrator(max_time_increment=5))
+        coarse.run_simulation()
+
+        fine = get_sim(DormandPrinceIntegrator(relative_tolerance=1e-9, absolute_tolerance=1e-9))
+        fine.run_simulation()
+
+        self.assertAlmostEqual(coarse.apogee, fine.apogee, delta=1)
+        self.assertLess(abs(coarse.apogee - fine.apogee), abs(coarse.rocket.apogee - fine.apogee))
+
+        for name in ["rail exit", "burnout", "apogee", "landing"]:
+            self.assertAlmostEqual(coarse.event_results[name].time, fine.event_results[name].time, places=2)
+
+    def test_copies(self):
+        sim = get_sim(DormandPrinceIntegrator(), RocketSimulationToApogee)
+
+        for copied in [pickle.loads(pickle.dumps(sim)), copy.deepcopy(sim)]:
+            # The events have to look at the rocket of the copy, not the original
+            burnout = next(event for event in copied.events if event.name == "burnout")
+            self.assertIs(burnout.function.__self__, copied)
+
+            copied.run_simulation()
+            self.assertIn("apogee", copied.event_results)
+
+        self.assertEqual(sim.event_results, {})
+        self.assertEqual(sim.rocket.position[2], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# TEST THE GRAIN BURNBACK
+# A circular port should burn back as a circle, and the casing should stop the flame
+
+
+import unittest
+import tempfile
+import os
+import numpy as np
+
+from src.data.generation.SimulateGrainSurface import create_regression_table, get_burn_perimeter, get_port_area, get_signed_distance
+from src.rocketparts.motorparts.graingeometry import Annular, get_areas_csv
+
+
+def get_circle_mask(size=400, port_radius=50, casing_radius=180):
+    rows, columns = np.indices((size, size))
+    radius = np.hypot(rows - size / 2 + 0.5, columns - size / 2 + 0.5)
+
+    mask = np.where(radius < port_radius, 1, 0)
+    mask[radius > casing_radius] = -1
+
+    return mask
+
+
+class TestGrainSurface(unittest.TestCase):
+    def test_circle(self):
+        mask = get_circle_mask()
+        signed_distance = get_signed_distance(mask)
+        wall = mask == -1
+
+        for regression in [20, 60, 100]:
+            radius = 50 + regression
+
+            self.assertAlmostEqual(get_burn_perimeter(signed_distance, regression, wall) / (2 * np.pi * radius), 1, delta=0.01)
+            self.assertAlmostEqual(get_port_area(signed_distance, regression, wall) / (np.pi * radius ** 2), 1, delta=0.01)
+
+    def test_casing(self):
+        mask = get_circle_mask()
+        signed_distance = get_signed_distance(mask)
+        wall = mask == -1
+
+        # Once it burns through, nothing is left to burn and the walls never count as port
+        self.assertEqual(get_burn_perimeter(signed_distance, 140, wall), 0)
+        self.assertAlmostEqual(get_port_area(signed_distance, 140, wall), np.sum(mask != -1))
+
+    def test_table(self):
+        pixel_size = 0.001
+        table = create_regression_table(get_circle_mask(), pixel_size)
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "circleLookup.csv")
+            table.to_csv(path, index=False)
+
+            # It should burn the same as a circular port, except for the bit where the round casing cuts the flame off
+            table_geometry = Annular(port_radius=0.05, outer_radius=0.18, length=0.5)
+            table_geometry.area_function = get_areas_csv(path)
+            geometry = Annular(port_radius=0.05, outer_radius=0.18, length=0.5)
+
+            for regression in [0.01, 0.05, 0.1]:
+                table_geometry.length_regressed = regression
+                table_geometry.calculate_area()
+                geometry.port_radius = 0.05 + regression
+
+                self.assertAlmostEqual(table_geometry.burn_area / geometry.burn_area, 1, delta=0.01)
+                self.assertAlmostEqual(table_geometry.port_volume / geometry.port_volume, 1, delta=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+# TEST THE INTEGRATORS
+# Checks them against problems with exact solutions, then makes sure the rocket gets the same flight out of each of them
+
+
+import unittest
+import numpy as np
+import pandas as pd
+
+from lib.integration import TrapezoidIntegrator, RK4Integrator, DormandPrinceIntegrator
+from src.environment import Environment
+from src.rocketparts.motor import Motor
+from src.rocketparts.massObject import MassObject
+from src.rocketparts.parachute import ApogeeParachute
+from src.rocket import Rocket
+from src.simulation.rocket.simulation import RocketSimulation, RocketSimulationToApogee
+from src.data.input.goddardModels import linear_approximated_normal_force, assumed_zero_AOA_CD
+from lib.rotation import Rotation
+
+
+def oscillator(time, state):
+    # x'' = -x, so x = cos(t) starting from (1, 0)
+    return np.array([state[1], -state[0]])
+
+
+def integrate(integrator, end_time, time_increment):
+    time = 0
+    state = np.array([1.0, 0.0])
+
+    while time < end_time - 1e-12:
+        state, taken = integrator.step(oscillator, time, state, time_increment, end_time - time)
+        time += taken
+
+    return state
+
+
+def get_sim(integrator=None, time_increment=0.05, rotation=Rotation(np.pi / 2, 0), apply_angular_forces=False, parachute=False, wind=False, thrust_multiplier=1, max_frames=-1, simulation_class=RocketSimulation):
+    env = Environment(apply_wind=False)
+    motor = Motor(front=2, center_of_gravity=2, mass=15, propellant_mass=15, environment=env, thrust_multiplier=thrust_multiplier)
+    # A short burn that tails off like a real one, so that the flights are over in a few hundred frames
+    motor.set_thrust_data(pd.DataFrame({"time": [0, 1, 4], "thrust": [5000, 5000, 0]}))
+
+    parachutes = [ApogeeParachute(diameter=4.8768)] if parachute else []
+    rocket = Rocket(radius=0.1016, length=5.7912, rotation=rotation, environment=env, motor=motor, parachutes=parachutes)
+    rocket.set_CL_function(linear_approximated_normal_force)
+    rocket.set_CD_function(assumed_zero_AOA_CD)
+    rocket.set_moment_constant(250)
+    rocket.mass_objects = [motor, *parachutes, MassObject(center_of_gravity=0.7, mass=20), MassObject(center_of_gravity=4.4, mass=40)]
+
+    sim = simulation_class(time_increment=time_increment, apply_angular_forces=apply_angular_forces, integrator=integrator, environment=env, rocket=rocket, max_frames=max_frames)
+    sim.logger = None
+    motor.simulation = sim
+
+    if wind:
+        # The wind can't be turned on until there is a simulation to get the time from
+        env.apply_wind = True
+        # Always the same wind, and sampled onto a table so that the test doesn't spend all of its time making noise
+        env.wind.seeds = np.random.default_rng(0).random(env.wind.count) * env.wind.count * 100
+        env.wind.use_table = True
+        env.wind.table_duration = 30
+        env.wind.clear_table()
+
+    return sim
+
+
+class TestIntegrators(unittest.TestCase):
+    def test_orders(self):
+        expected = np.array([np.cos(2), -np.sin(2)])
+
+        for integrator, order in [(TrapezoidIntegrator, 2), (RK4Integrator, 4)]:
+            coarse = np.max(np.abs(integrate(integrator(), 2, 0.1) - expected))
+            fine = np.max(np.abs(integrate(integrator(), 2, 0.05) - expected))
+
+            # Halving the step should cut the error by 2 ^ order
+            self.assertAlmostEqual(np.log2(coarse / fine), order, delta=0.3)
+
+    def test_adaptive(self):
+        integrator = DormandPrinceIntegrator(relative_tolerance=1e-8, absolute_tolerance=1e-10)
+        state = integrate(integrator, 10, 0.01)
+
+        self.assertTrue(np.allclose(state, [np.cos(10), -np.sin(10)], atol=1e-7))
+        # The step should have grown well past the first guess
+        self.assertLess(integrator.steps, 200)
+
+    def test_reuses_last_evaluation(self):
+        integrator = DormandPrinceIntegrator()
+        integrate(integrator, 10, 0.01)
+
+        self.assertEqual(integrator.derivative_evaluations, 6 * (integrator.steps + integrator.rejected_steps) + 1)
+
+    def test_max_time_increment(self):
+        integrator = DormandPrinceIntegrator()
+        state, taken = integrator.step(oscillator, 0, np.array([1.0, 0.0]), 0.5, 0.01)
+
+        self.assertEqual(taken, 0.01)
+
+
+class TestRocketIntegrators(unittest.TestCase):
+    def test_same_flight(self):
+        # Tight enough that apogee is as exact as it gets. The flights stop right at apogee, so it doesn't need small steps to find it
+        reference = get_sim(DormandPrinceIntegrator(relative_tolerance=1e-9, absolute_tolerance=1e-9), simulation_class=RocketSimulationToApogee)
+        reference.run_simulation()
+
+        adaptive = get_sim(DormandPrinceIntegrator(), simulation_class=RocketSimulationToApogee)
+        adaptive.run_simulation()
+
+        trapezoid = get_sim(simulation_class=RocketSimulationToApogee)
+        trapezoid.run_simulation()
+
+        self.assertAlmostEqual(adaptive.apogee, reference.apogee, delta=1)
+        self.assertAlmostEqual(adaptive.rocket.motor.total_mass, reference.rocket.motor.total_mass, places=3)
+
+        # The original scheme should be close, but the adaptive one should be closer in a lot fewer frames
+        # It takes the motor's mass away a frame early, which costs a few percent of apogee on a burn this short
+        self.assertAlmostEqual(trapezoid.apogee / reference.apogee, 1, delta=0.03)
+        self.assertLess(abs(adaptive.apogee - reference.apogee), abs(trapezoid.apogee - reference.apogee))
+        self.assertLess(adaptive.frames, trapezoid.frames / 5)
+
+    def test_wind(self):
+        # The wind noise isn't smooth in time, so if the adaptive integrator saw it change inside of a step, the step would shrink to nothing under the parachute
+        # Without the wind it takes about 50 frames, and it used to take almost three times that with it
+        sim = get_sim(DormandPrinceIntegrator(), rotation=Rotation(0.3, 0.1), apply_angular_forces=True, parachute=True, wind=True, thrust_multiplier=0.3, max_frames=100)
+        sim.run_simulation()
+
+        self.assertTrue(sim.rocket.landed)
+        self.assertLess(sim.frames, 100)
+
+if __name__ == '__main__':
+    unittest.main()
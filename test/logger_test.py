@@ -0,0 +1,117 @@
+# TEST THE COLUMNAR LOGGER
+# Makes sure that logging into preallocated columns gives the same dataframe that the old row-by-row logger did
+
+
+import unittest
+import numpy as np
+
+from lib.logging.logger import Logger
+from lib.logging.logger_features import Feature, feature_time
+from lib.units import Units
+from lib.vector import Vector
+
+
+class FakeRocket:
+    def __init__(self):
+        self.position = Vector(0, 0, 0)
+        self.deployed = False
+
+
+class FakeSimulation:
+    def __init__(self):
+        self.time = 0
+        self.rocket = FakeRocket()
+
+    def step(self):
+        self.time += 0.5
+        self.rocket.position = self.rocket.position + Vector(1, 2, 3)
+        self.rocket.deployed = self.time > 2
+
+
+feature_altitude = Feature("altitude", "rocket.position.z", Units.m)
+feature_position = Feature("position", "rocket/position", Units.m)
+feature_deployed = Feature("deployed", "rocket.deployed", Units.amount)
+
+
+def run_logger(frames, **kwargs):
+    simulation = FakeSimulation()
+    logger = Logger(simulation, features=set([feature_time, feature_altitude, feature_position, feature_deployed]), **kwargs)
+
+    for _ in range(frames):
+        simulation.step()
+        logger.handle_frame()
+
+    return logger.get_dataframe()
+
+
+class TestLogger(unittest.TestCase):
+    def test_columns(self):
+        df = run_logger(10)
+
+        self.assertEqual(len(df), 10)
+        self.assertEqual(df.index.name, feature_time.get_label())
+        self.assertTrue(np.allclose(df.index, np.arange(1, 11) * 0.5))
+        self.assertTrue(np.allclose(df[feature_altitude.get_label()], np.arange(1, 11) * 3))
+
+        # Arrays get split into numbered columns
+        self.assertTrue(np.allclose(df[feature_position.get_label() + "2"], np.arange(1, 11) * 2))
+        self.assertNotIn(feature_position.get_label(), df.columns)
+
+        # Booleans should stay booleans
+        self.assertEqual(list(df[feature_deployed.get_label()]), [False] * 4 + [True] * 6)
+
+    def test_growing(self):
+        df = run_logger(50, initial_capacity=4)
+
+        self.assertEqual(len(df), 50)
+        self.assertTrue(np.allclose(df[feature_altitude.get_label()], np.arange(1, 51) * 3))
+
+    def test_not_splitting(self):
+        df = run_logger(3, splitting_arrays=False)
+
+        self.assertTrue(np.allclose(df[feature_position.get_label()].iloc[-1], [3, 6, 9]))
+
+    def test_changing_features(self):
+        simulation = FakeSimulation()
+        logger = Logger(simulation, features=set([feature_time, feature_altitude]), initial_capacity=4)
+
+        for frame in range(9):
+            if frame == 3:
+                logger.features = logger.features | {feature_position}
+            if frame == 6:
+                logger.features = logger.features - {feature_altitude}
+
+            simulation.step()
+            logger.handle_frame()
+
+        df = logger.get_dataframe()
+
+        # Nothing that was already logged gets thrown away
+        self.assertEqual(len(df), 9)
+        altitude = df[feature_altitude.get_label()].to_numpy()
+        self.assertTrue(np.allclose(altitude[:6], np.arange(1, 7) * 3))
+        self.assertTrue(np.isnan(altitude[6:]).all())
+
+        x = df[feature_position.get_label() + "1"].to_numpy()
+        self.assertTrue(np.isnan(x[:3]).all())
+        self.assertTrue(np.allclose(x[3:], np.arange(4, 10)))
+
+    def test_decimation(self):
+        full = run_logger(20)
+        decimated = run_logger(20, log_every=3)
+
+        self.assertEqual(len(decimated), 7)
+        self.assertTrue(full.iloc[::3].equals(decimated))
+
+    def test_missing_value(self):
+        simulation = FakeSimulation()
+        logger = Logger(simulation, features=set([feature_time, Feature("missing", "rocket.missing", Units.m)]))
+
+        simulation.step()
+        logger.handle_frame()
+
+        self.assertTrue(np.isnan(logger.get_dataframe()["missing [m]"].iloc[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 # Bugs might be difficult to find in this, so I'll have some very specific tests to make sure everything is working exactly correctly
 
 import unittest
+from copy import deepcopy
 
 
 from src.rocketparts.massObject import MassObject
@@ -39,3 +40,81 @@ class TestMassObject(unittest.TestCase):
 
         print(rocket.total_CG)
         # Meh, I am pretty sure it is correct
+
+
+def get_tree():
+    o_ring = MassObject(mass=0.1, front=0.01, center_of_gravity=0.05)
+    injector = MassObject(mass=5, front=1.4, center_of_gravity=0.05, mass_objects=[o_ring])
+    ox_tank = MassObject(mass=50, front=2, center_of_gravity=1, mass_objects=[injector])
+    rocket = MassObject(mass=10, front=0, center_of_gravity=2, mass_objects=[ox_tank])
+
+    return rocket, ox_tank, injector, o_ring
+
+
+def uncached_totals(mass_object):
+    # Going through the exclude_objects path skips the cache
+    nothing = [MassObject()]
+
+    flattened = mass_object.get_flattened_mass_objects(0, nothing)
+    mass = mass_object.get_total_mass(nothing)
+    CG = sum(position * part.mass for position, part in flattened) / mass
+    moment = sum(part.mass * (position - CG) ** 2 for position, part in flattened)
+
+    return mass, CG, moment
+
+
+class TestMassCache(unittest.TestCase):
+    def assertMatchesUncached(self, mass_object):
+        mass, CG, moment = uncached_totals(mass_object)
+
+        self.assertAlmostEqual(mass_object.total_mass, mass)
+        self.assertAlmostEqual(mass_object.total_CG, CG)
+        self.assertAlmostEqual(mass_object.total_moment_of_inertia, moment)
+
+    def test_matches_uncached(self):
+        rocket, ox_tank, injector, o_ring = get_tree()
+
+        self.assertMatchesUncached(rocket)
+        # Second time comes from the cache
+        self.assertMatchesUncached(rocket)
+        self.assertEqual(rocket.get_flattened_mass_objects(), rocket.get_flattened_mass_objects(0, [MassObject()]))
+
+    def test_invalidation(self):
+        rocket, ox_tank, injector, o_ring = get_tree()
+        rocket.total_moment_of_inertia
+
+        o_ring.set_mass_constant(3)
+        self.assertMatchesUncached(rocket)
+
+        injector.front = 0.5
+        self.assertMatchesUncached(rocket)
+
+        ox_tank.mass_objects.append(MassObject(mass=7, front=1.9, center_of_gravity=0.1))
+        self.assertMatchesUncached(rocket)
+
+        ox_tank.mass_objects.pop(0)
+        self.assertMatchesUncached(rocket)
+
+        rocket.mass_objects = []
+        self.assertAlmostEqual(rocket.total_mass, 10)
+
+    def test_function_of_time_not_cached(self):
+        rocket, ox_tank, injector, o_ring = get_tree()
+
+        masses = iter([1, 2])
+        o_ring.set_mass_as_function_of_time(lambda time: next(masses))
+        o_ring.simulation = MassObject()
+        o_ring.simulation.time = 0
+
+        self.assertAlmostEqual(rocket.total_mass, 66)
+        self.assertAlmostEqual(rocket.total_mass, 67)
+
+    def test_copies_do_not_share_cache(self):
+        rocket, ox_tank, injector, o_ring = get_tree()
+        rocket.total_mass
+
+        copy = deepcopy(rocket)
+        copy.mass_objects[0].mass = 60
+
+        self.assertAlmostEqual(rocket.total_mass, 65.1)
+        self.assertAlmostEqual(copy.total_mass, 75.1)
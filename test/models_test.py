@@ -1,7 +1,14 @@
+import os
+import sys
+import subprocess
+import tempfile
 import unittest
 
 import numpy as np
+from scipy.interpolate import bisplev
+
 from src.environment import Environment
+from src.data.input import models
 
 
 class Testing(unittest.TestCase):
@@ -13,3 +20,30 @@ class Testing(unittest.TestCase):
                 e.get_air_density_from_lookup(i),
                 e.get_air_density_from_model(i),
                 1)
+
+
+class TestLazyModels(unittest.TestCase):
+    def test_rocket_import(self):
+        # Plotting and fitting libraries should only be imported once something uses them
+        script = "import sys, src.rocket; print(sorted(name for name in ('matplotlib', 'scipy', 'src.data.input.goddardModels') if name in sys.modules))"
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+
+        self.assertEqual(output.strip(), "[]")
+
+    def test_spline_cache(self):
+        original_path = models.spline_cache_path
+
+        with tempfile.TemporaryDirectory() as folder:
+            models.spline_cache_path = folder
+
+            try:
+                fitted = models.fit_aero_spline("CD", 1, 1, 0.3)
+                self.assertEqual(len(os.listdir(folder)), 1)
+
+                loaded = models.fit_aero_spline("CD", 1, 1, 0.3)
+                self.assertAlmostEqual(float(models.get_splined_coefficient_of_drag(0.5, 0.02)), float(bisplev(0.5, 0.02 * 180 / np.pi, loaded)))
+            finally:
+                models.spline_cache_path = original_path
+
+        for fitted_value, loaded_value in zip(fitted, loaded):
+            self.assertTrue(np.array_equal(fitted_value, loaded_value))
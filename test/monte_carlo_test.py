@@ -0,0 +1,81 @@
+# TEST THE MONTE CARLO BASE CLASS
+# Uses a fake simulation that only draws random numbers, so that the parallel pool can be checked without flying anything
+
+
+import random
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from example.analysis.monteCarlo import MonteCarlo
+
+
+class RandomSimulation:
+    def __init__(self):
+        self.logger = SimpleNamespace()
+        # Drawn when the simulation is made, like the randomized parts of a real one
+        self.value = np.random.random()
+        self.offset = random.random()
+
+    def run_simulation(self):
+        if self.value > 0.7:
+            raise ValueError(f"{self.value} is too big")
+
+        self.data = pd.DataFrame({"time": [0, 1], "value": [0, self.value], "offset": [0, self.offset]})
+
+
+class RandomMonteCarlo(MonteCarlo):
+    def __init__(self):
+        super().__init__(sims=[])
+
+    def initialize_simulation(self):
+        return RandomSimulation()
+
+    def save_simulation(self, sim):
+        super().save_simulation(sim)
+
+        self.characteristic_figures.append({"value": sim.value, "offset": sim.offset})
+        self.important_data.append(sim.data)
+
+
+class TestMonteCarlo(unittest.TestCase):
+    def test_parallel(self):
+        count = 12
+
+        single = RandomMonteCarlo()
+        single.simulate_parallel(count, workers=1, seed=3)
+
+        pooled = RandomMonteCarlo()
+        pooled.simulate_parallel(count, workers=2, seed=3, important_columns=["time", "value"])
+
+        # The same seed gives the same results no matter how many workers there are
+        pd.testing.assert_frame_equal(single.characteristic_figures_dataframe, pooled.characteristic_figures_dataframe)
+
+        # Some failed, and the rest still ran
+        self.assertGreater(len(pooled.failed_sims), 0)
+        self.assertGreater(len(pooled.characteristic_figures), 0)
+        self.assertEqual(len(pooled.characteristic_figures) + len(pooled.failed_sims), count)
+        self.assertEqual(pooled.simulation_count, count)
+
+        # The failed simulations come back as simulations that fail the same way again
+        for sim in pooled.failed_sims:
+            self.assertIsInstance(sim, RandomSimulation)
+            with self.assertRaises(ValueError):
+                sim.run_simulation()
+
+        self.assertEqual([list(df.columns) for df in pooled.important_data], [["time", "value"]] * len(pooled.important_data))
+        self.assertEqual(list(single.important_data[0].columns), ["time", "value", "offset"])
+
+    def test_serial_failures(self):
+        monte_carlo = RandomMonteCarlo()
+        np.random.seed(3)
+        monte_carlo.simulate_randomized(12)
+
+        for sim in monte_carlo.failed_sims:
+            self.assertIsInstance(sim, RandomSimulation)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# TEST THE BATCHED MOTOR SIMULATION
+# The batch follows CustomMotor.calculate_thrust step for step, so running the same motors both ways should give nearly the same burns
+# They are not exactly the same because the batch always looks the tank temperature up in the nitrous table, so the phase can switch a few frames earlier or later once the liquid runs out
+
+
+import unittest
+import numpy as np
+
+from src.environment import Environment
+from src.rocketparts.motor import CustomMotor
+from src.rocketparts.motorparts.oxtank import OxTank
+from src.rocketparts.motorparts.injector import Injector
+from src.rocketparts.motorparts.combustionchamber import CombustionChamber
+from src.rocketparts.motorparts.grain import Grain
+from src.rocketparts.motorparts.nozzle import Nozzle
+from src.simulation.motor.simulation import MotorSimulation
+from src.simulation.motor.batch import BatchMotorSimulation
+
+
+def get_sim(temperature=293, port_diameter=0.1, cstar_efficiency=0.85, time_increment=0.05, pressure_integrator="explicit"):
+    env = Environment()
+    ox = OxTank(temperature=temperature, length=2.67, diameter=0.172339, ox_mass=36.3, front=0)
+    grain = Grain(length=0.788, center_of_gravity=3.19, verbose=False)
+    grain.geometry.outer_diameter = 0.17145
+    grain.geometry.port_diameter = port_diameter
+    chamber = CombustionChamber(fuel_grain=grain, limit_pressure_change=False, pressure_integrator=pressure_integrator)
+    injector = Injector(ox_tank=ox, combustion_chamber=chamber, orifice_count=3)
+    nozzle = Nozzle(throat_diameter=0.045, area_ratio=4.78)
+    motor = CustomMotor(ox_tank=ox, injector=injector, combustion_chamber=chamber, nozzle=nozzle, environment=env, cstar_efficiency=cstar_efficiency)
+
+    return MotorSimulation(motor=motor, logger=None, environment=env, time_increment=time_increment)
+
+
+class TestBatchMotorSimulation(unittest.TestCase):
+    def setUp(self):
+        self.settings = [
+            {},
+            {"temperature": 288, "port_diameter": 0.11, "cstar_efficiency": 0.8},
+        ]
+
+    def test_matches_individual_simulations(self):
+        individual = [get_sim(**settings) for settings in self.settings]
+        for sim in individual:
+            sim.run_simulation()
+
+        batched = [get_sim(**settings) for settings in self.settings]
+        batch = BatchMotorSimulation(batched)
+        batch.run_simulation()
+
+        self.assertEqual(batch.errors, {})
+
+        for index, (expected, actual) in enumerate(zip(individual, batched)):
+            self.assertLessEqual(abs(expected.frames - actual.frames), 5)
+            self.assertAlmostEqual(expected.total_impulse, actual.total_impulse, delta=expected.total_impulse * 5e-3)
+            self.assertAlmostEqual(expected.grain.port_radius, actual.grain.port_radius, places=3)
+
+            curve = batch.get_thrust_curve(index)
+            self.assertEqual(len(curve), actual.frames)
+            self.assertAlmostEqual(np.sum(curve["thrust"]) * batch.time_increment, actual.total_impulse)
+
+    def test_thrust_curves_stop_with_each_motor(self):
+        # A much bigger port burns through the end of the grain sooner
+        batch = BatchMotorSimulation([get_sim(), get_sim(port_diameter=0.16)])
+        batch.run_simulation()
+
+        curves = batch.thrust_curves
+        self.assertEqual(curves.shape, (2, batch.curve_frames))
+        self.assertLess(batch.frames_per_motor[1], batch.frames_per_motor[0])
+        self.assertTrue(np.all(np.isnan(curves[1, batch.frames_per_motor[1]:])))
+
+    def test_mismatched_time_increment(self):
+        with self.assertRaises(ValueError):
+            BatchMotorSimulation([get_sim(), get_sim(time_increment=0.01)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# TEST THE MOTOR BURN CACHE
+# A custom motor should only be simulated once per configuration, and playing the burn back should give the thrust the custom motor would have
+
+
+import unittest
+import tempfile
+
+from src.simulation.motor import cache
+from src.simulation.motor.cache import MotorCache, get_burn_key
+from motor_batch_simulation_test import get_sim
+
+
+class TestMotorCache(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache = MotorCache(self.folder.name)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_key(self):
+        self.assertEqual(get_burn_key(get_sim().motor), get_burn_key(get_sim().motor))
+        self.assertNotEqual(get_burn_key(get_sim().motor), get_burn_key(get_sim(port_diameter=0.11).motor))
+        self.assertNotEqual(get_burn_key(get_sim().motor), get_burn_key(get_sim().motor, time_increment=0.05))
+
+        # Burns from older versions of the simulation are never reused
+        key = get_burn_key(get_sim().motor)
+        cache.burn_version -= 1
+        try:
+            self.assertNotEqual(get_burn_key(get_sim().motor), key)
+        finally:
+            cache.burn_version += 1
+
+        # The thrust multiplier is applied when the burn is played back, so it does not need another burn
+        scaled = get_sim().motor
+        scaled.thrust_multiplier = 1.1
+        self.assertEqual(get_burn_key(get_sim().motor), get_burn_key(scaled))
+
+    def test_simulates_once(self):
+        first = self.cache.get_burn(get_sim().motor, time_increment=0.05)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 1))
+
+        # Read it back from the disk instead of from memory
+        self.cache.loaded.clear()
+        second = self.cache.get_burn(get_sim().motor, time_increment=0.05)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+        self.assertEqual(len(first), len(second))
+        self.assertAlmostEqual(first["thrust"].sum(), second["thrust"].sum(), places=3)
+
+    def test_replay_matches_motor(self):
+        sim = get_sim()
+        replay = self.cache.get_motor(sim.motor, time_increment=0.05)
+
+        sim.initialize_simulation()
+        while not sim.is_finished():
+            time = sim.time
+            sim.simulate_step()
+
+            self.assertAlmostEqual(sim.motor.thrust, replay.get_thrust(time), places=6)
+
+        sim.end()
+        self.assertAlmostEqual(sim.motor.total_impulse, replay.get_total_impulse(), places=3)
+        self.assertAlmostEqual(sim.time, replay.get_burn_time())
+        self.assertEqual(replay.get_thrust(sim.time + 1), 0)
+
+        # Less air pushing back on the nozzle
+        self.assertGreater(replay.get_thrust(1, altitude=10000), replay.get_thrust(1, altitude=0))
+
+        # All of the propellant that got used comes off of the mass
+        used = replay.burn["propellant_mass"].iloc[0] - replay.burn["propellant_mass"].iloc[-1]
+        replay.update_mass(sim.time)
+        self.assertAlmostEqual(replay.total_mass, sim.motor.mass - used)
+
+    def test_eviction(self):
+        self.cache.get_burn(get_sim().motor, time_increment=0.05)
+        self.cache.size_budget = 1
+
+        self.cache.get_burn(get_sim(port_diameter=0.11).motor, time_increment=0.05)
+
+        # Only the newest burn is left, even though it is over the budget by itself
+        self.assertEqual([path.stem for path in self.cache.files], [get_burn_key(get_sim(port_diameter=0.11).motor, time_increment=0.05)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
 import matplotlib.pyplot as plt
 from math import pi
+import unittest
 
 import numpy as np
 
-from src.data.input.chemistry.nitrousproperties import calculate_heat, calculate_temperature, get_specific_enthalpy_of_liquid_nitrous
+from src.data.input.chemistry.nitrousproperties import calculate_heat, calculate_temperature, calculate_temperature_from_guess, get_gaseous_nitrous_density, get_gaseous_specific_heat, get_liquid_nitrous_density, get_liquid_specific_heat, get_saturated_properties, get_specific_enthalpy_of_liquid_nitrous, get_specific_enthalpy_of_nitrous_vapor, get_vapor_pressure
+from src.data.input.chemistry.nitroustable import calculate_temperatures, check_accuracy, get_heat, lookup_temperature
 
 from src.rocketparts.motorparts.oxtank import OxTank
 
@@ -77,6 +79,129 @@ def plot_drain():
 
 
 
+class TestNitrousProperties(unittest.TestCase):
+    def test_saturated_properties(self):
+        temperatures = np.linspace(190, 305, 20)
+        properties = get_saturated_properties(temperatures)
+
+        for index, temperature in enumerate(temperatures):
+            temperature = float(temperature)
+
+            self.assertAlmostEqual(properties.vapor_pressure[index], get_vapor_pressure(temperature))
+            self.assertAlmostEqual(properties.liquid_density[index], get_liquid_nitrous_density(temperature))
+            self.assertAlmostEqual(properties.vapor_density[index], get_gaseous_nitrous_density(temperature))
+            self.assertAlmostEqual(properties.liquid_enthalpy[index], get_specific_enthalpy_of_liquid_nitrous(temperature))
+            self.assertAlmostEqual(properties.vapor_enthalpy[index], get_specific_enthalpy_of_nitrous_vapor(temperature))
+            self.assertAlmostEqual(properties.liquid_specific_heat[index], get_liquid_specific_heat(temperature))
+            self.assertAlmostEqual(properties.vapor_specific_heat[index], get_gaseous_specific_heat(temperature))
+
+    def test_array_range(self):
+        with self.assertRaises(ValueError):
+            get_liquid_nitrous_density(np.array([250, 320]))
+
+        clamped = get_liquid_nitrous_density(np.array([100, 250, 320]), clamped=True)
+        self.assertTrue(np.all(np.isfinite(clamped)))
+        self.assertAlmostEqual(clamped[1], get_liquid_nitrous_density(250))
+
+    def test_warm_start(self):
+        generator = np.random.default_rng(0)
+
+        for _ in range(200):
+            volume = np.exp(generator.uniform(np.log(1 / 1500), np.log(100)))
+            enthalpy = generator.uniform(-500, 20)
+            expected_temperature, expected_phase = calculate_temperature(volume, 1, enthalpy, iters=60)
+
+            temperature, phase = calculate_temperature_from_guess(volume, 1, enthalpy, expected_temperature + generator.normal(0, 3))
+
+            self.assertAlmostEqual(temperature, expected_temperature, places=6)
+            self.assertEqual(phase, expected_phase)
+
+
+class TestNitrousTable(unittest.TestCase):
+    def test_accuracy(self):
+        max_error, wrong_phases = check_accuracy(samples=500)
+
+        self.assertLess(max_error, 0.02)
+        self.assertEqual(wrong_phases, 0)
+
+    def test_vectorized_reference(self):
+        volumes = np.array([0.001, 0.002, 0.01, 0.1])
+        enthalpies = np.array([-300, -250, -150, -50])
+        temperatures, phases, liquid_fractions = calculate_temperatures(volumes, enthalpies)
+
+        for volume, enthalpy, temperature, phase in zip(volumes, enthalpies, temperatures, phases):
+            expected_temperature, expected_phase = calculate_temperature(volume, 1, enthalpy, iters=60)
+
+            self.assertAlmostEqual(temperature, expected_temperature, places=6)
+            self.assertEqual(phase, expected_phase.value)
+
+    def test_get_heat(self):
+        for mass, temperature in [(45, 293), (45, 250), (5, 280), (45, 190)]:
+            heat = get_heat(0.06, mass, temperature)
+
+            self.assertAlmostEqual(lookup_temperature(0.06, mass, heat)[0], temperature, places=2)
+            self.assertAlmostEqual(calculate_temperature(0.06, mass, heat, iters=60)[0], temperature, places=2)
+
+    def test_tank_backends(self):
+        table = OxTank(ox_mass=45, length=2.65, radius=0.1905 / 2)
+        iterative = OxTank(ox_mass=45, length=2.65, radius=0.1905 / 2, nitrous_backend="iterative")
+        iterative.heat = table.heat
+
+        for _ in range(50):
+            table.drain_mass(0.5)
+            iterative.drain_mass(0.5)
+
+        self.assertAlmostEqual(table.temperature, iterative.temperature, places=1)
+        self.assertEqual(table.phase, iterative.phase)
+        self.assertAlmostEqual(table.pressure / iterative.pressure, 1, places=3)
+
+
+class TestOxTankUpdates(unittest.TestCase):
+    def setUp(self):
+        self.tank = OxTank(ox_mass=45, length=2.65, radius=0.1905 / 2)
+
+        self.solves = 0
+        update_state = self.tank.update_state
+
+        def counted_update_state():
+            self.solves += 1
+            update_state()
+
+        self.tank.update_state = counted_update_state
+
+    def test_one_solve_per_drain(self):
+        self.tank.drain_mass(0.5)
+
+        self.assertEqual(self.solves, 1)
+
+    def test_same_as_separate_setters(self):
+        separate = OxTank(ox_mass=45, length=2.65, radius=0.1905 / 2)
+
+        for _ in range(20):
+            self.tank.drain_mass(0.5)
+
+            specific_enthalpy = get_specific_enthalpy_of_liquid_nitrous(separate.temperature)
+            separate.ox_mass -= 0.5
+            separate.heat -= 0.5 * specific_enthalpy
+
+        self.assertEqual(self.tank.temperature, separate.temperature)
+        self.assertEqual(self.tank.ullage, separate.ullage)
+
+    def test_deferred_update(self):
+        with self.tank.deferred_update():
+            self.tank.ox_mass -= 1
+            self.tank.heat += 10
+            self.tank.length += 0.1
+            self.assertEqual(self.solves, 0)
+
+            # Reading it early has to give the new answer
+            temperature = self.tank.temperature
+            self.assertEqual(self.solves, 1)
+
+        self.assertEqual(self.solves, 1)
+        self.assertEqual(self.tank.temperature, temperature)
+
+
 if __name__ == "__main__":
     tank_volume = 3.14 * 0.0889 ** 2 * 2.65 # m^3
     ox_mass = 45 # kg
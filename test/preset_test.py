@@ -1,9 +1,11 @@
-
 import unittest
 
+import numpy as np
 
 from lib.simulation import Simulation
 from lib.logging.logger import Logger
+from src.rocketparts.motor import CustomMotor
+from batch_simulation_test import get_sim
 
 
 class TestingPreset(unittest.TestCase):
@@ -14,3 +16,41 @@ class TestingPreset(unittest.TestCase):
 
         self.assertEqual(sim.logger, logger)
 
+    def test_saved_state_shares(self):
+        rocket = get_sim().rocket
+
+        # Other preset objects are shared, but arrays that could change in place are not
+        self.assertIs(rocket.saved_state["_environment"], rocket.environment)
+        self.assertNotIn("saved_state", rocket.saved_state)
+
+        rocket.position += 1
+        self.assertTrue(np.array_equal(rocket.saved_state["position"], [0, 0, 0]))
+
+    def test_config_from_initialization(self):
+        motor = CustomMotor()
+        pressure = motor.combustion_chamber.pressure
+        motor.combustion_chamber.pressure = 12345
+
+        config = motor.get_config()
+
+        # The parts are from when they were made too, and they are copies
+        self.assertEqual(config["combustion_chamber"].pressure, pressure)
+        self.assertIsNot(config["combustion_chamber"], motor.combustion_chamber)
+        self.assertEqual(motor.combustion_chamber.pressure, 12345)
+
+    def test_reset(self):
+        sim = get_sim()
+        # The test rocket is set up after it is made, so that has to be saved too
+        for part in [sim, sim.rocket, sim.rocket.motor, sim.environment]:
+            part.update_saved_state()
+
+        sim.run_simulation()
+        apogee = sim.apogee
+
+        sim.reset()
+        self.assertEqual(sim.time, 0)
+        self.assertTrue(np.array_equal(sim.rocket.position, [0, 0, 0]))
+        self.assertFalse(sim.rocket.motor.finished_thrusting)
+
+        sim.run_simulation()
+        self.assertAlmostEqual(sim.apogee, apogee)
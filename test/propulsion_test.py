@@ -1,8 +1,15 @@
 import numpy as np
 import unittest
+import os
+import tempfile
+import pandas as pd
 
 
 from src.rocketparts.motorparts.grain import *
+from src.rocketparts.motorparts.combustionchamber import CombustionChamber
+from src.rocketparts.motorparts.graingeometry import AxialAnnular, StarSwirl, get_areas_csv, load_area_table
+from src.data.input import registry
+from motor_batch_simulation_test import get_sim
 
 
 class TestingChamber(unittest.TestCase):
@@ -28,6 +35,71 @@ class TestingChamber(unittest.TestCase):
         """
         pass
 
+    def get_chamber(self, integrator):
+        chamber = CombustionChamber(pressure_integrator=integrator, limit_pressure_change=False)
+        chamber.ideal_gas_constant = 300
+        chamber.temperature = 3000
+
+        return chamber
+
+    def test_implicit_pressure(self):
+        throat_area = 1e-3
+        mass_flow_in = 5
+        implicit = self.get_chamber("implicit")
+        explicit = self.get_chamber("explicit")
+        # Where the flow out of the nozzle matches the flow in
+        steady_pressure = mass_flow_in * implicit.cstar / throat_area
+
+        # Way longer than it takes the chamber to fill
+        for _ in range(5):
+            implicit.update_pressure_implicit(mass_flow_in, throat_area, 1)
+            explicit.update_pressure(mass_flow_in - explicit.pressure * throat_area / explicit.cstar, 1)
+
+            self.assertLessEqual(implicit.pressure, steady_pressure)
+
+        self.assertAlmostEqual(implicit.pressure / steady_pressure, 1, places=3)
+        self.assertAlmostEqual(implicit.mass_flow_out, mass_flow_in, delta=1e-2)
+        self.assertGreater(abs(explicit.pressure), steady_pressure * 100)
+
+    def test_explicit_unchanged(self):
+        # Recorded before the implicit integrator was added, so existing motors and cached burns keep the same results
+        self.assertEqual(CombustionChamber().pressure_integrator, "explicit")
+
+        sim = get_sim(time_increment=0.05)
+        sim.initialize_simulation()
+
+        pressures = []
+        for _ in range(6):
+            sim.simulate_step()
+            pressures.append(sim.motor.combustion_chamber.pressure)
+
+        self.assertTrue(np.allclose(pressures, [398340.839, 3036458.926, 2243961.575, 2543837.334, 2455299.368, 2480519.169], rtol=1e-8))
+
+        sim.run_simulation()
+        self.assertEqual(sim.frames, 313)
+        self.assertAlmostEqual(sim.total_impulse, 74484.26416332177, places=6)
+
+    def test_adaptive_time_increment(self):
+        fixed = get_sim(time_increment=0.01)
+        fixed.run_simulation()
+
+        adaptive = get_sim(pressure_integrator="implicit")
+        adaptive.motor.relative_pressure_step = 0.02
+        adaptive.motor.max_time_increment = 0.2
+        adaptive.initialize_simulation()
+
+        while adaptive.chamber.pressure < 20e5:
+            adaptive.simulate_step()
+
+        # It takes tiny frames to follow the charge up, which only takes a tenth of a second
+        self.assertLess(adaptive.time, 0.1)
+        self.assertGreater(adaptive.frames, 50)
+
+        adaptive.run_simulation()
+
+        self.assertLess(adaptive.frames, fixed.frames / 4)
+        self.assertAlmostEqual(adaptive.total_impulse, fixed.total_impulse, delta=fixed.total_impulse * 0.02)
+
 class TestingGrain(unittest.TestCase):
     def test_optimizing_length(self):
         # The length we end up with should have the correct total O/F ratio
@@ -61,4 +133,79 @@ class TestingGrain(unittest.TestCase):
         self.assertEqual(mass, calculated_mass)
 
 
+class TestingAxialGrain(unittest.TestCase):
+    def get_grains(self, regression_rate_function, station_count=40):
+        annular = Grain(regression_rate_function=regression_rate_function)
+        annular.geometry.outer_diameter = 0.17
+        annular.geometry.port_diameter = 0.1
+
+        axial = Grain(regression_rate_function=regression_rate_function)
+        axial.geometry = AxialAnnular(outer_diameter=0.17, port_diameter=0.1, length=annular.geometry.length, station_count=station_count)
+
+        return annular, axial
+
+    def test_matches_annular_without_flux(self):
+        # When the regression rate does not depend on the flux, picking up fuel along the way does not change anything
+        annular, axial = self.get_grains(constant(0.001))
+
+        for _ in range(20):
+            annular.update_regression(3, 0.05)
+            axial.update_regression(3, 0.05)
+
+        self.assertTrue(np.allclose(axial.geometry.station_radii, annular.geometry.port_radius))
+        self.assertAlmostEqual(axial.geometry.port_volume, annular.geometry.port_volume)
+        self.assertAlmostEqual(axial.geometry.burn_area, annular.geometry.burn_area)
+        # Annular finds the volume from the burn area before the port grew, the stations use the exact change in volume
+        self.assertAlmostEqual(axial.mass_flow, annular.mass_flow, delta=annular.mass_flow * 1e-3)
+
+    def test_regresses_faster_downstream(self):
+        annular, axial = self.get_grains(marxman_waxman_paraffin_nitrous)
+
+        for _ in range(20):
+            annular.update_regression(3, 0.05)
+            axial.update_regression(3, 0.05)
+
+        radii = axial.geometry.station_radii
+        self.assertTrue(np.all(np.diff(radii) > 0))
+        # The fuel adds to the flux, so on average it burns faster than the space-averaged grain
+        self.assertGreater(axial.geometry.port_volume, annular.geometry.port_volume)
+
+        axial.geometry.port_diameter = 0.12
+        self.assertTrue(np.allclose(axial.geometry.station_radii, 0.06))
+        self.assertAlmostEqual(axial.port_radius, 0.06)
+
+
+class TestingAreaTable(unittest.TestCase):
+    def test_star_swirl(self):
+        first = StarSwirl(length=0.5)
+        table = load_area_table("./src/data/input/regression/regressionlookup.csv")
+        second = StarSwirl(length=0.5)
+
+        # Both grains burn from the same table, which was only read once
+        self.assertIs(load_area_table("./src/data/input/regression/regressionlookup.csv"), table)
+
+        row = pd.read_csv("./src/data/input/regression/regressionlookup.csv").iloc[0]
+        self.assertAlmostEqual(second.burn_area, row["BurnArea"] * 0.5)
+        self.assertAlmostEqual(second.port_area, row["PortArea"])
+        self.assertAlmostEqual(second.port_volume, row["PortVolume"] * 0.5)
+
+        first.update_regression(0.01)
+        self.assertNotAlmostEqual(first.burn_area, second.burn_area)
+
+    def test_reloads_changed_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "lookup.csv")
+            table = pd.DataFrame({"LengthRegressed": [0, 1], "PortVolume": [1, 2], "PortArea": [1, 2], "BurnArea": [3, 4]})
+            table.to_csv(path, index=False)
+
+            self.assertIs(load_area_table(path), load_area_table(path))
+            area_function = get_areas_csv(path, per_meter=False)
+
+            table["BurnArea"] *= 2
+            table.to_csv(path, index=False)
+            os.utime(path, (0, os.path.getmtime(path) + 10))
 
+            self.assertEqual(load_area_table(path).lookup(0.5)[0], 7)
+            # Functions made before the change keep the table they were made with
+            self.assertEqual(area_function(StarSwirl())[0], 3)
+            self.assertEqual(len([key for key in registry.loaded_data if key[0] == os.path.abspath(path)]), 1)
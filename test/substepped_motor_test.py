@@ -0,0 +1,78 @@
+# TEST THE SUB-STEPPED MOTOR
+# A custom motor flown on its own clock should burn exactly like it does by itself, without touching the time increment of the flight
+
+
+import unittest
+
+from src.environment import Environment
+from src.rocket import Rocket
+from src.rocketparts.massObject import MassObject
+from src.simulation.rocket.simulation import RocketSimulation
+from src.simulation.motor.substepped import SubsteppedMotor
+from src.data.input.goddardModels import linear_approximated_normal_force, assumed_zero_AOA_CD
+from motor_batch_simulation_test import get_sim as get_motor_sim
+
+
+def get_flight(sub_steps=5, relative_pressure_step=None):
+    # Picking its own time increments needs the implicit chamber pressure, since the frames get way too long for the explicit one
+    custom_motor = get_motor_sim(pressure_integrator="explicit" if relative_pressure_step is None else "implicit").motor
+    # Otherwise the thrust goes up with the altitude, and it would not match the motor by itself
+    custom_motor.adjust_for_atmospheric = False
+    custom_motor.relative_pressure_step = relative_pressure_step
+
+    env = Environment(apply_wind=False)
+    motor = SubsteppedMotor(custom_motor, front=2, center_of_gravity=2, mass=80, sub_steps=sub_steps, environment=env)
+
+    rocket = Rocket(radius=0.1016, length=5.7912, environment=env, motor=motor)
+    rocket.set_CL_function(linear_approximated_normal_force)
+    rocket.set_CD_function(assumed_zero_AOA_CD)
+    rocket.mass_objects = [motor, MassObject(center_of_gravity=0.7, mass=20)]
+
+    # Just far enough to get past burnout
+    sim = RocketSimulation(time_increment=0.05, apply_angular_forces=False, environment=env, rocket=rocket, max_frames=420)
+    sim.logger = None
+    motor.simulation = sim
+
+    return sim
+
+
+class TestSubsteppedMotor(unittest.TestCase):
+    def test_matches_motor_simulation(self):
+        by_itself = get_motor_sim(time_increment=0.01)
+        by_itself.run_simulation()
+
+        flight = get_flight(sub_steps=5)
+        flight.run_simulation()
+        motor = flight.rocket.motor
+
+        self.assertEqual(flight.time_increment, 0.05)
+        self.assertEqual(motor.motor_simulation.frames, by_itself.frames)
+        self.assertAlmostEqual(motor.get_total_impulse(), by_itself.total_impulse, places=3)
+        self.assertAlmostEqual(motor.get_burn_time(), by_itself.time)
+        self.assertAlmostEqual(flight.event_results["burnout"].time, by_itself.time)
+
+        # Only the propellant that burned comes off
+        custom_motor = motor.custom_motor
+        self.assertAlmostEqual(motor.total_mass, 80 - custom_motor.initial_mass + custom_motor.propellant_mass)
+
+    def test_adaptive(self):
+        flight = get_flight(relative_pressure_step=0.02)
+        flight.initialize_simulation()
+        motor = flight.rocket.motor
+
+        while not motor.finished_thrusting:
+            flight.simulate_step()
+
+        frames = motor.motor_simulation.frames
+        for _ in range(10):
+            flight.simulate_step()
+
+        # The motor picks its own time increments without changing the flight's, and it stops once it is done
+        self.assertEqual(flight.time_increment, 0.05)
+        self.assertEqual(motor.motor_simulation.frames, frames)
+        self.assertEqual(motor.thrust, 0)
+        self.assertLess(frames, flight.frames * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
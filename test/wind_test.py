@@ -0,0 +1,70 @@
+# TEST THE WIND
+# Mostly making sure that the shortcuts give the same wind as doing it the slow way
+
+
+import unittest
+import numpy as np
+
+from src.data.input.atmosphere.wind import Wind, std_cache
+
+
+class TestWind(unittest.TestCase):
+    def test_std_shared(self):
+        first = Wind()
+        # Should not depend on the seeds or be calculated again
+        second = Wind(seeds=first.seeds + 1)
+
+        self.assertEqual(first.std, second.std)
+        self.assertIn((first.count, first.octaves, first.interpolation_speed), std_cache)
+        self.assertGreater(first.std, 0)
+
+    def test_std_lazy(self):
+        # Settings that nothing else uses, so that it has to be calculated
+        wind = Wind(count=3, octaves=7)
+        key = (wind.count, wind.octaves, wind.interpolation_speed)
+
+        self.assertNotIn(key, std_cache)
+        self.assertGreater(wind.std, 0)
+        self.assertIn(key, std_cache)
+
+    def test_std_value(self):
+        # Pooled over fixed seeds, so this is the deviation every default wind gets
+        # It used to be sampled from each wind's own seeds, which gives anywhere from about 0.013 to 0.05, so the gusts of any one wind come out different than they used to
+        wind = Wind()
+
+        self.assertAlmostEqual(wind.std, 0.0221964, places=6)
+        # The percentile comes from erfc instead of scipy, and one deviation above the mean has to land where the normal distribution puts it
+        self.assertAlmostEqual(wind.get_percentile_from_z(wind.get_z_score(0, wind.std, wind.std)), 0.8413447, places=6)
+
+    def test_same_query_cached(self):
+        wind = Wind()
+        calls = []
+        get_normal_perlin = wind.get_normal_perlin
+        wind.get_normal_perlin = lambda x: calls.append(x) or get_normal_perlin(x)
+
+        first = wind.get_air_velocity(3, 100)
+        second = wind.get_air_velocity(3, 100)
+
+        self.assertTrue(np.array_equal(first, second))
+        self.assertEqual(len(calls), 1)
+
+        wind.get_air_velocity(3.05, 100)
+        self.assertEqual(len(calls), 2)
+
+    def test_table(self):
+        direct = Wind(table_duration=5)
+        table = Wind(table_duration=5, use_table=True, seeds=direct.seeds)
+
+        # Exact on the grid
+        for time in [0, 1, 2.5]:
+            self.assertAlmostEqual(direct.get_noise(time), table.get_noise(time))
+
+        # Goes past the end of what was sampled to begin with
+        table.get_air_velocity(12.31, 100)
+        self.assertGreaterEqual(table.table_times[-1], 12.31)
+        self.assertTrue(np.allclose(np.diff(table.table_times), table.table_time_increment))
+        self.assertAlmostEqual(table.table_noise[123], direct.get_normal_perlin(12.3 * direct.interpolation_speed))
+
+
+if __name__ == '__main__':
+    unittest.main()